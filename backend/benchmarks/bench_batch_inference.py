@@ -0,0 +1,93 @@
+"""Benchmark de inferência em lote / Batched inference benchmark.
+
+Compara frames/s por tamanho de lote (1/4/8/16) para cada variante de modelo.
+Compares frames/sec per batch size (1/4/8/16) for each model variant.
+
+Uso / Usage (a partir de ``backend/``)::
+
+    python -m benchmarks.bench_batch_inference --video clip.mp4 --frames 128
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from typing import List
+
+import cv2
+import numpy as np
+
+from utils.contagem_video import apply_rotation, get_video_rotation
+from utils.model_registry import get_model_registry, reset_tracker_state
+from utils.tracking import create_frame_detector
+
+logger = logging.getLogger(__name__)
+
+
+def load_frames(video_path: str, max_frames: int) -> List[np.ndarray]:
+    """Decode up to ``max_frames`` frames so decoding stays out of the timing."""
+
+    rotation = get_video_rotation(video_path)
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(apply_rotation(frame, rotation) if rotation else frame)
+    cap.release()
+    return frames
+
+
+def run_benchmark(
+    frames: List[np.ndarray],
+    model_choice: str,
+    batch_size: int,
+    imgsz: int,
+    warmup: int = 1,
+) -> float:
+    """Return frames/sec for ``model_choice`` at ``batch_size``."""
+
+    with get_model_registry().lease(model_choice) as model:
+        for _ in range(warmup):
+            create_frame_detector(model, imgsz, batch_size)(frames[:batch_size])
+        reset_tracker_state(model)
+        detector = create_frame_detector(model, imgsz, batch_size)
+        start = time.perf_counter()
+        for index in range(0, len(frames), batch_size):
+            detector(frames[index : index + batch_size])
+        elapsed = time.perf_counter() - start
+    return len(frames) / elapsed if elapsed > 0 else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--frames", type=int, default=128)
+    parser.add_argument("--models", nargs="+", default=["n", "m", "l", "p"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8, 16])
+    parser.add_argument("--imgsz", type=int, default=512)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    frames = load_frames(args.video, args.frames)
+    if not frames:
+        raise SystemExit(f"Nenhum frame lido de {args.video}")
+
+    print(f"{len(frames)} frames, imgsz={args.imgsz}")
+    print("model  " + "  ".join(f"bs={bs:<5}" for bs in args.batch_sizes))
+    for model_choice in args.models:
+        row = []
+        for batch_size in args.batch_sizes:
+            try:
+                fps = run_benchmark(frames, model_choice, batch_size, args.imgsz)
+                row.append(f"{fps:8.2f}")
+            except Exception as exc:  # pragma: no cover - manual benchmark
+                logger.warning("%s bs=%s falhou: %s", model_choice, batch_size, exc)
+                row.append(f"{'erro':>8}")
+        print(f"{model_choice:<6} " + "  ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark de segmentos paralelos / Segment-parallel scaling benchmark.
+
+Mede o tempo total de ``contar_gado_em_video`` com 1/2/4/8 processos e
+confere se a contagem costurada é igual à da passada única.
+Measures the wall-clock time of ``contar_gado_em_video`` with 1/2/4/8
+processes and checks that the stitched count matches the single pass.
+
+Uso / Usage (a partir de ``backend/``)::
+
+    python -m benchmarks.bench_segments --video long_clip.mp4 --model n
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from utils.contagem_video import contar_gado_em_video
+
+
+class _BenchProgress:
+    """Progress manager that keeps nothing / Gerenciador de progresso vazio."""
+
+    def atualizar(self, *args: Any, **kwargs: Any) -> bool:
+        return True
+
+    def status(self, video_name: str) -> Dict[str, Any]:
+        return {"cancelado": False}
+
+    def update_status_message(self, *args: Any) -> None:
+        pass
+
+    def erro(self, video_name: str, mensagem: str) -> None:
+        logging.error("[BENCH] %s: %s", video_name, mensagem)
+
+
+def run_once(
+    video: str, workers: int, options: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Count a temporary copy of ``video`` (the original is never deleted)."""
+
+    # Cached detections would skip decoding and inference on repeated runs.
+    os.environ["DETECTION_CACHE"] = "false"
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = os.path.join(tmp, os.path.basename(video))
+        shutil.copyfile(video, copy)
+        start = time.perf_counter()
+        result = contar_gado_em_video(
+            copy,
+            os.path.basename(video),
+            _BenchProgress(),
+            segment_workers=workers,
+            **options,
+        )
+        elapsed = time.perf_counter() - start
+    if result is not None:
+        result["wall_seconds"] = elapsed
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--model", default="n")
+    parser.add_argument("--orientation", default="S")
+    parser.add_argument("--frame-skip", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    os.environ["CREATE_ANNOTATED_VIDEO"] = "false"
+    os.environ["USE_SFTP"] = "false"
+    options = {
+        "model_choice": args.model,
+        "orientation": args.orientation,
+        "frame_skip": args.frame_skip,
+    }
+
+    print("workers  wall_s   speedup  count")
+    baseline = None
+    for workers in args.workers:
+        result = run_once(args.video, workers, options)
+        if result is None:
+            print(f"{workers:<8} falhou")
+            continue
+        baseline = baseline or result["wall_seconds"]
+        print(
+            f"{workers:<8} {result['wall_seconds']:7.1f}  "
+            f"{baseline / result['wall_seconds']:6.2f}x  {result['total_count']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark de rastreadores / Tracker benchmark.
+
+Mede o custo por frame do ``IoUTracker`` e do BoT-SORT do Ultralytics com
+detecções sintéticas e, com ``--clips``, compara as contagens dos dois
+rastreadores em vídeos de referência.
+Measures the per-frame cost of ``IoUTracker`` and Ultralytics' BoT-SORT on
+synthetic detections and, with ``--clips``, compares the counts of both
+trackers on reference videos.
+
+Uso / Usage (a partir de ``backend/``)::
+
+    python -m benchmarks.bench_trackers --tracks 10 50 200
+    python -m benchmarks.bench_trackers --clips data/reference_clips --model n
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.bench_line_counter import synthetic_frames
+from utils.iou_tracker import IoUTracker
+from utils.tracking import TRACKERS, create_ultralytics_tracker
+
+
+def detection_frames(n_tracks: int, n_frames: int) -> List[np.ndarray]:
+    """``[x1, y1, x2, y2, conf, cls]`` rows per frame, in shuffled order."""
+
+    rng = np.random.default_rng(1)
+    frames = []
+    for _ids, classes, boxes in synthetic_frames(n_tracks, n_frames):
+        order = rng.permutation(len(boxes))
+        conf = rng.uniform(0.4, 0.95, len(boxes))
+        frames.append(
+            np.column_stack([boxes, conf, classes])[order].astype(np.float32)
+        )
+    return frames
+
+
+def _ultralytics_update() -> Callable[[np.ndarray], Any]:
+    from ultralytics.engine.results import Boxes
+
+    tracker = create_ultralytics_tracker()
+    image = np.zeros((1080, 1080, 3), dtype=np.uint8)
+    return lambda det: tracker.update(Boxes(det, image.shape[:2]), image)
+
+
+def time_tracker(
+    update: Callable[[np.ndarray], Any], frames: List[np.ndarray]
+) -> float:
+    """Milliseconds per ``update`` call."""
+
+    start = time.perf_counter()
+    for det in frames:
+        update(det)
+    return (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def count_agreement(
+    clips: List[str], options: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Count every clip once per tracker."""
+
+    from benchmarks.bench_segments import run_once
+
+    rows = []
+    for clip in clips:
+        row: Dict[str, Any] = {"clip": os.path.basename(clip)}
+        for tracker in TRACKERS:
+            result = run_once(clip, 1, dict(options, tracker=tracker))
+            if result is not None:
+                row[tracker] = result["total_count"]
+                row[f"{tracker}_fps"] = round(
+                    result["total_frames"] / result["wall_seconds"], 2
+                )
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", nargs="+", type=int, default=[10, 50, 200])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--clips", help="Pasta com clipes de referência (.mp4)")
+    parser.add_argument("--model", default="n")
+    parser.add_argument("--orientation", default="S")
+    args = parser.parse_args()
+
+    print("tracks   iou(ms/frame)  botsort(ms/frame)")
+    for n_tracks in args.tracks:
+        frames = detection_frames(n_tracks, args.frames)
+        iou_ms = time_tracker(IoUTracker().update, frames)
+        try:
+            botsort_ms = f"{time_tracker(_ultralytics_update(), frames):>17.3f}"
+        except ImportError:
+            botsort_ms = f"{'n/d':>17}"
+        print(f"{n_tracks:<8} {iou_ms:>13.3f}  {botsort_ms}")
+
+    if not args.clips:
+        return
+    logging.basicConfig(level=logging.WARNING)
+    os.environ["CREATE_ANNOTATED_VIDEO"] = "false"
+    os.environ["USE_SFTP"] = "false"
+    clips = sorted(glob.glob(os.path.join(args.clips, "*.mp4")))
+    if not clips:
+        raise SystemExit(f"Nenhum clipe em {args.clips}")
+    options = {"model_choice": args.model, "orientation": args.orientation}
+    print(f"\n{'clip':<28} " + "  ".join(f"{t:>8} {'fps':>7}" for t in TRACKERS))
+    for row in count_agreement(clips, options):
+        cells = [
+            f"{row.get(t, 'erro'):>8} {row.get(f'{t}_fps', ''):>7}" for t in TRACKERS
+        ]
+        print(f"{row['clip']:<28} " + "  ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Comparação de backends de inferência / Inference backend comparison.
+
+Mede frames/s de cada ``INFERENCE_BACKEND`` e compara as detecções com as do
+PyTorch (precisão e revocação com IoU >= 0.5).
+Measures frames/sec of each ``INFERENCE_BACKEND`` and compares detections
+with PyTorch's (precision and recall at IoU >= 0.5).
+
+Uso / Usage (a partir de ``backend/``)::
+
+    python -m benchmarks.compare_backends --video clip.mp4 --model l
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from benchmarks.bench_batch_inference import load_frames
+from utils.model_export import BACKEND_TORCH, INFERENCE_BACKENDS
+from utils.model_registry import ModelRegistry
+from utils.tracking import DEFAULT_CONF, box_iou
+
+logger = logging.getLogger(__name__)
+
+
+def detect_all(
+    registry: ModelRegistry,
+    frames: List[np.ndarray],
+    model_choice: str,
+    backend: str,
+    imgsz: int,
+    batch_size: int,
+) -> Tuple[float, List[np.ndarray]]:
+    """Return ``(frames/sec, boxes per frame)`` for ``backend``."""
+
+    with registry.lease(model_choice, imgsz=imgsz, backend=backend) as model:
+        kwargs = {"verbose": False, "conf": DEFAULT_CONF, "imgsz": imgsz}
+        model.predict(frames[:batch_size], **kwargs)
+        boxes = []
+        start = time.perf_counter()
+        for index in range(0, len(frames), batch_size):
+            for result in model.predict(frames[index : index + batch_size], **kwargs):
+                boxes.append(result.boxes.xyxy.cpu().numpy())
+        elapsed = time.perf_counter() - start
+    return (len(frames) / elapsed if elapsed > 0 else 0.0), boxes
+
+
+def agreement(
+    reference: List[np.ndarray], candidate: List[np.ndarray], iou: float = 0.5
+) -> Tuple[float, float]:
+    """Precision and recall of ``candidate`` against ``reference`` boxes."""
+
+    matched = ref_total = cand_total = 0
+    for ref, cand in zip(reference, candidate):
+        ref_total += len(ref)
+        cand_total += len(cand)
+        if len(ref) and len(cand):
+            matched += int((box_iou(ref, cand).max(axis=1) >= iou).sum())
+    precision = matched / cand_total if cand_total else 1.0
+    recall = matched / ref_total if ref_total else 1.0
+    return precision, recall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--frames", type=int, default=128)
+    parser.add_argument("--model", default="l")
+    parser.add_argument("--backends", nargs="+", default=list(INFERENCE_BACKENDS))
+    parser.add_argument("--imgsz", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    frames = load_frames(args.video, args.frames)
+    if not frames:
+        raise SystemExit(f"Nenhum frame lido de {args.video}")
+
+    registry = ModelRegistry()
+    _, reference = detect_all(
+        registry, frames, args.model, BACKEND_TORCH, args.imgsz, args.batch_size
+    )
+    print(f"{len(frames)} frames, modelo={args.model}, imgsz={args.imgsz}")
+    print("backend    fps      precision  recall")
+    for backend in args.backends:
+        try:
+            fps, boxes = detect_all(
+                registry, frames, args.model, backend, args.imgsz, args.batch_size
+            )
+        except Exception as exc:  # pragma: no cover - manual benchmark
+            logger.warning("%s falhou: %s", backend, exc)
+            print(f"{backend:<10} {'erro':>7}")
+            continue
+        precision, recall = agreement(reference, boxes)
+        print(f"{backend:<10} {fps:7.2f}  {precision:9.3f}  {recall:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Relatório INT8 vs FP32 / INT8 vs FP32 report.
+
+Conta cada clipe de referência com os modelos FP32 e as variantes INT8 pelo
+mesmo ``contar_gado_em_video`` e compara contagens e frames/s.
+Counts each reference clip with the FP32 models and their INT8 variants
+through the same ``contar_gado_em_video`` and compares counts and frames/sec.
+
+Uso / Usage (a partir de ``backend/``)::
+
+    python -m benchmarks.report_int8 --clips data/reference_clips --models n l
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+from benchmarks.bench_segments import run_once
+from utils.model_registry import INT8_SUFFIX
+
+
+def report(
+    clips: List[str], models: List[str], orientation: str
+) -> List[Dict[str, Any]]:
+    """Count every clip with each FP32 model and its INT8 variant."""
+
+    rows = []
+    for clip in clips:
+        for choice in models:
+            for variant in (choice, f"{choice}{INT8_SUFFIX}"):
+                options = {"model_choice": variant, "orientation": orientation}
+                result = run_once(clip, 1, options)
+                row = {"clip": os.path.basename(clip), "model": variant}
+                if result is not None:
+                    row["count"] = result["total_count"]
+                    fps = result["total_frames"] / result["wall_seconds"]
+                    row["fps"] = round(fps, 2)
+                rows.append(row)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", required=True)
+    parser.add_argument("--models", nargs="+", default=["n", "m", "l", "p"])
+    parser.add_argument("--orientation", default="S")
+    parser.add_argument("--json", help="Grava o relatório em JSON / Write JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    os.environ["CREATE_ANNOTATED_VIDEO"] = "false"
+    os.environ["USE_SFTP"] = "false"
+    clips = sorted(glob.glob(os.path.join(args.clips, "*.mp4")))
+    if not clips:
+        raise SystemExit(f"Nenhum clipe em {args.clips}")
+
+    rows = report(clips, args.models, args.orientation)
+    print(f"{'clip':<28} {'model':<8} {'count':>6} {'fps':>8}")
+    for row in rows:
+        print(
+            f"{row['clip']:<28} {row['model']:<8} "
+            f"{row.get('count', 'erro'):>6} {row.get('fps', ''):>8}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(rows, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
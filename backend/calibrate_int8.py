@@ -0,0 +1,72 @@
+"""Gera as variantes INT8 dos modelos / Build the INT8 model variants.
+
+Extrai frames dos vídeos de referência para ``CALIBRATION_DIR`` e exporta
+cada modelo pedido como OpenVINO INT8 no cache de ``MODEL_EXPORT_DIR``; depois
+disso ``model_choice="l-int8"`` (etc.) usa o modelo quantizado.
+Extracts frames from the reference videos into ``CALIBRATION_DIR`` and
+exports each requested model as OpenVINO INT8 into the ``MODEL_EXPORT_DIR``
+cache; afterwards ``model_choice="l-int8"`` (etc.) uses the quantized model.
+
+Uso / Usage (a partir de ``backend/``)::
+
+    python calibrate_int8.py --videos data/calibration_videos --models n m l p
+"""
+
+import argparse
+import glob
+import logging
+import os
+import shutil
+
+from utils.calibration import (
+    DEFAULT_CALIBRATION_STEP,
+    build_calibration_set,
+    calibration_dir,
+)
+from utils.model_registry import INT8_SUFFIX, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+VIDEO_PATTERNS = ("*.mp4", "*.mov", "*.avi", "*.mkv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--videos", required=True, help="Pasta com vídeos de referência"
+    )
+    parser.add_argument("--models", nargs="+", default=["n", "m", "l", "p"])
+    env_imgsz = os.getenv("YOLO_IMG_SIZE", "512")
+    parser.add_argument(
+        "--imgsz", type=int, default=int(env_imgsz) if env_imgsz.isdigit() else 512
+    )
+    parser.add_argument("--step", type=int, default=DEFAULT_CALIBRATION_STEP)
+    parser.add_argument(
+        "--keep", action="store_true", help="Reutiliza as imagens já extraídas"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    images_dir = calibration_dir()
+    if not args.keep and os.path.isdir(images_dir):
+        shutil.rmtree(images_dir)
+    if not args.keep:
+        videos = [
+            path
+            for pattern in VIDEO_PATTERNS
+            for path in glob.glob(os.path.join(args.videos, pattern))
+        ]
+        if not videos:
+            raise SystemExit(f"Nenhum vídeo encontrado em {args.videos}")
+        build_calibration_set(videos, images_dir, step=args.step)
+
+    registry = ModelRegistry(calibration=images_dir)
+    for choice in args.models:
+        path = registry.resolve_key(
+            f"{choice}{INT8_SUFFIX}", imgsz=args.imgsz, quantize=True
+        )
+        print(f"{choice}{INT8_SUFFIX}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 
@@ -7,7 +8,6 @@ from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from routes import orientation_routes, video_routes
 
@@ -21,11 +21,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Resume jobs interrupted by a restart / Retoma jobs interrompidos."""
+    video_routes.resume_interrupted_jobs()
+    yield
+
+
 # Create the FastAPI application instance
 app = FastAPI(
     title="CountG API",
     version="0.1.0",
     description="FastAPI backend for counting and tracking objects in video.",
+    lifespan=lifespan,
 )
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -36,11 +45,7 @@ else:
     PROCESSED_VIDEOS_DIR = os.path.abspath(os.path.join(BASE_DIR, "videos_processados"))
 logger.info("[CONFIG] Processed videos dir: %s", PROCESSED_VIDEOS_DIR)
 os.makedirs(PROCESSED_VIDEOS_DIR, exist_ok=True)
-app.mount(
-    "/videos_processados",
-    StaticFiles(directory=PROCESSED_VIDEOS_DIR),
-    name="videos_processados",
-)
+# ``/videos_processados`` is served by ``video_routes`` (deferred renders).
 
 # CORS configuration (allows frontend to communicate with backend)
 # Allows a React Native app (running on a different origin) to talk to the API.
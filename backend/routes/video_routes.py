@@ -1,17 +1,31 @@
+import hashlib
 import logging
 import os
 import re
-import shutil
 import uuid
 from typing import List, Optional
 
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse
 
 from schemas import VideoRequest
-from utils.contagem_video import contar_gado_em_video, get_line_and_direction_config
+from utils.checkpoint import list_checkpoints, remove_checkpoint
+from utils.contagem_video import (
+    _resolve_output_dir,
+    contar_gado_em_video,
+    get_line_and_direction_config,
+)
+from utils.detection_cache import content_hash
+from utils.env import get_env_int
+from utils.event_log import DEFAULT_PAGE_SIZE, event_log_path, read_events
 from utils.gerenciador_progresso import ProgressoManager
-from utils.task_queue import TaskQueue
+from utils.media_probe import discard_probe, probe_media
+from utils.model_registry import get_model_registry, int8_imgsz, is_int8_choice
+from utils.render import lower_thread_priority, pending_render, render_annotated_video
+from utils.result_cache import RunningJobs, UploadHashes, result_key
+from utils.task_queue import STATUS_CANCELED, STATUS_FAILED, TaskQueue
+from utils.zones import parse_zones
 
 router = APIRouter()
 DATA_DIR = os.getenv("RENDER_DATA_DIR", "data")
@@ -23,26 +37,28 @@ progresso_manager = ProgressoManager()
 logger = logging.getLogger(__name__)
 
 
-def _get_env_int(name: str, default: int) -> int:
-    value = os.getenv(name)
-    if not value:
-        return default
-    try:
-        return int(value)
-    except ValueError:
-        return default
-
-
-VIDEO_QUEUE_WORKERS = _get_env_int("VIDEO_QUEUE_WORKERS", 1)
+VIDEO_QUEUE_WORKERS = get_env_int("VIDEO_QUEUE_WORKERS", 1)
+RESULT_CACHE = os.getenv("RESULT_CACHE", "true").lower() == "true"
 video_queue = TaskQueue(name="video-processing", max_workers=VIDEO_QUEUE_WORKERS)
+# Deferred annotated videos render here, apart from the counting jobs.
+render_queue = TaskQueue(
+    name="video-render", max_workers=get_env_int("RENDER_QUEUE_WORKERS", 1)
+)
+
+# Jobs in ``video_queue`` by result key, shared by re-uploads of a video.
+running_jobs = RunningJobs()
+# SHA-256 of uploads computed while they streamed in, until ``/predict-video/``.
+upload_hashes = UploadHashes()
 
 # Configurações de upload
 ALLOWED_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv"}
 MAX_FILE_SIZE_MB = 500
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
 
 
 def _process_video_job(video_name: str, request_payload: dict) -> None:
+    resultado = None
     try:
         status = progresso_manager.status(video_name)
         if status and status.get("cancelado"):
@@ -58,6 +74,16 @@ def _process_video_job(video_name: str, request_payload: dict) -> None:
             line_position_ratio=request_payload.get("line_position_ratio"),
             trim_start_ms=request_payload.get("trim_start_ms"),
             trim_end_ms=request_payload.get("trim_end_ms"),
+            frame_skip=request_payload.get("frame_skip") or 1,
+            target_fps=request_payload.get("target_fps"),
+            roi_band_ratio=request_payload.get("roi_band_ratio"),
+            tiled_inference=request_payload.get("tiled_inference"),
+            imgsz=request_payload.get("imgsz"),
+            tracker=request_payload.get("tracker"),
+            zones=request_payload.get("zones"),
+            sweep=request_payload.get("sweep"),
+            resume=bool(request_payload.get("resume")),
+            video_hash=request_payload.get("video_hash"),
         )
         if resultado is not None:
             logger.info("[QUEUE] Job finished for: %s", video_name)
@@ -68,6 +94,78 @@ def _process_video_job(video_name: str, request_payload: dict) -> None:
         logger.exception("[QUEUE] Job failed for %s: %s", video_name, exc)
         progresso_manager.erro(video_name, f"Erro critico na fila: {str(exc)}")
         raise
+    finally:
+        _settle_attached(video_name, resultado)
+
+
+def _settle_attached(video_name: str, resultado: Optional[dict]) -> None:
+    """Hand the result of ``video_name`` to the re-uploads waiting for it."""
+
+    for attached in running_jobs.release(video_name):
+        if progresso_manager.status(attached).get("cancelado"):
+            continue
+        if resultado is None:
+            progresso_manager.erro(
+                attached, f"O processamento compartilhado ({video_name}) falhou."
+            )
+        else:
+            logger.info(f"[DEDUP] Resultado de {video_name} entregue a {attached}")
+            progresso_manager.finalizar(attached, resultado)
+            # On failure the upload is kept, so the client can submit it again.
+            _discard_upload(attached)
+
+
+def _discard_upload(video_name: str) -> None:
+    path = os.path.join(UPLOAD_FOLDER, video_name)
+    if os.path.exists(path):
+        os.remove(path)
+    discard_probe(path)
+
+
+def _render_job(file_name: str) -> None:
+    lower_thread_priority()
+    render_annotated_video(file_name, _resolve_output_dir(False))
+
+
+def resume_interrupted_jobs() -> List[str]:
+    """Re-enqueue the jobs that left a checkpoint / Retoma jobs interrompidos.
+
+    English:
+        Called on startup. Every checkpoint whose job is still unfinished in
+        ``video_progress`` and whose upload still exists is enqueued again
+        with its original options and resumed from the checkpoint; stale
+        checkpoints are removed.
+
+    Português:
+        Chamado na inicialização. Cada checkpoint cujo job ainda não terminou
+        e cujo upload ainda existe é reenfileirado e retomado do checkpoint;
+        os demais checkpoints são removidos.
+
+    Retorno / Returns:
+        List[str]: Vídeos reenfileirados. Re-enqueued videos.
+    """
+
+    retomados = []
+    for checkpoint in list_checkpoints():
+        video_name = checkpoint["video_name"]
+        status = progresso_manager.status(video_name)
+        if status.get("finalizado") or status.get("cancelado"):
+            remove_checkpoint(video_name)
+            continue
+        if not os.path.exists(os.path.join(UPLOAD_FOLDER, video_name)):
+            logger.warning(f"[CHECKPOINT] Upload de {video_name} ausente; descartando.")
+            remove_checkpoint(video_name)
+            continue
+        request_payload = dict(checkpoint["options"], resume=True)
+        video_queue.enqueue(
+            video_name, _process_video_job, video_name, request_payload
+        )
+        retomados.append(video_name)
+        logger.info(
+            f"[CHECKPOINT] {video_name} reenfileirado a partir de "
+            f"{checkpoint['pts_ms']:.0f}ms"
+        )
+    return retomados
 
 
 @router.post("/upload-video/")
@@ -124,8 +222,13 @@ async def upload_video_endpoint(file: UploadFile = File(...)):
     )
 
     try:
+        # Hash while writing, so deduplication never reads the file again.
+        digest = hashlib.sha256()
         with open(temp_local_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            for chunk in iter(lambda: file.file.read(UPLOAD_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                buffer.write(chunk)
+        upload_hashes.put(unique_filename, digest.hexdigest())
         logger.debug(
             f"[UPLOAD] Saved size: {os.path.getsize(temp_local_path)} bytes"
         )
@@ -136,6 +239,13 @@ async def upload_video_endpoint(file: UploadFile = File(...)):
             status_code=500, detail=f"Falha ao salvar o arquivo no servidor: {str(e)}"
         )
 
+    # Probed once here; the job, trimming and the ETA reuse the cache. The
+    # upload is already saved, so a failed probe only costs a later retry.
+    try:
+        await run_in_threadpool(probe_media, temp_local_path)
+    except Exception as e:
+        logger.warning(f"[UPLOAD] Falha ao analisar {unique_filename}: {e}")
+
     # O upload para a HostGator e a limpeza foram movidos para dentro de 'contar_gado_em_video'.
     # Este endpoint agora é muito mais rápido e simples.
 
@@ -201,11 +311,36 @@ async def predict_video_endpoint(request: VideoRequest):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid orientation code.")
 
+    registry = get_model_registry()
+    if is_int8_choice(request.model_choice) and not registry.int8_available(
+        request.model_choice
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Variante INT8 '{request.model_choice}' indisponível em "
+                f"{int8_imgsz()}px; execute 'python calibrate_int8.py' antes de "
+                "usá-la."
+            ),
+        )
+
+    zones = [zone.model_dump() for zone in request.zones] if request.zones else None
+    try:
+        parse_zones(zones, 1, 1)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
     trim_start_ms = request.trim_start_ms
     trim_end_ms = request.trim_end_ms
     if trim_start_ms is not None and trim_end_ms is not None:
         if trim_end_ms <= trim_start_ms:
             raise HTTPException(status_code=400, detail="Invalid trim range.")
+    media = None
+    if os.path.exists(expected_path):
+        media = await run_in_threadpool(probe_media, expected_path)
+    duration_ms = media["duration_ms"] if media else 0
+    if duration_ms > 0 and (trim_start_ms or 0) >= duration_ms:
+        raise HTTPException(status_code=400, detail="Invalid trim range.")
 
     if progresso_manager.is_processing(video_name_on_server):
         logger.warning(
@@ -219,8 +354,6 @@ async def predict_video_endpoint(request: VideoRequest):
             },
         )
 
-    progresso_manager.iniciar(video_name_on_server)
-
     request_payload = {
         "model_choice": request.model_choice,
         "orientation": request.orientation,
@@ -228,8 +361,61 @@ async def predict_video_endpoint(request: VideoRequest):
         "line_position_ratio": request.line_position_ratio,
         "trim_start_ms": trim_start_ms,
         "trim_end_ms": trim_end_ms,
+        "frame_skip": request.frame_skip,
+        "target_fps": request.target_fps,
+        "roi_band_ratio": request.roi_band_ratio,
+        "tiled_inference": request.tiled_inference,
+        "tracker": request.tracker.value if request.tracker else None,
+        "zones": zones,
+        "sweep": (
+            [
+                {
+                    "orientation": candidate.orientation.value,
+                    "line_position_ratio": candidate.line_position_ratio,
+                }
+                for candidate in request.sweep
+            ]
+            if request.sweep
+            else None
+        ),
     }
 
+    key = None
+    video_path = os.path.join(UPLOAD_FOLDER, video_name_on_server)
+    if RESULT_CACHE and os.path.exists(video_path):
+        video_hash = upload_hashes.pop(video_name_on_server)
+        if video_hash is None:
+            # Hashing a large upload must not block the event loop.
+            video_hash = await run_in_threadpool(content_hash, video_path)
+        request_payload["video_hash"] = video_hash
+        key = result_key(video_hash, request_payload)
+        resultado = progresso_manager.resultado_por_chave(key)
+        if resultado is not None:
+            logger.info(f"[DEDUP] {video_name_on_server}: resultado reaproveitado")
+            progresso_manager.iniciar(video_name_on_server, result_key=key)
+            progresso_manager.finalizar(video_name_on_server, resultado)
+            _discard_upload(video_name_on_server)
+            return {
+                "status": "finalizado",
+                "message": "Vídeo já processado com as mesmas opções.",
+                "video_name": video_name_on_server,
+                "resultado": resultado,
+            }
+        owner = running_jobs.claim(key, video_name_on_server)
+        if owner is not None:
+            logger.info(f"[DEDUP] {video_name_on_server} anexado ao job {owner}")
+            progresso_manager.iniciar(video_name_on_server)
+            return {
+                "status": "iniciado",
+                "message": f"Mesmo vídeo já em processamento como '{owner}'.",
+                "video_name": video_name_on_server,
+                "attached_to": owner,
+                "queue_position": video_queue.position(owner),
+                "queue_status": getattr(video_queue.get(owner), "status", None),
+                "queue_size": video_queue.queued_count(),
+            }
+
+    progresso_manager.iniciar(video_name_on_server, result_key=key)
     job, _ = video_queue.enqueue(
         video_name_on_server, _process_video_job, video_name_on_server, request_payload
     )
@@ -273,10 +459,17 @@ async def progresso_endpoint(video_name: str):
         Example:
             >>> curl http://localhost:8000/progresso/video.mp4
     """
-    status = progresso_manager.status(video_name)
-    job = video_queue.get(video_name)
+    # Re-uploads sharing another job report that job's progress.
+    owner = running_jobs.owner_of(video_name)
+    if owner is not None:
+        status = dict(
+            progresso_manager.status(owner), video_name=video_name, attached_to=owner
+        )
+    else:
+        status = progresso_manager.status(video_name)
+    job = video_queue.get(owner or video_name)
     if job:
-        status["queue_position"] = video_queue.position(video_name)
+        status["queue_position"] = video_queue.position(owner or video_name)
         status["queue_status"] = job.status
         status["queue_size"] = video_queue.queued_count()
     return status
@@ -308,10 +501,113 @@ async def cancelar_endpoint(video_name: str):
         Example:
             >>> curl http://localhost:8000/cancelar-processamento/video.mp4
     """
+    # A re-upload only stops waiting; the shared job keeps running.
+    running_jobs.detach(video_name)
     queue_cancelled = video_queue.cancel(video_name)
+    if queue_cancelled and video_queue.get(video_name).status == STATUS_CANCELED:
+        # Never started, so ``_process_video_job`` will not release it.
+        _settle_attached(video_name, None)
     db_cancelled = progresso_manager.cancelar(video_name)
     if db_cancelled or queue_cancelled:
         return {"message": f"Solicitação de cancelamento para {video_name} enviada."}
     return {
         "message": f"Não foi possível cancelar ou o processo para {video_name} não está ativo."
     }
+
+
+@router.get("/eventos/{video_name}")
+async def eventos_endpoint(
+    video_name: str, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE
+):
+    """Português:
+        Pagina os eventos de contagem registrados para um vídeo.
+
+        Parâmetros:
+            video_name (str): nome do arquivo do vídeo no servidor.
+            offset (int): índice do primeiro evento.
+            limit (int): eventos por página (máx. 1000).
+
+        Retorna:
+            dict: eventos da página, total e ``next_offset``.
+
+        Exemplo:
+            >>> curl "http://localhost:8000/eventos/video.mp4?offset=0&limit=100"
+
+    English:
+        Pages through the counting events logged for a video.
+
+        Parameters:
+            video_name (str): name of the video file on the server.
+            offset (int): index of the first event.
+            limit (int): events per page (max 1000).
+
+        Returns:
+            dict: page events, total and ``next_offset``.
+
+        Example:
+            >>> curl "http://localhost:8000/eventos/video.mp4?offset=0&limit=100"
+    """
+    try:
+        return read_events(event_log_path(video_name), offset, limit)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Nenhum evento registrado para {video_name}.",
+        )
+
+
+@router.get("/videos_processados/{file_name}")
+async def video_processado_endpoint(file_name: str):
+    """Português:
+        Entrega o vídeo anotado. Com ``ANNOTATED_VIDEO_MODE=deferred`` o
+        primeiro acesso enfileira a renderização e responde 202; os acessos
+        seguintes recebem o arquivo quando ele estiver pronto.
+
+        Parâmetros:
+            file_name (str): nome do vídeo processado (``video_processado``).
+
+        Retorna:
+            arquivo de vídeo, ou 202 com ``queue_status`` e
+            ``queue_position`` enquanto a renderização não termina.
+
+        Exemplo:
+            >>> curl -O http://localhost:8000/videos_processados/processed_video.mp4
+
+    English:
+        Serves the annotated video. With ``ANNOTATED_VIDEO_MODE=deferred``
+        the first request enqueues the render and answers 202; later
+        requests receive the file once it is ready.
+
+        Parameters:
+            file_name (str): processed video name (``video_processado``).
+
+        Returns:
+            the video file, or 202 with ``queue_status`` and
+            ``queue_position`` while the render is not finished.
+
+        Example:
+            >>> curl -O http://localhost:8000/videos_processados/processed_video.mp4
+    """
+    if os.path.basename(file_name) != file_name or file_name.startswith("."):
+        raise HTTPException(status_code=400, detail="Nome de arquivo inválido.")
+    path = os.path.join(_resolve_output_dir(False), file_name)
+    if os.path.exists(path):
+        return FileResponse(path)
+    if pending_render(file_name) is None:
+        # The render may have finished since the first check.
+        if os.path.exists(path):
+            return FileResponse(path)
+        raise HTTPException(status_code=404, detail="Vídeo não encontrado.")
+    job, position = render_queue.enqueue(file_name, _render_job, file_name)
+    if job.status == STATUS_FAILED:
+        raise HTTPException(
+            status_code=500, detail=f"Falha ao renderizar {file_name}: {job.error}"
+        )
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "renderizando",
+            "queue_status": job.status,
+            "queue_position": position,
+        },
+    )
@@ -1,8 +1,10 @@
 from enum import Enum
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
+MAX_SWEEP_CANDIDATES = 50
+
 # BaseModel é a classe base do Pydantic para criar modelos de dados.
 # Field é usado para adicionar metadados extras aos campos, como exemplos, descrições e validações.
 
@@ -16,6 +18,77 @@ class Orientation(str, Enum):
     W = "W"
 
 
+class TrackerChoice(str, Enum):
+    """Rastreadores disponíveis / Available trackers."""
+
+    BOTSORT = "botsort"
+    IOU = "iou"
+
+
+class CountingZone(BaseModel):
+    """Zona de contagem extra / Extra counting zone."""
+
+    name: Optional[str] = Field(
+        default=None,
+        example="entrada",
+        description=(
+            "Nome da zona no resultado (padrão: zona_1, zona_2, ...).\n"
+            "English: Zone name in the result (default: zona_1, zona_2, ...)."
+        ),
+    )
+
+    type: Literal["line", "polygon"] = Field(
+        ...,
+        example="line",
+        description=(
+            "'line' (segmento de dois pontos) ou 'polygon' (três ou mais pontos).\n"
+            "English: 'line' (two-point segment) or 'polygon' (three or more points)."
+        ),
+    )
+
+    points: List[List[float]] = Field(
+        ...,
+        example=[[0.1, 0.2], [0.9, 0.6]],
+        description=(
+            "Pontos [x, y] normalizados (0 a 1) no frame já rotacionado.\n"
+            "English: [x, y] points normalised (0 to 1) to the rotated frame."
+        ),
+    )
+
+    direction: str = Field(
+        default="any",
+        example="S",
+        description=(
+            "Linha: N, E, S, W (movimento contado) ou any. Polígono: in (entrada), out (saída) ou any.\n"
+            "English: Line: N, E, S, W (counted movement) or any. Polygon: in (entering), out (leaving) or any."
+        ),
+    )
+
+
+class SweepCandidate(BaseModel):
+    """Configuração de linha candidata / Candidate line setting."""
+
+    orientation: Orientation = Field(
+        ...,
+        example="S",
+        description=(
+            "Orientação do movimento: N, E, S, W.\n"
+            "English: Movement orientation: N, E, S, W."
+        ),
+    )
+
+    line_position_ratio: float = Field(
+        default=0.5,
+        ge=0.0,
+        le=1.0,
+        example=0.4,
+        description=(
+            "Posição da linha candidata (0.0 a 1.0).\n"
+            "English: Candidate line position (0.0 to 1.0)."
+        ),
+    )
+
+
 class VideoRequest(BaseModel):
     """
     Define a estrutura esperada para o corpo da requisição POST em /predict-video/.
@@ -48,8 +121,8 @@ class VideoRequest(BaseModel):
         default="l",
         example="l",
         description=(
-            "Escolha do modelo YOLO: 'n' (nano), 'm' (médio), 'l' (grande), ou 'p' (próprio/best.pt).\n"
-            "English: YOLO model choice: 'n' (nano), 'm' (medium), 'l' (large), or 'p' (own/best.pt)."
+            "Escolha do modelo YOLO: 'n' (nano), 'm' (médio), 'l' (grande), ou 'p' (próprio/best.pt); sufixo '-int8' (ex.: 'l-int8') usa a variante quantizada.\n"
+            "English: YOLO model choice: 'n' (nano), 'm' (medium), 'l' (large), or 'p' (own/best.pt); the '-int8' suffix (e.g. 'l-int8') selects the quantized variant."
         ),
     )
 
@@ -93,6 +166,76 @@ class VideoRequest(BaseModel):
         ),
     )
 
+    frame_skip: int = Field(
+        default=1,
+        ge=1,
+        example=2,
+        description=(
+            "Analisa um a cada N frames; os demais não são decodificados.\n"
+            "English: Analyze one out of every N frames; the others are not decoded."
+        ),
+    )
+
+    target_fps: Optional[float] = Field(
+        default=None,
+        gt=0,
+        example=15,
+        description=(
+            "Taxa de análise desejada em frames por segundo (opcional). Quando informada, substitui frame_skip.\n"
+            "English: Target analysis rate in frames per second (optional). Overrides frame_skip when set."
+        ),
+    )
+
+    roi_band_ratio: Optional[float] = Field(
+        default=None,
+        ge=0,
+        le=1,
+        example=0.3,
+        description=(
+            "Espessura da faixa em torno da linha (fração do frame) onde a detecção é feita; 0 usa o frame inteiro (opcional).\n"
+            "English: Thickness of the band around the line (fraction of the frame) where detection runs; 0 uses the full frame (optional)."
+        ),
+    )
+
+    tiled_inference: Optional[bool] = Field(
+        default=None,
+        example=False,
+        description=(
+            "Detecta em blocos sobrepostos na resolução original em torno da linha, para vídeos de alta resolução (opcional).\n"
+            "English: Detect on overlapping native-resolution tiles around the line, for high-resolution footage (optional)."
+        ),
+    )
+
+    tracker: Optional[TrackerChoice] = Field(
+        default=None,
+        example="iou",
+        description=(
+            "Rastreador: 'botsort' (padrão do Ultralytics) ou 'iou' (rastreador leve por IoU e centroide) (opcional).\n"
+            "English: Tracker: 'botsort' (Ultralytics default) or 'iou' (lightweight IoU/centroid tracker) (optional)."
+        ),
+    )
+
+    zones: Optional[List[CountingZone]] = Field(
+        default=None,
+        description=(
+            "Segmentos de reta e polígonos contados além da linha principal, na mesma passada, com contagem por zona (opcional).\n"
+            "English: Line segments and polygons counted besides the main line, in the same pass, with per-zone counts (optional)."
+        ),
+    )
+
+    sweep: Optional[List[SweepCandidate]] = Field(
+        default=None,
+        max_length=MAX_SWEEP_CANDIDATES,
+        example=[
+            {"orientation": "S", "line_position_ratio": 0.3},
+            {"orientation": "S", "line_position_ratio": 0.5},
+        ],
+        description=(
+            "Configurações de linha candidatas contadas na mesma passada; o resultado traz a contagem de cada uma (opcional).\n"
+            "English: Candidate line settings counted in the same pass; the result lists the count of each (optional)."
+        ),
+    )
+
 
 # Exemplo de como usar em video_routes.py:
 # from schemas import VideoRequest
@@ -37,8 +37,11 @@ psycopg2_stub = SimpleNamespace(pool=psycopg2_pool_stub)
 sys.modules.setdefault('psycopg2', psycopg2_stub)
 sys.modules.setdefault('psycopg2.pool', psycopg2_pool_stub)
 
-# Provide a tiny numpy stub
-sys.modules.setdefault(
-    'numpy',
-    SimpleNamespace(array=lambda *args, **kwargs: None),
-)
+# Provide a tiny numpy stub when NumPy itself is not installed
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    sys.modules.setdefault(
+        'numpy',
+        SimpleNamespace(array=lambda *args, **kwargs: None),
+    )
@@ -0,0 +1,84 @@
+"""Tests for job checkpoints and resume helpers."""
+
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.checkpoint import (  # isort: skip
+    CHECKPOINT_VERSION,
+    ResumeIdMapper,
+    list_checkpoints,
+    load_checkpoint,
+    part_path,
+    remove_checkpoint,
+    save_checkpoint,
+)
+from utils.event_log import EventLog, read_events  # isort: skip
+
+
+def test_save_and_load_checkpoint_round_trip(tmp_path):
+    state = {"video_name": "a.mp4", "pts_ms": 1000.0, "counter": {"total": 3}}
+
+    path = save_checkpoint("a.mp4", state, str(tmp_path))
+
+    assert os.listdir(tmp_path) == ["a.mp4.json"]
+    assert load_checkpoint("a.mp4", str(tmp_path)) == dict(
+        state, version=CHECKPOINT_VERSION
+    )
+    save_checkpoint("a.mp4", dict(state, pts_ms=2000.0), str(tmp_path))
+    assert load_checkpoint("a.mp4", str(tmp_path))["pts_ms"] == 2000.0
+    remove_checkpoint("a.mp4", str(tmp_path))
+    assert not os.path.exists(path)
+    assert load_checkpoint("a.mp4", str(tmp_path)) is None
+
+
+def test_unreadable_or_stale_checkpoints_are_ignored(tmp_path):
+    (tmp_path / "broken.mp4.json").write_text('{"pts_ms": 10')
+    (tmp_path / "old.mp4.json").write_text(json.dumps({"version": 0}))
+    save_checkpoint("ok.mp4", {"video_name": "ok.mp4"}, str(tmp_path))
+
+    assert load_checkpoint("broken.mp4", str(tmp_path)) is None
+    assert [c["video_name"] for c in list_checkpoints(str(tmp_path))] == ["ok.mp4"]
+
+
+def test_part_path_numbers_parts_before_the_extension():
+    assert part_path("out/processed_a.mp4", 2) == "out/processed_a.part002.mp4"
+
+
+def test_resume_id_mapper_inherits_matching_ids_and_shifts_new_ones():
+    mapper = ResumeIdMapper([[7, 0, 0, 10, 10], [9, 50, 50, 60, 60]], id_offset=9)
+
+    first = mapper(np.array([1, 2]), np.array([[1, 1, 11, 11], [80, 80, 90, 90]]))
+    assert first.tolist() == [7, 11]
+    # Mappings are stable; old id 7 cannot be inherited twice.
+    later = mapper(np.array([2, 1, 3]), np.array([[0, 0, 9, 9]] * 3))
+    assert later.tolist() == [11, 7, 12]
+
+
+def test_resume_id_mapper_stops_matching_after_match_frames():
+    mapper = ResumeIdMapper([[4, 0, 0, 10, 10]], id_offset=4, match_frames=1)
+
+    mapper(np.array([1]), np.array([[50, 50, 60, 60]]))
+    assert mapper(np.array([2]), np.array([[0, 0, 10, 10]])).tolist() == [6]
+
+
+def test_event_log_resume_drops_events_after_the_checkpoint(tmp_path):
+    path = str(tmp_path / "a.mp4.jsonl")
+    def event(track_id):
+        return (100.0, track_id, "cow", 3, 0.9, [0, 0, 1, 1])
+
+    with EventLog(path) as log:
+        log.append(event(1))
+        offset, count = log.bytes, log.count
+        log.append(event(2))
+
+    with EventLog(path, offset=offset, count=count) as log:
+        log.append(event(3))
+        assert log.count == 2
+
+    page = read_events(path)
+    assert [e["track_id"] for e in page["events"]] == [1, 3]
+    assert page["total"] == 2
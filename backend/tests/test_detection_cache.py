@@ -0,0 +1,65 @@
+"""Tests for the per-video detection cache."""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.detection_cache import (  # isort: skip
+    DetectionRecorder,
+    cache_key,
+    cache_path,
+    evict,
+    load_cached,
+)
+from utils.tracking import FrameDetections  # isort: skip
+
+
+def _detections(ids, y):
+    n = len(ids)
+    return FrameDetections(
+        boxes=np.array([[0, y, 10, y + 10]] * n, dtype=np.float32).reshape(-1, 4),
+        track_ids=np.array(ids, dtype=np.int64),
+        classes=np.zeros(n, dtype=np.int64),
+        confidences=np.full(n, 0.5, dtype=np.float32),
+    )
+
+
+def test_recorder_round_trip_keeps_empty_frames(tmp_path):
+    recorder = DetectionRecorder()
+    recorder.add(0.0, _detections([1, 2], 10))
+    recorder.add(33.3, FrameDetections.empty())
+    recorder.add(66.7, _detections([2], 30))
+    recorder.save("key", {0: "cow"}, meta={"fps": 30.0}, directory=str(tmp_path))
+
+    cached = load_cached("key", str(tmp_path))
+
+    assert len(cached) == 3 and cached.names == {0: "cow"}
+    assert cached.meta == {"fps": 30.0}
+    frames = list(cached.frames())
+    assert [t for t, _ in frames] == [0.0, 33.3, 66.7]
+    assert [f.track_ids.tolist() for _, f in frames] == [[1, 2], [], [2]]
+    np.testing.assert_array_equal(frames[2][1].boxes, [[0, 30, 10, 40]])
+    detector = cached.detector()
+    assert [len(f) for f in detector([None, None])] == [2, 0]
+    assert [len(f) for f in detector([None, None])] == [1, 0]
+
+
+def test_cache_key_ignores_param_order_but_not_values():
+    a = cache_key("ab" * 32, {"model_choice": "n", "imgsz": 640})
+    assert a == cache_key("ab" * 32, {"imgsz": 640, "model_choice": "n"})
+    assert a != cache_key("ab" * 32, {"imgsz": 512, "model_choice": "n"})
+    assert a != cache_key("cd" * 32, {"model_choice": "n", "imgsz": 640})
+
+
+def test_evict_removes_least_recently_used_entries(tmp_path):
+    for age, key in enumerate(["new", "mid", "old"]):
+        path = DetectionRecorder().save(key, {0: "cow"}, directory=str(tmp_path))
+        os.utime(path, (1000 - age, 1000 - age))
+    size = os.path.getsize(cache_path("old", str(tmp_path)))
+
+    # A hit makes "old" the most recently used entry.
+    assert load_cached("old", str(tmp_path)) is not None
+    assert evict(2 * size, str(tmp_path)) == ["mid.npz"]
+    assert sorted(os.listdir(tmp_path)) == ["new.npz", "old.npz"]
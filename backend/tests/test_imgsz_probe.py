@@ -0,0 +1,78 @@
+"""Tests for the per-video ``imgsz`` probe."""
+
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.imgsz_probe import (  # isort: skip
+    DEFAULT_IMGSZ_LADDER,
+    choose_imgsz,
+    imgsz_ladder,
+    probe_imgsz,
+    sample_times,
+)
+
+
+class _Array:
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.data
+
+
+def _model(boxes_per_frame):
+    calls = []
+
+    def predict(frames, **kwargs):
+        calls.append(kwargs["imgsz"])
+        return [
+            SimpleNamespace(boxes=SimpleNamespace(xyxy=_Array(boxes)))
+            for boxes in boxes_per_frame[: len(frames)]
+        ]
+
+    return SimpleNamespace(predict=predict, calls=calls)
+
+
+def test_choose_imgsz_picks_smallest_size_keeping_boxes_visible():
+    # Close-up: boxes are 20% of the frame, 320 gives 64 px.
+    assert choose_imgsz(np.array([0.2, 0.25]), min_box_px=24) == 320
+    # 4% of the frame needs 600 px to reach 24 px.
+    assert choose_imgsz(np.array([0.04]), min_box_px=24) == 640
+    # Too small even for the largest step.
+    assert choose_imgsz(np.array([0.001]), min_box_px=24) == 1280
+    assert choose_imgsz(np.zeros(0)) is None
+
+
+def test_probe_imgsz_measures_boxes_at_the_largest_ladder_size():
+    frames = [np.zeros((360, 640, 3), dtype=np.uint8)] * 2
+    model = _model([[[0, 0, 32, 40]], [[100, 100, 132, 150], [0, 0, 64, 64]]])
+
+    report = probe_imgsz(model, frames, ladder=(320, 512, 640), min_box_px=16)
+
+    assert model.calls == [640]
+    assert report["detections"] == 3
+    assert report["frames"] == 2
+    # 32 px of 640 -> 5%, needs 320 px for 16 px boxes.
+    assert report["box_ratio"] == 0.05
+    assert report["imgsz"] == 320
+
+
+def test_probe_without_detections_leaves_imgsz_unset():
+    frames = [np.zeros((100, 100, 3), dtype=np.uint8)]
+    report = probe_imgsz(_model([np.zeros((0, 4))]), frames)
+    assert report["imgsz"] is None
+    assert report["box_ratio"] is None
+
+
+def test_ladder_and_sample_times():
+    assert imgsz_ladder("640, 320,bad") == DEFAULT_IMGSZ_LADDER
+    assert imgsz_ladder("640, 320") == (320, 640)
+    assert imgsz_ladder("") == DEFAULT_IMGSZ_LADDER
+    assert sample_times(0, 1000, 4) == [125, 375, 625, 875]
+    assert sample_times(500, 500, 4) == [500]
@@ -0,0 +1,54 @@
+"""Tests for the NumPy IoU/centroid tracker."""
+
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.iou_tracker import IoUTracker  # isort: skip
+
+
+def _det(*rows):
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+def test_tracker_keeps_ids_when_detections_reorder():
+    tracker = IoUTracker()
+    first = tracker.update(_det([0, 0, 20, 20, 0.9, 0], [100, 0, 120, 20, 0.8, 0]))
+    second = tracker.update(_det([102, 3, 122, 23, 0.8, 0], [2, 3, 22, 23, 0.9, 0]))
+
+    assert first[:, 4].tolist() == [1, 2]
+    assert second[:, 4].tolist() == [2, 1]
+    assert second[:, 7].tolist() == [0, 1]
+    assert second.shape == (2, 8)
+
+
+def test_velocity_prediction_follows_fast_animals():
+    """A missed frame is bridged by shifting the box by its velocity."""
+
+    tracker = IoUTracker(max_distance=0.2)
+    for y in (0, 8, 16, 24, 32):
+        assert tracker.update(_det([0, y, 20, y + 20, 0.9, 0]))[0, 4] == 1
+    # Missed once while another animal is seen far away.
+    tracker.update(_det([500, 500, 520, 520, 0.9, 0]))
+    # 16 px further: IoU 0.11 with the last box, but not with the prediction.
+    assert tracker.update(_det([0, 48, 20, 68, 0.9, 0]))[0, 4] == 1
+
+
+def test_classes_are_not_mixed_and_old_tracks_expire():
+    tracker = IoUTracker(max_age=1)
+    tracker.update(_det([0, 0, 20, 20, 0.9, 0]))
+    other = tracker.update(_det([0, 0, 20, 20, 0.9, 1]))
+    assert other[0, 4] == 2
+
+    tracker.update(_det([500, 500, 520, 520, 0.9, 1]))
+    assert len(tracker) == 2
+    assert tracker.update(_det([0, 0, 20, 20, 0.9, 0]))[0, 4] == 4
+
+
+def test_tracker_reads_ultralytics_boxes_and_empty_input():
+    tracker = IoUTracker()
+    boxes = SimpleNamespace(data=_det([0, 0, 10, 10, 0.5, 2]))
+    assert tracker.update(boxes)[0, 6] == 2
+    assert tracker.update(_det()).shape == (0, 8)
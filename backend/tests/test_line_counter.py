@@ -0,0 +1,111 @@
+"""Tests for the vectorized line-crossing counter."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.line_counter import LineCounter  # isort: skip
+
+
+def _reference_counts(frames, line_type, direction, line_coord, target_classes):
+    """Per-box dict implementation the counter replaced."""
+
+    counted, prev_x, prev_y, por_classe = set(), {}, {}, {}
+    for track_ids, classes, boxes in frames:
+        current = set()
+        for track_id, cls_id, box in zip(track_ids, classes, boxes):
+            current.add(track_id)
+            x1, y1, x2, y2 = map(int, box)
+            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+            if track_id not in counted and track_id in prev_x:
+                prev = prev_y[track_id] if line_type == "horizontal" else prev_x[track_id]
+                curr = cy if line_type == "horizontal" else cx
+                if direction in ("top_bottom", "left_right"):
+                    crossed = prev < line_coord <= curr
+                else:
+                    crossed = prev > line_coord >= curr
+                if crossed and (target_classes is None or cls_id in target_classes):
+                    counted.add(track_id)
+                    por_classe[cls_id] = por_classe.get(cls_id, 0) + 1
+            prev_x[track_id], prev_y[track_id] = cx, cy
+        for tid in list(prev_x):
+            if tid not in current:
+                del prev_x[tid], prev_y[tid]
+    return len(counted), por_classe
+
+
+def _random_frames(rng, n_frames=60, n_tracks=40, size=200):
+    pos = rng.uniform(0, size, (n_tracks, 2))
+    vel = rng.uniform(-12, 12, (n_tracks, 2))
+    classes = rng.integers(0, 3, n_tracks)
+    frames = []
+    for _ in range(n_frames):
+        pos += vel
+        visible = rng.random(n_tracks) > 0.15
+        ids = np.flatnonzero(visible)
+        rng.shuffle(ids)
+        half = rng.uniform(3, 9, (ids.size, 1))
+        boxes = np.hstack((pos[ids] - half, pos[ids] + half)).astype(np.float32)
+        frames.append((ids.tolist(), classes[ids].tolist(), boxes))
+    return frames
+
+
+@pytest.mark.parametrize(
+    "line_type,direction",
+    [
+        ("horizontal", "top_bottom"),
+        ("horizontal", "bottom_top"),
+        ("vertical", "left_right"),
+        ("vertical", "right_left"),
+    ],
+)
+@pytest.mark.parametrize("target_classes", [None, {0, 2}])
+def test_line_counter_matches_per_box_reference(line_type, direction, target_classes):
+    rng = np.random.default_rng(7)
+    for _ in range(5):
+        frames = _random_frames(rng)
+        counter = LineCounter(line_type, direction, 100, target_classes)
+        for track_ids, classes, boxes in frames:
+            counter.update(np.array(track_ids), np.array(classes), boxes)
+
+        total, por_classe = _reference_counts(
+            frames, line_type, direction, 100, target_classes
+        )
+        assert counter.total == total
+        assert counter.counts_by_class == por_classe
+
+
+def test_line_counter_counts_each_track_once_and_drops_missing_tracks():
+    counter = LineCounter("horizontal", "top_bottom", 50)
+    box = lambda cy: [[0, cy - 5, 10, cy + 5]]  # noqa: E731
+
+    counter.update(np.array([1]), np.array([0]), np.array(box(40)))
+    assert counter.update(np.array([1]), np.array([0]), np.array(box(55))).tolist() == [True]
+    counter.update(np.array([1]), np.array([0]), np.array(box(40)))
+    counter.update(np.array([1]), np.array([0]), np.array(box(60)))
+    assert counter.total == 1
+    assert counter.is_counted(np.array([1, 2])).tolist() == [True, False]
+
+    # Track 2 disappears for a frame, so its previous position is forgotten.
+    counter.update(np.array([2]), np.array([0]), np.array(box(40)))
+    counter.update(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros((0, 4)))
+    counter.update(np.array([2]), np.array([0]), np.array(box(60)))
+    assert counter.total == 1
+
+
+def test_line_counter_state_round_trip_continues_counting():
+    counter = LineCounter("horizontal", "top_bottom", 50)
+    box = lambda cy: [[0, cy - 5, 10, cy + 5]]  # noqa: E731
+    counter.update(np.array([1, 2]), np.array([0, 0]), np.array(box(40) + box(45)))
+    counter.update(np.array([1, 2]), np.array([0, 0]), np.array(box(60) + box(48)))
+
+    restored = LineCounter("horizontal", "top_bottom", 50)
+    restored.restore(counter.state())
+
+    assert restored.total == 1 and restored.counts_by_class == {0: 1}
+    # Track 2 keeps its previous position and crosses after the restore.
+    crossed = restored.update(
+        np.array([1, 2]), np.array([0, 0]), np.array(box(70) + box(55))
+    )
+    assert crossed.tolist() == [False, True]
+    assert restored.total == 2
@@ -0,0 +1,85 @@
+"""Tests for the cached media probe."""
+
+import json
+import os
+import subprocess
+from types import SimpleNamespace
+
+from utils.media_probe import (  # isort: skip
+    discard_probe,
+    parse_probe,
+    probe_media,
+    probe_path,
+)
+
+
+def _ffprobe_output(pts, rotation=None, tags=None):
+    stream = {
+        "codec_name": "h264",
+        "width": 1920,
+        "height": 1080,
+        "avg_frame_rate": "30/1",
+        "nb_read_packets": str(len(pts)),
+        "duration": "4.000000",
+        "tags": tags or {},
+    }
+    if rotation is not None:
+        stream["side_data_list"] = [
+            {"side_data_type": "Display Matrix", "rotation": rotation}
+        ]
+    return {"streams": [stream], "format": {"duration": "4.000000"}}
+
+
+def test_parse_probe_counts_packets_and_averages_variable_frame_rate():
+    # 2 s at 30 fps followed by 2 s at 10 fps.
+    pts = [i / 30 for i in range(60)] + [2 + i / 10 for i in range(20)]
+    media = parse_probe(_ffprobe_output(pts, rotation=-90))
+
+    assert media["frame_count"] == 80
+    assert media["fps"] == 20.0
+    assert media["duration_ms"] == 4000.0
+    assert media["rotation"] == 90
+    assert media["codec"] == "h264"
+
+
+def test_parse_probe_reads_legacy_rotate_tag():
+    media = parse_probe(_ffprobe_output([0.0], tags={"rotate": "270"}))
+    assert media["rotation"] == 270
+
+
+def test_probe_media_runs_ffprobe_once_per_file(tmp_path, monkeypatch):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"v1")
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return SimpleNamespace(stdout=json.dumps(_ffprobe_output([0.0, 0.5])))
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    first = probe_media(str(video))
+    assert probe_media(str(video)) == first
+    assert len(calls) == 1
+    assert os.path.exists(probe_path(str(video)))
+
+    # A different file under the same name is probed again.
+    video.write_bytes(b"other")
+    os.utime(video, ns=(1, 1))
+    probe_media(str(video))
+    assert len(calls) == 2
+
+    discard_probe(str(video))
+    assert not os.path.exists(probe_path(str(video)))
+
+
+def test_probe_media_returns_none_when_ffprobe_fails(tmp_path, monkeypatch):
+    video = tmp_path / "broken.mp4"
+    video.write_bytes(b"not a video")
+
+    def fake_run(cmd, **kwargs):
+        raise subprocess.CalledProcessError(1, cmd)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    assert probe_media(str(video)) is None
+    assert probe_media(str(tmp_path / "missing.mp4")) is None
+    assert not os.path.exists(probe_path(str(video)))
@@ -0,0 +1,249 @@
+"""Tests for the process-wide YOLO model registry."""
+
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+from utils.model_registry import Int8UnavailableError, ModelRegistry, resolve_model_path
+
+
+def _fake_loader(loaded, size_bytes=100):
+    param = SimpleNamespace(numel=lambda: size_bytes, element_size=lambda: 1)
+
+    def loader(path):
+        model = SimpleNamespace(
+            path=path,
+            model=SimpleNamespace(parameters=lambda: [param]),
+            predictor=SimpleNamespace(trackers=["old"]),
+        )
+        loaded.append(path)
+        return model
+
+    return loader
+
+
+def test_registry_reuses_resident_model_and_resets_tracker(tmp_path):
+    """Load each model once and hand out a fresh tracker state per job."""
+
+    loaded = []
+    registry = ModelRegistry(memory_budget_bytes=10**9, loader=_fake_loader(loaded))
+
+    with registry.lease("l") as model:
+        assert not hasattr(model.predictor, "trackers")
+        model.predictor.trackers = ["state from job 1"]
+
+    with registry.lease("L") as again:
+        assert again is model
+        assert not hasattr(again.predictor, "trackers")
+
+    assert loaded == ["yolov8l.pt"]
+
+
+def _tracking_model():
+    """Fake YOLO mimicking how ``Model.track`` registers tracker callbacks."""
+
+    def on_predict_start(predictor, persist=False):
+        predictor.trackers = ["tracker"]
+
+    def on_predict_postprocess_end(predictor, persist=False):
+        pass
+
+    for func in (on_predict_start, on_predict_postprocess_end):
+        func.__module__ = "ultralytics.trackers.track"
+
+    def user_callback(predictor):
+        pass
+
+    callbacks = {
+        "on_predict_start": [user_callback],
+        "on_predict_postprocess_end": [],
+    }
+    model = SimpleNamespace(
+        callbacks=callbacks,
+        predictor=SimpleNamespace(callbacks=callbacks),
+        model=SimpleNamespace(parameters=lambda: []),
+    )
+
+    def track():
+        if not hasattr(model.predictor, "trackers"):
+            callbacks["on_predict_start"].append(
+                partial(on_predict_start, persist=True)
+            )
+            callbacks["on_predict_postprocess_end"].append(
+                partial(on_predict_postprocess_end, persist=True)
+            )
+        for callback in callbacks["on_predict_start"]:
+            callback(model.predictor)
+
+    model.track = track
+    return model
+
+
+def test_registry_reuse_does_not_stack_tracker_callbacks():
+    """Leasing a warm model again keeps one set of tracking callbacks."""
+
+    model = _tracking_model()
+    registry = ModelRegistry(memory_budget_bytes=10**9, loader=lambda path: model)
+
+    for _ in range(3):
+        with registry.lease("l") as leased:
+            leased.track()
+            assert len(leased.callbacks["on_predict_start"]) == 2
+            assert len(leased.callbacks["on_predict_postprocess_end"]) == 1
+
+    # Released models carry no tracking callbacks into ``predict`` detectors.
+    assert [len(funcs) for funcs in model.callbacks.values()] == [1, 0]
+    assert not hasattr(model.predictor, "trackers")
+
+
+def test_registry_evicts_least_recently_used_idle_model():
+    """Evict idle instances in LRU order once the budget is exceeded."""
+
+    loaded = []
+    registry = ModelRegistry(memory_budget_bytes=250, loader=_fake_loader(loaded))
+
+    with registry.lease("n"):
+        pass
+    with registry.lease("m"):
+        pass
+    with registry.lease("n"):
+        pass
+    with registry.lease("l"):
+        pass
+
+    assert registry.stats()["idle"] == ["yolov8n.pt", "yolov8l.pt"]
+    assert registry.resident_bytes() == 200
+    assert loaded == ["yolov8n.pt", "yolov8m.pt", "yolov8l.pt"]
+
+
+def test_resolve_model_path_defaults_to_large():
+    assert resolve_model_path("p") == "best.pt"
+    assert resolve_model_path(None) == "yolov8l.pt"
+
+
+def test_registry_exports_once_per_weights_hash_and_imgsz(tmp_path, monkeypatch):
+    """Exported artifacts are cached on disk and keyed by hash and imgsz."""
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "yolov8n.pt").write_bytes(b"weights v1")
+    exports = []
+
+    def exporter(weights, backend, imgsz):
+        exports.append((weights, backend, imgsz))
+        out = tmp_path / f"export-{len(exports)}.onnx"
+        out.write_bytes(b"onnx")
+        return str(out)
+
+    loaded = []
+    registry = ModelRegistry(
+        memory_budget_bytes=10**9,
+        loader=_fake_loader(loaded),
+        exporter=exporter,
+        export_dir=str(tmp_path / "cache"),
+    )
+
+    with registry.lease("n", imgsz=512, backend="onnx"):
+        pass
+    with registry.lease("n", imgsz=512, backend="onnx"):
+        pass
+    with registry.lease("n", imgsz=320, backend="onnx"):
+        pass
+    (tmp_path / "yolov8n.pt").write_bytes(b"weights v2 (retrained)")
+    retrained = ModelRegistry(
+        loader=_fake_loader(loaded),
+        exporter=exporter,
+        export_dir=str(tmp_path / "cache"),
+    )
+    retrained.acquire("n", imgsz=512, backend="onnx")
+
+    assert [imgsz for _, _, imgsz in exports] == [512, 320, 512]
+    assert len(set(loaded)) == 3
+    assert all(path.endswith(".onnx") and "cache" in path for path in loaded)
+    assert sorted(p.name.split("-")[-1] for p in (tmp_path / "cache").iterdir()) == [
+        "320.onnx",
+        "512.onnx",
+        "512.onnx",
+    ]
+
+
+def test_registry_falls_back_to_torch_when_export_fails(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def exporter(weights, backend, imgsz):
+        raise RuntimeError("onnxruntime missing")
+
+    (tmp_path / "yolov8n.pt").write_bytes(b"weights")
+    registry = ModelRegistry(
+        loader=_fake_loader([]), exporter=exporter, export_dir=str(tmp_path)
+    )
+
+    assert registry.resolve_key("n", 512, "onnx") == "yolov8n.pt"
+    assert registry.resolve_key("n", 512, "torch") == "yolov8n.pt"
+
+
+def test_int8_choice_exports_calibrated_openvino_model(tmp_path, monkeypatch):
+    """``l-int8`` is an OpenVINO INT8 export keyed by the calibration set."""
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("YOLO_IMG_SIZE", raising=False)
+    (tmp_path / "yolov8l.pt").write_bytes(b"weights")
+    calibration = tmp_path / "calibration" / "clip"
+    calibration.mkdir(parents=True)
+    (calibration / "frame_0000.jpg").write_bytes(b"jpeg 0")
+    exports = []
+
+    def exporter(weights, backend, imgsz, calibration=None):
+        exports.append((weights, backend, imgsz, calibration))
+        out = tmp_path / f"export-{len(exports)}"
+        out.mkdir()
+        return str(out)
+
+    registry = ModelRegistry(
+        loader=_fake_loader([]),
+        exporter=exporter,
+        export_dir=str(tmp_path / "cache"),
+        calibration=str(tmp_path / "calibration"),
+    )
+
+    assert not registry.int8_available("l-int8")
+    first = registry.resolve_key("l-int8", imgsz=512, quantize=True)
+    assert registry.resolve_key("L-INT8", imgsz=512) == first
+    assert registry.int8_available("l-int8")
+    # Only the exported size is available: jobs at 640 would fail.
+    assert not registry.int8_available("l-int8", imgsz=640)
+    monkeypatch.setenv("YOLO_IMG_SIZE", "640")
+    assert not registry.int8_available("l-int8")
+    (calibration / "frame_0001.jpg").write_bytes(b"jpeg 1")
+    with pytest.raises(Int8UnavailableError):
+        registry.resolve_key("l-int8", imgsz=512)
+    second = registry.resolve_key("l-int8", imgsz=512, quantize=True)
+
+    assert resolve_model_path("l-int8") == "yolov8l.pt"
+    assert [e[:3] for e in exports] == [("yolov8l.pt", "openvino", 512)] * 2
+    assert "-512-int8-" in first and first.endswith("_openvino_model")
+    assert second != first
+
+
+def test_int8_choice_without_export_is_rejected(tmp_path, monkeypatch):
+    """An ``-int8`` choice never falls back to FP32 or quantizes inline."""
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "yolov8n.pt").write_bytes(b"weights")
+    calibration = tmp_path / "calibration"
+    calibration.mkdir()
+    (calibration / "frame_0000.jpg").write_bytes(b"jpeg 0")
+    exports = []
+    registry = ModelRegistry(
+        loader=_fake_loader([]),
+        exporter=lambda *args, **kwargs: exports.append(args),
+        export_dir=str(tmp_path / "cache"),
+        calibration=str(calibration),
+    )
+
+    with pytest.raises(Int8UnavailableError, match="calibrate_int8.py"):
+        registry.resolve_key("n-int8", imgsz=512)
+    assert exports == []
+    assert not ModelRegistry(calibration=str(tmp_path / "missing")).int8_available(
+        "n-int8"
+    )
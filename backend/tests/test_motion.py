@@ -0,0 +1,33 @@
+"""Tests for the motion gate placed in front of inference."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.motion import MotionGate  # isort: skip
+
+
+def _frame(bright_rows=()):
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    for row in bright_rows:
+        frame[row : row + 20] = 255
+    return frame
+
+
+def test_motion_gate_only_watches_the_band_around_the_line():
+    gate = MotionGate(0.01, max_idle=100, band=(0.25, 0.75))
+
+    assert gate.should_infer(_frame())
+    assert not gate.should_infer(_frame())
+    # Change outside the band (top rows) is ignored.
+    assert not gate.should_infer(_frame(bright_rows=[0]))
+    assert gate.should_infer(_frame(bright_rows=[50]))
+    assert gate.report() == {"frames": 4, "gated_frames": 2, "gated_fraction": 0.5}
+
+
+def test_motion_gate_forces_inference_after_max_idle_frames():
+    gate = MotionGate(0.01, max_idle=3)
+
+    decisions = [gate.should_infer(_frame()) for _ in range(9)]
+
+    assert decisions == [True, False, False, False, True, False, False, False, True]
@@ -0,0 +1,50 @@
+"""Tests for the bounded-queue pipeline helpers."""
+
+from utils.pipeline import END_OF_STREAM, Pipeline
+
+
+def test_pipeline_preserves_order_and_reports_stage_stats():
+    pipeline = Pipeline(queue_size=2)
+    producer_stats = pipeline.stage("decode")
+    consumer_stats = pipeline.stage("inference")
+    q = pipeline.new_queue()
+
+    def produce():
+        for index in range(10):
+            pipeline.put(q, index, producer_stats)
+        pipeline.put(q, END_OF_STREAM, producer_stats)
+
+    pipeline.start_thread("producer", produce)
+    received = []
+    while True:
+        item = pipeline.get(q, consumer_stats)
+        if item is END_OF_STREAM:
+            break
+        received.append(item)
+    pipeline.join()
+
+    assert received == list(range(10))
+    assert set(pipeline.report()) == {"decode", "inference"}
+    assert pipeline.report()["decode"]["wait_seconds"] >= 0
+
+
+def test_pipeline_stop_unblocks_full_producer():
+    pipeline = Pipeline(queue_size=1)
+    stats = pipeline.stage("decode")
+    q = pipeline.new_queue()
+    produced = []
+
+    def produce():
+        index = 0
+        while pipeline.put(q, index, stats):
+            produced.append(index)
+            index += 1
+        pipeline.put(q, END_OF_STREAM, stats)
+
+    pipeline.start_thread("producer", produce)
+    assert pipeline.get(q, pipeline.stage("inference")) == 0
+    pipeline.stop()
+    pipeline.join(timeout=5)
+
+    assert pipeline.errors == []
+    assert len(produced) <= 3
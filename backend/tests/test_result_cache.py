@@ -0,0 +1,66 @@
+"""Tests for the result key and the shared-job registry."""
+
+from utils.result_cache import RunningJobs, UploadHashes, result_key
+
+
+def test_result_key_ignores_irrelevant_options_and_class_order():
+    options = {"orientation": "S", "target_classes": ["cow", "sheep"]}
+    key = result_key("a" * 64, options)
+
+    assert key == result_key(
+        "a" * 64,
+        dict(options, target_classes=["sheep", "cow"], frame_skip=1, resume=True),
+    )
+    assert key != result_key("b" * 64, options)
+    assert key != result_key("a" * 64, dict(options, orientation="N"))
+    assert key != result_key("a" * 64, dict(options, trim_end_ms=5000))
+
+
+def test_result_key_resolves_environment_settings(monkeypatch):
+    """A server-side configuration change never reuses an older result."""
+
+    for name in ("YOLO_IMG_SIZE", "INFERENCE_BACKEND", "TRACKER", "ROI_BAND_RATIO"):
+        monkeypatch.delenv(name, raising=False)
+    options = {"orientation": "S"}
+    key = result_key("a" * 64, options)
+
+    # Explicit values equal to the defaults resolve to the same key.
+    assert key == result_key("a" * 64, dict(options, tracker="botsort"))
+    assert key == result_key("a" * 64, dict(options, roi_band_ratio=0.0))
+    for name, value in {
+        "YOLO_IMG_SIZE": "640",
+        "INFERENCE_BACKEND": "onnx",
+        "TRACKER": "iou",
+        "ROI_BAND_RATIO": "0.3",
+        "MOTION_GATE_THRESHOLD": "0.02",
+        "TILE_OVERLAP": "0.3",
+    }.items():
+        with monkeypatch.context() as patch:
+            patch.setenv(name, value)
+            assert result_key("a" * 64, options) != key, name
+
+
+def test_upload_hashes_drop_the_oldest_entries():
+    hashes = UploadHashes(max_entries=2)
+    for name in ("a.mp4", "b.mp4", "c.mp4"):
+        hashes.put(name, name.upper())
+
+    assert len(hashes) == 2
+    assert hashes.pop("a.mp4") is None
+    assert hashes.pop("c.mp4") == "C.MP4"
+    assert len(hashes) == 1
+
+
+def test_running_jobs_attach_and_release():
+    jobs = RunningJobs()
+
+    assert jobs.claim("k", "first.mp4") is None
+    assert jobs.claim("k", "second.mp4") == "first.mp4"
+    assert jobs.claim("k", "third.mp4") == "first.mp4"
+    assert jobs.owner_of("second.mp4") == "first.mp4"
+    assert jobs.detach("third.mp4") is True
+
+    assert jobs.release("first.mp4") == ["second.mp4"]
+    assert jobs.owner_of("second.mp4") is None
+    # The key is free again once its job is gone.
+    assert jobs.claim("k", "fourth.mp4") is None
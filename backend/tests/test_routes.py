@@ -10,6 +10,7 @@ accepts videos with permitted extensions.
 """
 
 import os
+from types import SimpleNamespace
 
 import pytest
 from fastapi import FastAPI
@@ -65,6 +66,26 @@ def test_upload_video_endpoint_accepts_valid_extension(tmp_path):
     assert saved_path.exists()
 
 
+def test_upload_video_endpoint_survives_a_failed_probe(tmp_path, monkeypatch):
+    """The upload is stored even when probing it raises."""
+
+    import routes.video_routes as video_routes
+
+    monkeypatch.setattr(video_routes, "UPLOAD_FOLDER", str(tmp_path))
+
+    def broken_probe(path):
+        raise RuntimeError("ffprobe travou")
+
+    monkeypatch.setattr(video_routes, "probe_media", broken_probe)
+    client = TestClient(app)
+    response = client.post(
+        "/upload-video/",
+        files={"file": ("video.mp4", b"data", "video/mp4")},
+    )
+    assert response.status_code == 200
+    assert (tmp_path / response.json()["nome_arquivo"]).exists()
+
+
 @pytest.mark.parametrize("orientation", ["INVALID", "NE"])
 def test_predict_video_endpoint_rejects_invalid_orientation(orientation):
     """Return 400 when orientation code is invalid or diagonal."""
@@ -97,6 +118,29 @@ def test_predict_video_endpoint_accepts_valid_orientation(monkeypatch):
     assert response.json()["status"] == "iniciado"
 
 
+def test_predict_video_endpoint_rejects_int8_without_export(monkeypatch):
+    """Return 400 instead of silently counting with the FP32 model."""
+
+    import routes.video_routes as video_routes
+
+    monkeypatch.setattr(
+        video_routes,
+        "get_model_registry",
+        lambda: SimpleNamespace(int8_available=lambda choice: False),
+    )
+    client = TestClient(app)
+    response = client.post(
+        "/predict-video/",
+        json={
+            "nome_arquivo": "video.mp4",
+            "orientation": "N",
+            "model_choice": "l-int8",
+        },
+    )
+    assert response.status_code == 400
+    assert "calibrate_int8.py" in response.json()["detail"]
+
+
 def test_orientation_map_endpoint_returns_map():
     """Orientation map endpoint should return mapping with arrow symbols."""
     client = TestClient(app)
@@ -106,3 +150,171 @@ def test_orientation_map_endpoint_returns_map():
     assert set(data.keys()) == {"N", "E", "S", "W"}
     assert data["N"]["label"] == "North"
     assert data["S"]["arrow"] == "\u2193"
+
+
+def test_eventos_endpoint_pages_through_event_log(tmp_path, monkeypatch):
+    """Page through the JSON Lines event log and 404 for unknown videos."""
+
+    from utils.event_log import EventLog, event_log_path
+
+    monkeypatch.setenv("EVENTS_DIR", str(tmp_path))
+    with EventLog(event_log_path("video.mp4")) as log:
+        for track_id in range(1, 6):
+            log.append((track_id * 100.0, track_id, "cow", 3, 0.9, [0, 0, 1, 1]))
+
+    client = TestClient(app)
+    response = client.get("/eventos/video.mp4", params={"offset": 3, "limit": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert [event["track_id"] for event in body["events"]] == [4, 5]
+    assert body["total"] == 5 and body["next_offset"] is None
+
+    first = client.get("/eventos/video.mp4", params={"limit": 2}).json()
+    assert first["next_offset"] == 2
+
+    assert client.get("/eventos/other.mp4").status_code == 404
+
+
+def test_resume_interrupted_jobs_requeues_unfinished_checkpoints(tmp_path, monkeypatch):
+    """Unfinished jobs are re-enqueued with ``resume``; stale checkpoints go."""
+
+    import routes.video_routes as video_routes
+    from utils.checkpoint import list_checkpoints, save_checkpoint
+
+    monkeypatch.setenv("CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(video_routes, "UPLOAD_FOLDER", str(tmp_path))
+    for name in ("running.mp4", "done.mp4", "missing.mp4"):
+        save_checkpoint(
+            name, {"video_name": name, "pts_ms": 500.0, "options": {"orientation": "S"}}
+        )
+    (tmp_path / "running.mp4").write_bytes(b"x")
+    (tmp_path / "done.mp4").write_bytes(b"x")
+    monkeypatch.setattr(
+        video_routes.progresso_manager,
+        "status",
+        lambda name: {"finalizado": name == "done.mp4"},
+    )
+    enqueued = []
+    monkeypatch.setattr(
+        video_routes.video_queue,
+        "enqueue",
+        lambda job_id, func, *args: enqueued.append(args),
+    )
+
+    assert video_routes.resume_interrupted_jobs() == ["running.mp4"]
+    assert enqueued == [("running.mp4", {"orientation": "S", "resume": True})]
+    assert [c["video_name"] for c in list_checkpoints()] == ["running.mp4"]
+
+
+def test_videos_processados_renders_pending_video_on_first_request(
+    tmp_path, monkeypatch
+):
+    """A pending render answers 202 and enqueues it; the file is served after."""
+
+    import routes.video_routes as video_routes
+
+    monkeypatch.setenv("RENDER_DIR", str(tmp_path / "renders"))
+    monkeypatch.setenv("PROCESSED_VIDEOS_DIR", str(tmp_path / "out"))
+    (tmp_path / "renders").mkdir()
+    (tmp_path / "renders" / "processed_a.mp4.json").write_text("{}")
+    enqueued = []
+    monkeypatch.setattr(
+        video_routes.render_queue,
+        "enqueue",
+        lambda job_id, func, *args: (
+            enqueued.append(job_id) or SimpleNamespace(status="queued"),
+            1,
+        ),
+    )
+
+    render_app = FastAPI()
+    render_app.include_router(video_routes.router)
+    client = TestClient(render_app)
+    response = client.get("/videos_processados/processed_a.mp4")
+    assert response.status_code == 202
+    assert response.json() == {
+        "status": "renderizando",
+        "queue_status": "queued",
+        "queue_position": 1,
+    }
+    assert enqueued == ["processed_a.mp4"]
+
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "processed_a.mp4").write_bytes(b"video")
+    response = client.get("/videos_processados/processed_a.mp4")
+    assert response.status_code == 200 and response.content == b"video"
+    assert client.get("/videos_processados/other.mp4").status_code == 404
+
+
+def test_predict_video_deduplicates_reuploaded_videos(tmp_path, monkeypatch):
+    """A re-upload joins the running job, then is answered from its result."""
+
+    import routes.video_routes as video_routes
+
+    monkeypatch.setattr(video_routes, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr(video_routes, "running_jobs", video_routes.RunningJobs())
+    stored = {}
+    finalized = {}
+    monkeypatch.setattr(
+        video_routes.progresso_manager,
+        "iniciar",
+        lambda name, result_key=None: stored.update({name: result_key}),
+    )
+    monkeypatch.setattr(
+        video_routes.progresso_manager,
+        "finalizar",
+        lambda name, resultado: finalized.update({name: resultado}),
+    )
+    monkeypatch.setattr(
+        video_routes.progresso_manager,
+        "resultado_por_chave",
+        lambda key: next(
+            (finalized[n] for n, k in stored.items() if k == key and n in finalized),
+            None,
+        ),
+    )
+    monkeypatch.setattr(
+        video_routes.progresso_manager, "status", lambda name: {"finalizado": True}
+    )
+    enqueued = []
+    monkeypatch.setattr(
+        video_routes.video_queue,
+        "enqueue",
+        lambda job_id, func, *args: (
+            enqueued.append(args) or SimpleNamespace(status="queued"),
+            1,
+        ),
+    )
+    dedup_app = FastAPI()
+    dedup_app.include_router(video_routes.router)
+    client = TestClient(dedup_app)
+
+    def upload():
+        response = client.post(
+            "/upload-video/", files={"file": ("video.mp4", b"same", "video/mp4")}
+        )
+        return response.json()["nome_arquivo"]
+
+    def predict(name):
+        return client.post(
+            "/predict-video/", json={"nome_arquivo": name, "orientation": "S"}
+        ).json()
+
+    first, second, third = upload(), upload(), upload()
+    assert predict(first)["status"] == "iniciado"
+    assert enqueued[0][1]["video_hash"] == video_routes.content_hash(
+        str(tmp_path / first)
+    )
+
+    attached = predict(second)
+    assert attached["attached_to"] == first and len(enqueued) == 1
+
+    video_routes._settle_attached(first, {"total_count": 7})
+    assert finalized[second] == {"total_count": 7}
+    assert not (tmp_path / second).exists()
+
+    finalized[first] = {"total_count": 7}
+    cached = predict(third)
+    assert cached["status"] == "finalizado"
+    assert cached["resultado"] == {"total_count": 7}
+    assert len(enqueued) == 1 and not (tmp_path / third).exists()
@@ -0,0 +1,123 @@
+"""Tests for segment planning and stitching of parallel counts."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from utils import segments as segments_module  # isort: skip
+from utils.segments import match_tracks, plan_segments, stitch_segments  # isort: skip
+
+
+def test_plan_segments_overlaps_and_limits_short_videos():
+    segments = plan_segments(0, 60000, 4, 2000)
+
+    assert [(s.read_start_ms, s.core_start_ms, s.core_end_ms) for s in segments] == [
+        (0, 0, 15000),
+        (13000, 15000, 30000),
+        (28000, 30000, 45000),
+        (43000, 45000, 60000),
+    ]
+    assert [s.last for s in segments] == [False, False, False, True]
+    assert segments[1].in_head(14000) and not segments[1].in_head(15000)
+    assert segments[0].in_tail(14000) and not segments[0].in_core(15000)
+    assert segments[3].in_core(60000)
+    assert len(plan_segments(0, 6000, 8, 2000)) == 1
+
+
+def _part(index, events, counted, head=None, tail=None):
+    return {
+        "index": index,
+        "events": events,
+        "counted_ids": counted,
+        "head": head or {},
+        "tail": tail or {},
+    }
+
+
+def test_match_tracks_pairs_by_iou_with_frame_gap():
+    tail = {10: [[7, 0, 0, 10, 10], [8, 50, 50, 60, 60]], 12: [[7, 0, 2, 10, 12]]}
+    head = {11: [[1, 50, 51, 60, 61], [2, 0, 1, 10, 11]]}
+
+    assert match_tracks(tail, head, max_gap=0) == {}
+    assert match_tracks(tail, head, max_gap=1) == {1: 8, 2: 7}
+
+
+def test_stitch_counts_boundary_track_once():
+    box = [[5, 0, 40, 10, 50]]
+    continued = [[1, 0, 41, 10, 51]]
+    parts = [
+        # Track 5 crossed in segment 0 and is still visible in its tail.
+        _part(0, [(900.0, 5, "cow")], [5], tail={30: box}),
+        # Segment 1 sees it as track 1 and, after it jitters back, counts it
+        # again; track 2 is a new animal.
+        _part(1, [(1500.0, 1, "cow"), (1800.0, 2, "cow")], [1, 2], head={30: continued}),
+    ]
+
+    assert stitch_segments(parts) == (2, {"cow": 2})
+
+
+class _Progress:
+    def __init__(self):
+        self.errors = []
+
+    def atualizar(self, *args, **kwargs):
+        return True
+
+    def status(self, video_name):
+        return {"cancelado": False}
+
+    def erro(self, video_name, message):
+        self.errors.append(message)
+
+
+def _run_in_threads(monkeypatch, worker):
+    # Workers run as threads so the stub is visible; the manager stays real.
+    monkeypatch.setattr(segments_module, "_process_segment", worker)
+    monkeypatch.setattr(
+        segments_module,
+        "ProcessPoolExecutor",
+        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+    )
+    monkeypatch.setattr(segments_module, "_POLL_SECONDS", 0.01)
+
+
+def test_run_segments_stitches_worker_results(monkeypatch):
+    def worker(video_path, video_name, segment, shared, cancel_event, options):
+        shared[segment.index] = (10, 10)
+        event = (segment.core_start_ms + 100.0, segment.index + 1, "cow")
+        return {
+            "segment": _part(segment.index, [event], [segment.index + 1]),
+            "total_frames": 10,
+        }
+
+    _run_in_threads(monkeypatch, worker)
+    progress = _Progress()
+
+    result = segments_module.run_segments(
+        "video.mp4", "video.mp4", progress, plan_segments(0, 20000, 2, 1000), {}
+    )
+
+    assert result["total_count"] == 2
+    assert result["por_classe"] == {"cow": 2}
+    assert [s["events"] for s in result["segments"]] == [1, 1]
+    assert progress.errors == []
+
+
+def test_run_segments_reports_worker_errors(monkeypatch):
+    def worker(video_path, video_name, segment, shared, cancel_event, options):
+        if segment.index == 1:
+            shared[f"erro_{segment.index}"] = "decoder failed"
+            return None
+        return {"segment": _part(segment.index, [], []), "total_frames": 10}
+
+    _run_in_threads(monkeypatch, worker)
+    progress = _Progress()
+
+    result = segments_module.run_segments(
+        "video.mp4", "video.mp4", progress, plan_segments(0, 20000, 2, 1000), {}
+    )
+
+    assert result is None
+    assert progress.errors == ["decoder failed"]
@@ -0,0 +1,207 @@
+"""Tests for the frame detector adapters used by the counting loop."""
+
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.tracking import BatchedTrackDetector, FrameDetections  # isort: skip
+
+
+class _FakeBoxes:
+    def __init__(self, det):
+        self._det = det
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._det
+
+
+class _RecordingTracker:
+    def __init__(self):
+        self.calls = []
+
+    def update(self, det, frame):
+        self.calls.append(frame)
+        if len(det) == 0:
+            return np.zeros((0, 8))
+        track_id = len(self.calls)
+        x1, y1, x2, y2, conf, cls = det[0]
+        return np.array([[x1, y1, x2, y2, track_id, conf, cls, 0]])
+
+
+def test_batched_detector_runs_one_forward_pass_and_tracks_in_order():
+    """Predict the whole batch at once and feed the tracker frame by frame."""
+
+    predict_calls = []
+    per_frame = {
+        "a": np.array([[0, 0, 10, 10, 0.9, 2]]),
+        "b": np.zeros((0, 6)),
+        "c": np.array([[5, 5, 15, 15, 0.8, 1]]),
+    }
+
+    def predict(frames, **kwargs):
+        predict_calls.append(list(frames))
+        return [SimpleNamespace(boxes=_FakeBoxes(per_frame[f])) for f in frames]
+
+    tracker = _RecordingTracker()
+    detector = BatchedTrackDetector(
+        SimpleNamespace(predict=predict), imgsz=320, tracker=tracker
+    )
+
+    detections = detector(["a", "b", "c"])
+
+    assert predict_calls == [["a", "b", "c"]]
+    # Frames without boxes still age the tracks, as ``model.track`` does.
+    assert tracker.calls == ["a", "b", "c"]
+    assert [len(d) for d in detections] == [1, 0, 1]
+    assert detections[2].track_ids.tolist() == [3]
+    assert detections[2].classes.tolist() == [1]
+    assert detections[0].boxes.tolist() == [[0, 0, 10, 10]]
+
+
+def test_batched_track_ids_match_per_frame_tracking_across_empty_frames():
+    """A track lost for longer than ``max_age`` gets a new id in both paths."""
+
+    from utils.iou_tracker import IoUTracker
+
+    box = np.array([[10, 10, 30, 30, 0.9, 0]], dtype=np.float32)
+    empty = np.zeros((0, 6), dtype=np.float32)
+    clip = [box, box, empty, empty, empty, box, box, empty, box]
+
+    reference = IoUTracker(max_age=2)
+    per_frame_ids = [
+        FrameDetections.from_tracks(reference.update(det)).track_ids.tolist()
+        for det in clip
+    ]
+
+    def predict(frames, **kwargs):
+        return [SimpleNamespace(boxes=_FakeBoxes(clip[f])) for f in frames]
+
+    detector = BatchedTrackDetector(
+        SimpleNamespace(predict=predict), imgsz=320, tracker=IoUTracker(max_age=2)
+    )
+    batched_ids = []
+    for start in range(0, len(clip), 4):
+        batch = list(range(start, min(start + 4, len(clip))))
+        batched_ids += [d.track_ids.tolist() for d in detector(batch)]
+
+    assert batched_ids == per_frame_ids
+    assert per_frame_ids[0] == [1] and per_frame_ids[5] == [2]
+    assert per_frame_ids[8] == [2]
+
+
+def test_frame_detections_from_empty_tracks():
+    assert len(FrameDetections.from_tracks(np.zeros((0, 8)))) == 0
+
+
+def test_roi_band_detector_crops_frames_and_restores_coordinates():
+    from utils.tracking import RoiBandDetector, line_band, roi_imgsz
+
+    seen = []
+
+    def inner(crops):
+        seen.extend(crop.shape for crop in crops)
+        det = FrameDetections.empty()
+        det.boxes = np.array([[10, 5, 30, 25]], dtype=np.float32)
+        det.track_ids = np.array([1])
+        det.classes = np.array([0])
+        det.confidences = np.array([0.9], dtype=np.float32)
+        return [det for _ in crops]
+
+    band = line_band(0.5, 0.25)
+    assert band == (0.375, 0.625)
+    frame = np.zeros((400, 640, 3), dtype=np.uint8)
+
+    horizontal = RoiBandDetector(inner, "horizontal", band)([frame])
+    assert seen[-1] == (100, 640, 3)
+    assert horizontal[0].boxes.tolist() == [[10, 155, 30, 175]]
+
+    vertical = RoiBandDetector(inner, "vertical", band)([frame])
+    assert seen[-1] == (400, 160, 3)
+    assert vertical[0].boxes.tolist() == [[250, 5, 270, 25]]
+
+    assert roi_imgsz(512, 640, 400, "horizontal", band) == 512
+    assert roi_imgsz(512, 640, 400, "vertical", band) == 320
+
+
+def test_tile_grid_covers_the_band_with_overlap():
+    from utils.tracking import tile_grid
+
+    # 4K frame, thin band around the middle: a single row of tiles.
+    tiles = tile_grid(3840, 2160, 640, 0.2, region=(0, 972, 3840, 1188))
+    assert {(y0, y1) for _, y0, _, y1 in tiles} == {(760, 1400)}
+    starts = [x0 for x0, _, _, _ in tiles]
+    assert starts[0] == 0 and tiles[-1][2] == 3840
+    assert all(b - a <= 512 for a, b in zip(starts, starts[1:]))
+
+    # Frames smaller than a tile yield one tile of the frame size.
+    assert tile_grid(320, 200, 640) == [(0, 0, 320, 200)]
+
+
+def test_tiled_detector_batches_tiles_and_merges_duplicates():
+    from utils.tracking import TiledTrackDetector
+
+    calls = []
+
+    class _Model:
+        def predict(self, tiles, **kwargs):
+            calls.append([tile.shape for tile in tiles])
+            results = []
+            for index, _ in enumerate(tiles):
+                # The same animal straddles the border of the two tiles.
+                det = {
+                    0: [[560, 20, 620, 60, 0.9, 0]],
+                    1: [[80, 20, 140, 60, 0.8, 0], [300, 10, 320, 30, 0.7, 1]],
+                }[index % 2]
+                data = np.array(det, dtype=np.float32)
+                results.append(
+                    SimpleNamespace(boxes=_FakeBoxes(SimpleNamespace(data=data)))
+                )
+            return results
+
+    class _Tracker:
+        def __init__(self):
+            self.seen = []
+
+        def update(self, det, frame):
+            self.seen.append(det)
+            if len(det) == 0:
+                return np.zeros((0, 8))
+            ids = np.arange(1, len(det) + 1, dtype=np.float32)[:, None]
+            return np.hstack([det[:, :4], ids, det[:, 4:6], np.zeros_like(ids)])
+
+    tracker = _Tracker()
+    detector = TiledTrackDetector(
+        _Model(),
+        640,
+        band=(0.45, 0.55),
+        overlap=0.2,
+        tracker=tracker,
+        boxes_factory=lambda data, shape: data,
+    )
+    frames = [np.zeros((200, 1120, 3), dtype=np.uint8) for _ in range(2)]
+    detections = detector(frames)
+
+    assert calls == [[(200, 640, 3)] * 4]
+    assert detector.grid(200, 1120) == [(0, 0, 640, 200), (480, 0, 1120, 200)]
+    for det in detections:
+        assert det.boxes.tolist() == [[560, 20, 620, 60], [780, 10, 800, 30]]
+        assert det.classes.tolist() == [0, 1]
+    assert len(tracker.seen) == 2
+
+
+def test_iou_tracker_runs_on_predict_detections(monkeypatch):
+    from utils.iou_tracker import IoUTracker
+    from utils.tracking import create_frame_detector, tracker_choice
+
+    detector = create_frame_detector(object(), 320, batch_size=1, tracker="iou")
+    assert isinstance(detector, BatchedTrackDetector)
+    assert isinstance(detector.tracker, IoUTracker)
+
+    monkeypatch.setenv("TRACKER", "unknown")
+    assert tracker_choice() == "botsort"
+    assert tracker_choice("IOU") == "iou"
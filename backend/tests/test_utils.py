@@ -2,6 +2,7 @@
 
 The module validates line and direction configuration."""
 
+import os
 import subprocess
 from types import SimpleNamespace
 
@@ -58,7 +59,10 @@ def test_rotation_metadata_and_application(tmp_path, monkeypatch):
     )
 
     def fake_run(cmd, stdout, stderr, text, check):
-        return SimpleNamespace(stdout="90")
+        # Recent ffmpeg reports the display matrix instead of the rotate tag.
+        return SimpleNamespace(
+            stdout='{"streams": [{"side_data_list": [{"rotation": -90}]}]}'
+        )
 
     monkeypatch.setattr(subprocess, "run", fake_run)
     rotation = get_video_rotation(str(video_file))
@@ -82,3 +86,795 @@ def test_rotation_metadata_and_application(tmp_path, monkeypatch):
 
     rotated = apply_rotation(frame, rotation)
     assert len(rotated) == 40 and len(rotated[0]) == 20
+
+
+class _FakeCapture:
+    """Minimal ``cv2.VideoCapture`` replacement serving blank frames."""
+
+    def __init__(self, frames, width=100, height=100, fps=30.0):
+        self.frames = frames
+        self.props = {"count": frames, "fps": fps, "w": width, "h": height}
+        self.position = 0
+        self.opened = True
+        self.decoded = []
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        if prop == "msec":
+            return max(self.position - 1, 0) * 1000.0 / self.props["fps"]
+        return self.props[prop]
+
+    def set(self, prop, value):
+        if prop == "msec":
+            value = value * self.props["fps"] / 1000.0
+        self.position = int(value)
+        return True
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def grab(self):
+        if self.position >= self.frames:
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        import numpy as np
+
+        self.decoded.append(self.position - 1)
+        return True, np.zeros((self.props["h"], self.props["w"], 3), dtype="uint8")
+
+    def release(self):
+        self.opened = False
+
+
+class _FakeProgress:
+    def __init__(self):
+        self.errors = []
+
+    def update_status_message(self, *args):
+        pass
+
+    def atualizar(self, *args, **kwargs):
+        return True
+
+    def status(self, video_name):
+        return {"cancelado": False}
+
+    def erro(self, video_name, message):
+        self.errors.append(message)
+
+
+def _moving_boxes_model(positions):
+    """Fake YOLO whose ``track`` yields one box per id following ``positions``."""
+
+    import numpy as np
+
+    class _Tensor:
+        def __init__(self, data):
+            self.data = np.asarray(data)
+
+        def cpu(self):
+            return self
+
+        def numpy(self):
+            return self.data
+
+    calls = {"n": 0}
+
+    def track(frame, **kwargs):
+        centers = positions[calls["n"]] if calls["n"] < len(positions) else {}
+        calls["n"] += 1
+        if not centers:
+            return [SimpleNamespace(boxes=SimpleNamespace(id=None))]
+        ids = list(centers)
+        xyxy = [[x - 5, y - 5, x + 5, y + 5] for x, y in centers.values()]
+        boxes = SimpleNamespace(
+            id=_Tensor(ids),
+            cls=_Tensor([0] * len(ids)),
+            xyxy=_Tensor(xyxy),
+            conf=_Tensor([0.9] * len(ids)),
+        )
+        return [SimpleNamespace(boxes=boxes)]
+
+    return SimpleNamespace(track=track, names={0: "cow"})
+
+
+@pytest.fixture
+def fake_video_env(tmp_path, monkeypatch):
+    """Patch OpenCV/YOLO so ``contar_gado_em_video`` runs without real media."""
+
+    import utils.contagem_video as contagem_video
+    from utils.model_registry import ModelRegistry
+
+    captures = []
+
+    def setup(positions, frames=None):
+        frames = frames if frames is not None else len(positions)
+        video = tmp_path / "video.mp4"
+        video.write_bytes(b"fake")
+        monkeypatch.setenv("CREATE_ANNOTATED_VIDEO", "false")
+        monkeypatch.setenv("USE_SFTP", "false")
+        monkeypatch.setenv("VIDEO_DECODER", "opencv")
+        monkeypatch.setenv("EVENTS_DIR", str(tmp_path / "events"))
+        monkeypatch.setenv("CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+        monkeypatch.setenv("DETECTION_CACHE_DIR", str(tmp_path / "detections"))
+        for name, value in {
+            "CAP_PROP_FRAME_COUNT": "count",
+            "CAP_PROP_FPS": "fps",
+            "CAP_PROP_FRAME_WIDTH": "w",
+            "CAP_PROP_FRAME_HEIGHT": "h",
+            "CAP_PROP_POS_MSEC": "msec",
+        }.items():
+            monkeypatch.setattr(cv2, name, value, raising=False)
+        def open_capture(path):
+            captures.append(_FakeCapture(frames))
+            return captures[-1]
+
+        monkeypatch.setattr(cv2, "VideoCapture", open_capture, raising=False)
+        monkeypatch.setattr(contagem_video, "get_video_rotation", lambda path: 0)
+        monkeypatch.setattr(contagem_video, "probe_media", lambda path: None)
+        registry = ModelRegistry(
+            memory_budget_bytes=0, loader=lambda path: _moving_boxes_model(positions)
+        )
+        monkeypatch.setattr(contagem_video, "get_model_registry", lambda: registry)
+        return str(video)
+
+    setup.captures = captures
+    return setup
+
+
+def test_contar_gado_em_video_counts_line_crossings(fake_video_env):
+    """Count each track once when its centroid crosses the line downwards."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    positions = [
+        {1: (20, 30), 2: (60, 70)},
+        {1: (20, 45), 2: (60, 40)},
+        {1: (20, 55), 2: (60, 30)},
+        {1: (20, 40)},
+        {1: (20, 60), 3: (80, 10)},
+        {3: (80, 90)},
+    ]
+    video_path = fake_video_env(positions)
+    progress = _FakeProgress()
+
+    result = contar_gado_em_video(
+        video_path, "video.mp4", progress, orientation="S", line_position_ratio=0.5
+    )
+
+    assert progress.errors == []
+    assert result["total_count"] == 2
+    assert result["por_classe"] == {"cow": 2}
+    assert result["total_frames"] == len(positions)
+    assert result["events"] == 2
+
+
+def test_decoder_failure_is_reported_instead_of_raised(fake_video_env, monkeypatch):
+    """An error in a pipeline stage ends the job with an error status."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    video_path = fake_video_env([{1: (20, 30)}] * 6)
+    progress = _FakeProgress()
+
+    def broken_retrieve(self):
+        raise ValueError("frame corrompido")
+
+    monkeypatch.setattr(_FakeCapture, "retrieve", broken_retrieve)
+
+    result = contar_gado_em_video(
+        video_path, "video.mp4", progress, orientation="S", line_position_ratio=0.5
+    )
+
+    assert result is None
+    assert len(progress.errors) == 1
+    assert "frame corrompido" in progress.errors[0]
+
+
+def test_extra_zones_are_counted_in_the_same_pass(fake_video_env):
+    """Line segments and polygons get their own counts next to the main line."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    positions = [
+        {1: (20, 30), 2: (60, 70)},
+        {1: (20, 55), 2: (60, 40)},
+        {1: (45, 55), 2: (60, 30)},
+    ]
+    video_path = fake_video_env(positions)
+    result = contar_gado_em_video(
+        video_path,
+        "video.mp4",
+        _FakeProgress(),
+        orientation="S",
+        zones=[
+            {"name": "subida", "type": "line", "points": [[0.5, 0], [0.5, 1]]},
+            {
+                "name": "saida",
+                "type": "line",
+                "points": [[0, 0.5], [1, 0.5]],
+                "direction": "N",
+            },
+            {
+                "type": "polygon",
+                "points": [[0.3, 0.4], [0.6, 0.4], [0.6, 0.7], [0.3, 0.7]],
+                "direction": "in",
+            },
+        ],
+    )
+
+    assert result["total_count"] == 1
+    assert [(z["name"], z["total_count"]) for z in result["zones"]] == [
+        ("subida", 0),
+        ("saida", 1),
+        ("zona_3", 1),
+    ]
+
+
+def test_sweep_counts_each_candidate_like_a_separate_run(fake_video_env):
+    """One pass returns the count every candidate line would have produced."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    positions = [
+        {1: (20, 30), 2: (60, 70)},
+        {1: (20, 45), 2: (60, 40)},
+        {1: (20, 55), 2: (60, 30)},
+        {1: (20, 40)},
+        {1: (20, 60), 3: (80, 10)},
+        {3: (80, 90)},
+    ]
+    candidates = [
+        {"orientation": "S", "line_position_ratio": 0.5},
+        {"orientation": "S", "line_position_ratio": 0.8},
+        {"orientation": "N", "line_position_ratio": 0.5},
+        {"orientation": "E", "line_position_ratio": 0.5},
+    ]
+    video_path = fake_video_env(positions)
+    result = contar_gado_em_video(
+        video_path, "video.mp4", _FakeProgress(), orientation="S", sweep=candidates
+    )
+    assert len(fake_video_env.captures) == 1
+
+    expected = []
+    for candidate in candidates:
+        video_path = fake_video_env(positions)
+        separate = contar_gado_em_video(
+            video_path, "other.mp4", _FakeProgress(), **candidate
+        )
+        expected.append(dict(candidate, total_count=separate["total_count"]))
+    assert [
+        {k: row[k] for k in ("orientation", "line_position_ratio", "total_count")}
+        for row in result["sweep"]
+    ] == expected
+    assert result["sweep"][0]["total_count"] == result["total_count"] == 2
+    assert result["zones"] is None
+
+
+@pytest.mark.parametrize("rotation", [90, 180, 270])
+def test_rotating_boxes_matches_rotating_frames(fake_video_env, monkeypatch, rotation):
+    """ROTATION_MODE=boxes counts like rotating every frame, without rotating."""
+
+    import numpy as np
+
+    import utils.contagem_video as contagem_video
+    from utils.model_registry import ModelRegistry
+
+    width, height, frames = 120, 80, 8
+
+    class _BlobCapture(_FakeCapture):
+        """Frames with one square per track id, moving diagonally."""
+
+        def retrieve(self):
+            n = self.position - 1
+            frame = np.zeros((height, width, 3), dtype="uint8")
+            for track_id, (x, y) in {
+                1: (10 + 12 * n, 10 + 8 * n),
+                2: (104 - 12 * n, 10 + 8 * n),
+            }.items():
+                frame[y : y + 6, x : x + 6] = 40 * track_id
+            return True, frame
+
+    def track(frame, **kwargs):
+        values = [v for v in np.unique(frame[..., 0]) if v]
+        if not values:
+            return [SimpleNamespace(boxes=SimpleNamespace(id=None))]
+        xyxy = []
+        for value in values:
+            rows, cols = np.nonzero(frame[..., 0] == value)
+            xyxy.append([cols.min(), rows.min(), cols.max() + 1, rows.max() + 1])
+        tensor = lambda data: SimpleNamespace(  # noqa: E731
+            cpu=lambda: SimpleNamespace(numpy=lambda: np.asarray(data))
+        )
+        boxes = SimpleNamespace(
+            id=tensor([int(v) // 40 for v in values]),
+            cls=tensor([0] * len(values)),
+            xyxy=tensor(xyxy),
+            conf=tensor([0.9] * len(values)),
+        )
+        return [SimpleNamespace(boxes=boxes)]
+
+    rotations = []
+
+    def fake_rotate(frame, code):
+        rotations.append(code)
+        return np.rot90(frame, {0: -1, 1: 2, 2: 1}[code]).copy()
+
+    monkeypatch.setattr(cv2, "ROTATE_90_CLOCKWISE", 0, raising=False)
+    monkeypatch.setattr(cv2, "ROTATE_180", 1, raising=False)
+    monkeypatch.setattr(cv2, "ROTATE_90_COUNTERCLOCKWISE", 2, raising=False)
+    monkeypatch.setattr(cv2, "rotate", fake_rotate, raising=False)
+
+    def count(mode, orientation):
+        video_path = fake_video_env([], frames=frames)
+        monkeypatch.setenv("DETECTION_CACHE", "false")
+        monkeypatch.setenv("ROTATION_MODE", mode)
+        monkeypatch.setattr(
+            cv2,
+            "VideoCapture",
+            lambda path: _BlobCapture(frames, width, height),
+            raising=False,
+        )
+        monkeypatch.setattr(contagem_video, "get_video_rotation", lambda p: rotation)
+        registry = ModelRegistry(
+            memory_budget_bytes=0,
+            loader=lambda path: SimpleNamespace(track=track, names={0: "cow"}),
+        )
+        monkeypatch.setattr(contagem_video, "get_model_registry", lambda: registry)
+        rotations.clear()
+        result = contar_gado_em_video(
+            video_path, "video.mp4", _FakeProgress(), orientation=orientation
+        )
+        return result["total_count"], len(rotations)
+
+    from utils.contagem_video import contar_gado_em_video
+
+    totals = 0
+    for orientation in ("N", "E", "S", "W"):
+        by_frames, rotated_frames = count("frames", orientation)
+        by_boxes, rotated_boxes = count("boxes", orientation)
+        assert by_boxes == by_frames
+        assert rotated_frames == frames and rotated_boxes == 0
+        totals += by_frames
+    assert totals == 4
+
+
+def test_rotate_boxes_and_band_round_trip():
+    """Boxes and bands follow ``apply_rotation`` for every rotation."""
+
+    import numpy as np
+
+    from utils.contagem_video import LINE_HORIZONTAL, rotate_boxes, unrotate_band
+
+    boxes = np.array([[10.0, 20.0, 30.0, 25.0]])
+    assert rotate_boxes(boxes, 90, 100, 50).tolist() == [[25, 10, 30, 30]]
+    assert rotate_boxes(boxes, 180, 100, 50).tolist() == [[70, 25, 90, 30]]
+    assert rotate_boxes(boxes, 270, 100, 50).tolist() == [[20, 70, 25, 90]]
+    assert rotate_boxes(boxes, 0, 100, 50) is boxes
+    assert unrotate_band(LINE_HORIZONTAL, (0.2, 0.4), 90) == (LINE_VERTICAL, (0.2, 0.4))
+    assert unrotate_band(LINE_VERTICAL, (0.2, 0.4), 270) == (LINE_HORIZONTAL, (0.2, 0.4))
+    line_type, band = unrotate_band(LINE_HORIZONTAL, (0.2, 0.4), 180)
+    assert line_type == LINE_HORIZONTAL and band == pytest.approx((0.6, 0.8))
+
+
+def test_counted_crossings_are_logged_as_json_lines(fake_video_env, tmp_path):
+    """Each crossing is written with frame, timestamp, id, class and box."""
+
+    from utils.contagem_video import contar_gado_em_video
+    from utils.event_log import event_log_path, read_events
+
+    positions = [{1: (20, 30)}, {1: (20, 45), 2: (60, 40)}, {1: (20, 60), 2: (60, 55)}]
+    video_path = fake_video_env(positions)
+
+    contar_gado_em_video(video_path, "video.mp4", _FakeProgress(), orientation="S")
+
+    page = read_events(event_log_path("video.mp4", str(tmp_path / "events")))
+    assert page["total"] == 2 and page["next_offset"] is None
+    assert page["events"] == [
+        {
+            "pts_ms": 66.7,
+            "track_id": 1,
+            "class": "cow",
+            "frame": 2,
+            "conf": 0.9,
+            "box": [15.0, 55.0, 25.0, 65.0],
+        },
+        {
+            "pts_ms": 66.7,
+            "track_id": 2,
+            "class": "cow",
+            "frame": 2,
+            "conf": 0.9,
+            "box": [55.0, 50.0, 65.0, 60.0],
+        },
+    ]
+
+
+def test_frame_skip_grabs_without_decoding(fake_video_env):
+    """Skipped frames are advanced with ``grab`` and never decoded."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    positions = [{1: (20, 30)}, {1: (20, 60)}, {1: (20, 70)}]
+    video_path = fake_video_env(positions, frames=6)
+
+    result = contar_gado_em_video(
+        video_path, "video.mp4", _FakeProgress(), orientation="S", frame_skip=2
+    )
+
+    assert fake_video_env.captures[0].decoded == [0, 2, 4]
+    assert result["total_count"] == 1
+
+
+def test_trim_reads_only_frames_inside_timestamp_range(fake_video_env):
+    """Seek to ``trim_start_ms`` and stop once timestamps pass ``trim_end_ms``."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    positions = [{1: (20, 30)}, {1: (20, 60)}, {}, {}]
+    video_path = fake_video_env(positions, frames=30)
+
+    result = contar_gado_em_video(
+        video_path,
+        "video.mp4",
+        _FakeProgress(),
+        orientation="S",
+        trim_start_ms=100,
+        trim_end_ms=200,
+    )
+
+    assert fake_video_env.captures[0].decoded == [3, 4, 5, 6]
+    assert result["total_count"] == 1
+
+
+def test_motion_gate_skips_static_frames(fake_video_env, monkeypatch):
+    """Static frames skip inference except every ``MOTION_GATE_MAX_IDLE``."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    monkeypatch.setenv("MOTION_GATE_THRESHOLD", "0.01")
+    monkeypatch.setenv("MOTION_GATE_MAX_IDLE", "2")
+    positions = [{1: (20, 30)}, {1: (20, 60)}]
+    video_path = fake_video_env(positions, frames=6)
+
+    result = contar_gado_em_video(video_path, "video.mp4", _FakeProgress())
+
+    assert result["motion_gate"] == {
+        "frames": 6,
+        "gated_frames": 4,
+        "gated_fraction": 0.6667,
+    }
+    assert result["total_count"] == 1
+
+
+def test_segment_mode_counts_only_core_crossings(fake_video_env):
+    """Warm-up crossings are left to the previous segment."""
+
+    from utils.contagem_video import contar_gado_em_video
+    from utils.segments import Segment
+
+    positions = [
+        {1: (20, 30), 2: (60, 20)},
+        {1: (20, 60), 2: (60, 30)},
+        {1: (20, 70), 2: (60, 40)},
+        {1: (20, 80), 2: (60, 45)},
+        {1: (20, 30), 2: (60, 55)},
+        {1: (20, 60)},
+    ]
+    video_path = fake_video_env(positions)
+    segment = Segment(1, 0.0, 100.0, 1000.0, 100.0, last=True)
+
+    result = contar_gado_em_video(
+        video_path, "video.mp4", _FakeProgress(), orientation="S", segment=segment
+    )
+
+    assert result["total_count"] == 1
+    assert [event[1:3] for event in result["segment"]["events"]] == [(2, "cow")]
+    assert sorted(result["segment"]["counted_ids"]) == [1, 2]
+    assert sorted(result["segment"]["head"]) == [0, 1, 2]
+    assert os.path.exists(video_path)
+
+
+@pytest.mark.parametrize("cancelado", [False, True])
+def test_failed_segment_run_keeps_the_upload(tmp_path, monkeypatch, cancelado):
+    """A failed parallel run keeps the upload; a cancelled one removes it."""
+
+    import utils.contagem_video as contagem_video
+
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"fake")
+    monkeypatch.setattr(contagem_video, "run_segments", lambda *a, **k: None)
+
+    result = contagem_video._contar_em_segmentos(
+        str(video),
+        "video.mp4",
+        _FakeProgress(),
+        workers=2,
+        start_ms=0.0,
+        end_ms=10000.0,
+        max_gap=5,
+        total_frames=300,
+        cancel_callback=lambda: cancelado,
+        remote_video_original=None,
+        options={},
+    )
+
+    assert result is None
+    assert video.exists() is not cancelado
+
+
+def test_auto_imgsz_probes_frames_and_records_choice(fake_video_env, monkeypatch):
+    """``YOLO_IMG_SIZE=auto`` picks the size from sampled frames."""
+
+    import numpy as np
+
+    import utils.contagem_video as contagem_video
+    from utils.contagem_video import contar_gado_em_video
+    from utils.model_registry import ModelRegistry
+
+    positions = [{1: (20, 30)}, {1: (20, 60)}]
+    video_path = fake_video_env(positions, frames=30)
+    monkeypatch.setenv("YOLO_IMG_SIZE", "auto")
+    monkeypatch.setenv("IMGSZ_LADDER", "320,640")
+    monkeypatch.setenv("IMGSZ_PROBE_FRAMES", "3")
+    probe_sizes = []
+
+    def load(path):
+        model = _moving_boxes_model(positions)
+
+        def predict(frames, **kwargs):
+            probe_sizes.append((len(frames), kwargs["imgsz"]))
+            # 10 px boxes on 100 px frames: 10% -> 32 px at 320.
+            xyxy = SimpleNamespace(
+                cpu=lambda: SimpleNamespace(
+                    numpy=lambda: np.array([[0, 0, 10, 10]], dtype=np.float32)
+                )
+            )
+            return [SimpleNamespace(boxes=SimpleNamespace(xyxy=xyxy))] * len(frames)
+
+        model.predict = predict
+        return model
+
+    registry = ModelRegistry(memory_budget_bytes=0, loader=load)
+    monkeypatch.setattr(contagem_video, "get_model_registry", lambda: registry)
+
+    result = contar_gado_em_video(video_path, "video.mp4", _FakeProgress())
+
+    assert probe_sizes == [(3, 640)]
+    assert result["imgsz"] == 320
+    assert result["imgsz_probe"]["detections"] == 3
+    assert result["total_count"] == 1
+
+
+def test_int8_job_runs_at_the_calibrated_size(fake_video_env, monkeypatch):
+    """INT8 jobs skip the auto ladder and the ROI resize: only 512 is exported."""
+
+    import utils.contagem_video as contagem_video
+    from utils.contagem_video import contar_gado_em_video
+
+    positions = [{1: (20, 30)}, {1: (20, 60)}]
+    video_path = fake_video_env(positions, frames=4)
+    monkeypatch.setenv("YOLO_IMG_SIZE", "auto")
+    monkeypatch.setattr(contagem_video, "roi_imgsz", lambda imgsz, *args: 256)
+    acquired = []
+
+    class _Registry:
+        def acquire(self, model_choice, imgsz=None):
+            acquired.append((model_choice, imgsz))
+            return _moving_boxes_model(positions)
+
+        def release(self, model):
+            pass
+
+        def lease(self, model_choice, imgsz=None):
+            # The auto-imgsz probe would lease the largest rung.
+            acquired.append(("probe", imgsz))
+            raise RuntimeError("no probe model")
+
+    monkeypatch.setattr(contagem_video, "get_model_registry", _Registry)
+
+    result = contar_gado_em_video(
+        video_path,
+        "video.mp4",
+        _FakeProgress(),
+        model_choice="l-int8",
+        roi_band_ratio=0.2,
+    )
+
+    assert acquired == [("l-int8", 512)]
+    assert result["imgsz"] == 512
+
+
+def test_interrupted_job_resumes_from_checkpoint(fake_video_env, monkeypatch, tmp_path):
+    """A resumed job skips counted frames and keeps counted ids counted."""
+
+    from utils.checkpoint import load_checkpoint
+    from utils.contagem_video import contar_gado_em_video
+    from utils.event_log import event_log_path, read_events
+
+    class _Restart(_FakeProgress):
+        def atualizar(self, video_name, frame_atual, total, **kwargs):
+            if frame_atual >= 3:
+                raise RuntimeError("worker restarted")
+            return True
+
+    monkeypatch.setenv("CHECKPOINT_INTERVAL_SECONDS", "1e-9")
+    positions = [{1: (20, 30)}, {1: (20, 45)}, {1: (20, 60)}]
+    video_path = fake_video_env(positions, frames=6)
+    with pytest.raises(RuntimeError):
+        contar_gado_em_video(video_path, "video.mp4", _Restart(), orientation="S")
+    checkpoint = load_checkpoint("video.mp4")
+    assert checkpoint["frame"] == 2 and checkpoint["total_count"] == 1
+
+    # The restarted tracker reuses id 1 for the counted animal and a new one.
+    positions = [{1: (20, 62)}, {1: (20, 70), 2: (60, 30)}, {2: (60, 60)}]
+    video_path = fake_video_env(positions, frames=6)
+    result = contar_gado_em_video(
+        video_path, "video.mp4", _FakeProgress(), orientation="S", resume=True
+    )
+
+    assert fake_video_env.captures[-1].decoded == [3, 4, 5]
+    assert result["total_count"] == 2
+    assert result["checkpoint"]["resumed_from_ms"] == checkpoint["pts_ms"]
+    page = read_events(event_log_path("video.mp4", str(tmp_path / "events")))
+    assert [(e["track_id"], e["frame"]) for e in page["events"]] == [(1, 2), (3, 5)]
+    assert load_checkpoint("video.mp4") is None
+
+
+def test_failed_join_of_annotated_parts_reports_an_error(
+    fake_video_env, monkeypatch, tmp_path
+):
+    """Parts that cannot be joined are removed and the job ends in error."""
+
+    import subprocess
+
+    from utils import contagem_video
+    from utils.checkpoint import load_checkpoint
+    from utils.contagem_video import contar_gado_em_video
+
+    class _Sink:
+        backend = "fake"
+        encode_seconds = 0.0
+
+        def __init__(self, path, fps, size):
+            self.output_path = path
+            open(path, "wb").close()
+
+        def isOpened(self):
+            return True
+
+        def write(self, frame):
+            pass
+
+        def release(self):
+            pass
+
+    def broken_concat(parts, output_path):
+        raise subprocess.CalledProcessError(1, "ffmpeg")
+
+    monkeypatch.setenv("CHECKPOINT_INTERVAL_SECONDS", "1e-9")
+    monkeypatch.setenv("PROCESSED_VIDEOS_DIR", str(tmp_path / "processed"))
+    monkeypatch.setattr(contagem_video.shutil, "which", lambda name: name)
+    monkeypatch.setattr(contagem_video, "open_video_sink", _Sink)
+    monkeypatch.setattr(contagem_video, "concat_videos", broken_concat)
+    monkeypatch.setattr(contagem_video, "draw_annotations", lambda *args: None)
+    video_path = fake_video_env([{1: (20, 30)}, {1: (20, 60)}], frames=4)
+    monkeypatch.setenv("CREATE_ANNOTATED_VIDEO", "true")
+    progress = _FakeProgress()
+
+    result = contar_gado_em_video(video_path, "video.mp4", progress)
+
+    assert result is None
+    assert len(progress.errors) == 1 and "unir" in progress.errors[0]
+    assert os.listdir(tmp_path / "processed") == []
+    assert load_checkpoint("video.mp4") is None
+
+
+def test_recount_with_other_line_replays_cached_detections(
+    fake_video_env, monkeypatch
+):
+    """A second run of the same video neither decodes nor runs the model."""
+
+    from utils.contagem_video import contar_gado_em_video
+
+    monkeypatch.setenv("DETECTION_CACHE", "true")
+    positions = [{1: (20, 30)}, {1: (20, 60)}, {2: (60, 85)}, {2: (60, 95)}]
+    video_path = fake_video_env(positions)
+    first = contar_gado_em_video(
+        video_path, "video.mp4", _FakeProgress(), orientation="S"
+    )
+    assert first["total_count"] == 1
+    assert first["detection_cache"]["hit"] is False
+
+    # Same bytes under another upload name, with a model that sees nothing.
+    video_path = fake_video_env([])
+    second = contar_gado_em_video(
+        video_path,
+        "copy.mp4",
+        _FakeProgress(),
+        orientation="S",
+        line_position_ratio=0.9,
+    )
+
+    assert fake_video_env.captures[-1].decoded == []
+    assert second["detection_cache"] == dict(first["detection_cache"], hit=True)
+    assert second["total_count"] == 1
+    assert second["por_classe"] == {"cow": 1}
+
+    # Another inference backend may detect differently: no reuse.
+    monkeypatch.setenv("INFERENCE_BACKEND", "onnx")
+    video_path = fake_video_env([])
+    third = contar_gado_em_video(
+        video_path, "other.mp4", _FakeProgress(), orientation="S"
+    )
+    assert third["detection_cache"]["hit"] is False
+
+
+def test_deferred_mode_renders_annotated_video_on_demand(
+    fake_video_env, monkeypatch, tmp_path
+):
+    """The job only keeps detections; the render replays them frame by frame."""
+
+    import utils.video_io as video_io
+    from utils import contagem_video
+    from utils.contagem_video import contar_gado_em_video
+    from utils.render import pending_render, render_annotated_video
+
+    monkeypatch.setenv("ANNOTATED_VIDEO_MODE", "deferred")
+    monkeypatch.setenv("RENDER_DIR", str(tmp_path / "renders"))
+    positions = [{1: (20, 30)}, {1: (20, 60)}, {}, {2: (60, 70)}]
+    video_path = fake_video_env(positions)
+    monkeypatch.setenv("CREATE_ANNOTATED_VIDEO", "true")
+    result = contar_gado_em_video(
+        video_path, "video.mp4", _FakeProgress(), orientation="S"
+    )
+
+    assert result["video_processado"] == "/videos_processados/processed_video.mp4"
+    assert result["render"] == "pending"
+    assert not os.path.exists(video_path)
+    manifest = pending_render("processed_video.mp4")
+    assert os.path.exists(manifest["source"])
+
+    drawn, written = [], []
+
+    class _Sink:
+        def __init__(self, path, fps, size):
+            self.output_path = path
+
+        def isOpened(self):
+            return True
+
+        def write(self, frame):
+            written.append(frame)
+
+        def release(self):
+            open(self.output_path, "wb").close()
+
+    monkeypatch.setattr(video_io, "open_video_sink", _Sink)
+    monkeypatch.setattr(
+        contagem_video,
+        "draw_annotations",
+        lambda frame, caixas, *args: drawn.append(
+            ([box[4] for box in caixas], args[2])
+        ),
+    )
+    path = render_annotated_video("processed_video.mp4", str(tmp_path / "out"))
+
+    assert os.path.basename(path) == "processed_video.mp4" and os.path.exists(path)
+    assert len(written) == 4
+    # (labels, running total) per frame; the empty frame draws no boxes.
+    assert drawn == [
+        (["cow ID:1"], 0),
+        (["cow ID:1"], 1),
+        ([], 1),
+        (["cow ID:2"], 1),
+    ]
+    assert pending_render("processed_video.mp4") is None
+    assert not os.path.exists(manifest["source"])
@@ -0,0 +1,204 @@
+"""Tests for the timestamp-trimming frame sources."""
+
+import shutil
+import subprocess
+import time
+
+import pytest
+
+av = pytest.importorskip("av")
+np = pytest.importorskip("numpy")
+
+from utils import video_io  # isort: skip
+from utils.video_io import PyAVFrameSource  # isort: skip
+
+
+@pytest.fixture
+def keyframed_clip(tmp_path):
+    """Ten-second 30 fps clip with one keyframe per second."""
+
+    path = tmp_path / "clip.mp4"
+    container = av.open(str(path), "w")
+    stream = container.add_stream("h264", rate=30)
+    stream.width, stream.height, stream.pix_fmt = 64, 48, "yuv420p"
+    stream.options = {"g": "30"}
+    for index in range(300):
+        image = np.full((48, 64, 3), index % 256, dtype=np.uint8)
+        frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+        for packet in stream.encode(frame):
+            container.mux(packet)
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+    return str(path)
+
+
+def test_pyav_source_trims_by_presentation_timestamp(keyframed_clip):
+    source = PyAVFrameSource(keyframed_clip, start_ms=5000, end_ms=5200)
+    timestamps = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            break
+        assert frame.shape == (48, 64, 3)
+        timestamps.append(round(source.timestamp_ms))
+    source.release()
+
+    assert timestamps[0] == 5000
+    assert timestamps[-1] == 5200
+    assert len(timestamps) == 7
+
+
+def test_pyav_source_grab_skips_conversion(keyframed_clip):
+    source = PyAVFrameSource(keyframed_clip, end_ms=100)
+    assert source.grab()
+    assert source.grab()
+    ok, _ = source.read()
+    assert ok and round(source.timestamp_ms) == 67
+    source.release()
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_pipe_source_rotates_scales_and_drops_frames(keyframed_clip, monkeypatch):
+    monkeypatch.setattr(
+        video_io,
+        "_probe_stream",
+        lambda path: {"width": 64, "height": 48, "fps": 30.0, "frame_count": 300},
+    )
+    source = video_io.FFmpegPipeFrameSource(
+        keyframed_clip,
+        start_ms=5000,
+        end_ms=6000,
+        rotation=90,
+        target_size=32,
+        frame_skip=3,
+        ring_size=4,
+    )
+    frames = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            break
+        frames.append(frame)
+    source.release()
+
+    assert (source.output_width, source.output_height) == (24, 32)
+    assert source.scale == 2.0
+    assert source.frame_step == 3
+    assert len(frames) == 10
+    assert frames[0].shape == (32, 24, 3)
+    # Buffers come from the preallocated ring and are reused.
+    assert frames[0] is frames[4]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_pipe_source_uses_real_pts_for_variable_frame_rate(
+    tmp_path, monkeypatch
+):
+    """Phone-style VFR clip: the gaps between frames change mid-video."""
+
+    from fractions import Fraction
+
+    path = tmp_path / "vfr.mp4"
+    pts_ms = [0, 33, 66, 100, 200, 300, 400, 433, 466, 500]
+    container = av.open(str(path), "w")
+    stream = container.add_stream("h264", rate=30)
+    stream.width, stream.height, stream.pix_fmt = 64, 48, "yuv420p"
+    stream.codec_context.time_base = Fraction(1, 1000)
+    for index, pts in enumerate(pts_ms):
+        image = np.full((48, 64, 3), index * 20, dtype=np.uint8)
+        frame = av.VideoFrame.from_ndarray(image, format="bgr24")
+        frame.pts, frame.time_base = pts, Fraction(1, 1000)
+        for packet in stream.encode(frame):
+            container.mux(packet)
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+    monkeypatch.setattr(
+        video_io,
+        "_probe_stream",
+        lambda path: {"width": 64, "height": 48, "fps": 20.0, "frame_count": 10},
+    )
+
+    source = video_io.FFmpegPipeFrameSource(str(path), ring_size=4)
+    timestamps = []
+    while source.read()[0]:
+        timestamps.append(round(source.timestamp_ms))
+    source.release()
+
+    assert timestamps == pts_ms
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_pipe_source_switches_to_index_timing_on_late_pts(
+    tmp_path, monkeypatch
+):
+    """A late ``showinfo`` line never shifts later frames onto stale pts."""
+
+    path = tmp_path / "clip.mp4"
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=64x48:rate=25"]
+        + ["-frames:v", "6", "-pix_fmt", "yuv420p", str(path)],
+        check=True,
+    )
+    monkeypatch.setattr(
+        video_io,
+        "_probe_stream",
+        lambda path: {"width": 64, "height": 48, "fps": 20.0, "frame_count": 6},
+    )
+    monkeypatch.setattr(video_io, "_PTS_TIMEOUT_S", 0.05)
+    read_pts = video_io.FFmpegPipeFrameSource._read_pts
+
+    def late_read_pts(self):
+        time.sleep(0.3)
+        read_pts(self)
+
+    monkeypatch.setattr(video_io.FFmpegPipeFrameSource, "_read_pts", late_read_pts)
+
+    source = video_io.FFmpegPipeFrameSource(str(path), ring_size=4)
+    timestamps = []
+    while source.read()[0]:
+        timestamps.append(round(source.timestamp_ms))
+    source.release()
+
+    # Index timing at the probed 20 fps, not the 25 fps pts.
+    assert timestamps == [0, 50, 100, 150, 200, 250]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_pipe_source_raises_when_ffmpeg_fails(tmp_path, monkeypatch):
+    """A broken input is an error, not an empty video counted as zero."""
+
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(b"not a video")
+    monkeypatch.setattr(
+        video_io,
+        "_probe_stream",
+        lambda path: {"width": 64, "height": 48, "fps": 25.0, "frame_count": 6},
+    )
+
+    source = video_io.FFmpegPipeFrameSource(str(path))
+    with pytest.raises(RuntimeError, match="ffmpeg falhou"):
+        source.read()
+    assert not source.isOpened()
+    source.release()
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_sink_writes_faststart_h264(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIDEO_ENCODER", "ffmpeg")
+    monkeypatch.setenv("ANNOTATED_MAX_SIZE", "32")
+    sink = video_io.open_video_sink(str(tmp_path / "out.mov"), 30.0, (64, 48))
+    for index in range(30):
+        sink.write(np.full((48, 64, 3), index * 8, dtype=np.uint8))
+    sink.release()
+
+    assert sink.output_path.endswith("out.mp4")
+    with av.open(sink.output_path) as container:
+        stream = container.streams.video[0]
+        assert stream.codec_context.name == "h264"
+        assert (stream.codec_context.width, stream.codec_context.height) == (32, 24)
+    with open(sink.output_path, "rb") as handle:
+        head = handle.read(4096)
+    assert head.find(b"moov") < head.find(b"mdat")
+    assert sink.encode_seconds > 0
@@ -0,0 +1,103 @@
+"""Tests for the multi-zone counter."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.line_counter import LineCounter  # isort: skip
+from utils.zones import Zone, ZoneCounter, parse_zones  # isort: skip
+
+
+def _boxes(*centers):
+    return np.asarray([[x - 2, y - 2, x + 2, y + 2] for x, y in centers], float)
+
+
+def _random_frames(rng, n_frames=60, n_tracks=40, size=200):
+    pos = rng.uniform(0, size, (n_tracks, 2))
+    vel = rng.uniform(-12, 12, (n_tracks, 2))
+    classes = rng.integers(0, 3, n_tracks)
+    frames = []
+    for _ in range(n_frames):
+        pos += vel
+        ids = np.flatnonzero(rng.random(n_tracks) > 0.15)
+        boxes = np.hstack((pos[ids] - 4, pos[ids] + 4)).astype(np.float32)
+        frames.append((ids, classes[ids], boxes))
+    return frames
+
+
+def test_long_horizontal_line_zone_matches_line_counter():
+    """A line zone spanning the frame counts exactly like ``LineCounter``."""
+
+    frames = _random_frames(np.random.default_rng(3))
+    line = LineCounter("horizontal", "top_bottom", 100, target_class_ids=[0, 2])
+    zone = Zone("l", "line", np.asarray([[-1e4, 100.0], [1e4, 100.0]]), "S")
+    zones = ZoneCounter([zone], target_class_ids=[0, 2])
+    for ids, classes, boxes in frames:
+        expected = line.update(ids, classes, boxes)
+        assert (zones.update(ids, classes, boxes)[:, 0] == expected).all()
+    assert zones.totals.tolist() == [line.total]
+
+
+def test_diagonal_segment_counts_only_through_the_segment_in_its_direction():
+    zone = parse_zones(
+        [{"type": "line", "points": [[0, 0], [0.5, 0.5]], "direction": "E"}],
+        100,
+        100,
+    )
+    counter = ZoneCounter(zone)
+    counter.update([1, 2, 3], [0, 0, 0], _boxes((20, 30), (70, 90), (30, 20)))
+    # 1 crosses the segment eastwards, 2 crosses the line beyond its end and
+    # 3 crosses it westwards.
+    counter.update([1, 2, 3], [0, 0, 0], _boxes((40, 30), (95, 90), (10, 20)))
+    assert counter.totals.tolist() == [1]
+    assert counter.state()["counted"] == [[1]]
+
+
+def test_polygon_and_line_zones_count_independently():
+    zones = parse_zones(
+        [
+            {
+                "name": "curral",
+                "type": "polygon",
+                "points": [[0.4, 0.4], [0.6, 0.4], [0.6, 0.6], [0.4, 0.6]],
+                "direction": "in",
+            },
+            {"name": "saida", "type": "polygon", "points": [[0, 0], [1, 0], [0, 1]]},
+            {"type": "line", "points": [[0, 0.5], [1, 0.5]], "direction": "S"},
+        ],
+        100,
+        100,
+    )
+    counter = ZoneCounter(zones)
+    counter.update([1, 2], [0, 1], _boxes((30, 20), (90, 90)))
+    new = counter.update([1, 2], [0, 1], _boxes((50, 45), (30, 30)))
+    counter.update([1, 2], [0, 1], _boxes((45, 52), (30, 35)))
+
+    # 1 enters the pen and then crosses the line; 2 enters the triangle.
+    assert new.tolist() == [[True, False, False], [False, True, False]]
+    report = counter.report({0: "cow", 1: "sheep"})
+    assert [(z["name"], z["total_count"]) for z in report] == [
+        ("curral", 1),
+        ("saida", 1),
+        ("zona_3", 1),
+    ]
+    assert report[1]["por_classe"] == {"sheep": 1}
+
+    restored = ZoneCounter(zones)
+    restored.restore(counter.state())
+    assert restored.state() == counter.state()
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"type": "line", "points": [[0, 0.5], [1, 0.5]], "direction": "E"},
+        {"type": "line", "points": [[0, 0.5]]},
+        {"type": "polygon", "points": [[0, 0], [1, 1]]},
+        {"type": "polygon", "points": [[0, 0], [1, 0], [2, 1]]},
+        {"type": "circle", "points": [[0, 0]]},
+    ],
+)
+def test_parse_zones_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_zones([spec], 100, 100)
@@ -0,0 +1,123 @@
+"""INT8 calibration set / Conjunto de calibração INT8.
+
+English:
+    Post-training quantization needs representative images. The calibration
+    set is built from our own videos with :func:`extract_frames.extract_frames`
+    (a fixed frame ``step`` per video, videos in sorted order), so running
+    ``python calibrate_int8.py`` again over the same videos yields the same
+    images. Its content hash is part of the name of every INT8 export, so a
+    new calibration set produces new artifacts instead of reusing stale ones.
+
+Português:
+    A quantização pós-treino precisa de imagens representativas, extraídas
+    dos nossos vídeos com ``extract_frames`` (passo fixo, vídeos ordenados).
+    O hash do conjunto faz parte do nome de cada exportação INT8.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CALIBRATION_DIR = os.path.join(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)),
+    "model_exports",
+    "calibration",
+)
+DEFAULT_CALIBRATION_STEP = 30
+_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+_hash_cache: Dict[Tuple, str] = {}
+
+
+def calibration_dir() -> str:
+    return os.getenv("CALIBRATION_DIR") or DEFAULT_CALIBRATION_DIR
+
+
+def calibration_images(images_dir: str) -> List[str]:
+    """Sorted image paths below ``images_dir``."""
+
+    images = []
+    for root, _, names in os.walk(images_dir):
+        images.extend(
+            os.path.join(root, name)
+            for name in names
+            if name.lower().endswith(_IMAGE_EXTENSIONS)
+        )
+    return sorted(images)
+
+
+def require_calibration_images(images_dir: str) -> List[str]:
+    images = calibration_images(images_dir)
+    if not images:
+        raise FileNotFoundError(
+            f"Nenhuma imagem de calibração em {images_dir}; "
+            "execute 'python calibrate_int8.py --videos <dir>'"
+        )
+    return images
+
+
+def calibration_hash(images_dir: str) -> str:
+    """Short SHA-256 over relative names and bytes of the calibration images."""
+
+    images = require_calibration_images(images_dir)
+    key = tuple(
+        (path, os.path.getmtime(path), os.path.getsize(path)) for path in images
+    )
+    if key not in _hash_cache:
+        digest = hashlib.sha256()
+        for path in images:
+            digest.update(os.path.relpath(path, images_dir).encode())
+            with open(path, "rb") as handle:
+                digest.update(handle.read())
+        _hash_cache[key] = digest.hexdigest()[:12]
+    return _hash_cache[key]
+
+
+def build_calibration_set(
+    videos: Iterable[str],
+    images_dir: str,
+    step: int = DEFAULT_CALIBRATION_STEP,
+) -> List[str]:
+    """Extract one frame every ``step`` frames of each video into ``images_dir``.
+
+    Extrai um frame a cada ``step`` de cada vídeo para ``images_dir``.
+    """
+
+    from extract_frames import extract_frames
+
+    for video in sorted(videos):
+        stem = os.path.splitext(os.path.basename(video))[0]
+        extract_frames(video, os.path.join(images_dir, stem), step=step)
+    images = calibration_images(images_dir)
+    logger.info("[CALIBRACAO] %s imagens em %s", len(images), images_dir)
+    return images
+
+
+def write_dataset_yaml(images_dir: str, names: Dict[int, str]) -> str:
+    """Write the dataset file Ultralytics expects for ``int8`` exports.
+
+    English:
+        JSON is valid YAML, so no YAML writer is needed. Labels are not used
+        for calibration; train and val both point at the images.
+
+    Português:
+        JSON é YAML válido; os rótulos não são usados na calibração.
+    """
+
+    path = os.path.join(images_dir, "calibration.yaml")
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(
+            {
+                "path": os.path.abspath(images_dir),
+                "train": ".",
+                "val": ".",
+                "names": {int(k): v for k, v in dict(names).items()},
+            },
+            handle,
+        )
+    return path
@@ -2,34 +2,80 @@ from __future__ import annotations
 
 import logging
 import os
+import shutil
 import subprocess
+import time
 from collections import defaultdict
+from dataclasses import replace
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from utils.checkpoint import (
+    DEFAULT_CHECKPOINT_INTERVAL_S,
+    ResumeIdMapper,
+    load_checkpoint,
+    part_path,
+    remove_checkpoint,
+    save_checkpoint,
+)
+from utils.detection_cache import (
+    DetectionRecorder,
+    cache_key,
+    content_hash,
+    evict,
+    load_cached,
+)
+from utils.env import get_env_float, get_env_int
+from utils.event_log import EventLog, event_log_path
+from utils.imgsz_probe import (
+    AUTO_IMGSZ,
+    DEFAULT_BOX_PERCENTILE,
+    DEFAULT_MIN_BOX_PX,
+    DEFAULT_PROBE_FRAMES,
+    imgsz_ladder,
+    probe_video_imgsz,
+)
+from utils.line_counter import (
+    LINE_HORIZONTAL,
+    LINE_VERTICAL,
+    MOVE_BT,
+    MOVE_LR,
+    MOVE_RL,
+    MOVE_TB,
+    LineCounter,
+    box_centroids,
+)
+from utils.media_probe import discard_probe, probe_media
+from utils.model_export import inference_backend
+from utils.model_registry import get_model_registry, int8_imgsz, is_int8_choice
+from utils.motion import DEFAULT_MAX_IDLE, MotionGate
+from utils.pipeline import END_OF_STREAM, Pipeline
+from utils.render import register_render
+from utils.segments import DEFAULT_OVERLAP_MS, Segment, plan_segments, run_segments
+from utils.tracking import (
+    DEFAULT_BAND_RATIO,
+    DEFAULT_TILE_OVERLAP,
+    FrameDetections,
+    RoiBandDetector,
+    TiledTrackDetector,
+    create_frame_detector,
+    create_tracker,
+    line_band,
+    roi_imgsz,
+    tracker_choice,
+)
+from utils.video_io import concat_videos, open_frame_source, open_video_sink
+from utils.zones import ZoneCounter, axis_line_zone, parse_zones
 
 logger = logging.getLogger(__name__)
 
 # --- Constantes para Clareza ---
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-LINE_HORIZONTAL: str = "horizontal"
-LINE_VERTICAL: str = "vertical"
-MOVE_TB: str = "top_bottom"
-MOVE_BT: str = "bottom_top"
-MOVE_LR: str = "left_right"
-MOVE_RL: str = "right_left"
-
-
-def _get_env_int(name: str, default: int) -> int:
-    value = os.getenv(name)
-    if value is None or value == "":
-        return default
-    try:
-        return int(value)
-    except ValueError:
-        return default
+COLOR_COUNTED = (0, 165, 255)
+COLOR_IGNORED = (200, 200, 200)
+COLOR_TRACKED = (0, 255, 0)
 
 
 def _resolve_output_dir(use_sftp: bool) -> str:
@@ -45,39 +91,17 @@ def get_video_rotation(video_path: str) -> int:
     """Retrieve rotation metadata / Obtém metadados de rotação.
 
     English:
-        Runs ``ffprobe`` to read the ``rotate`` tag from the first video
-        stream. Returns the rotation angle in degrees (0, 90, 180 or 270).
+        Reads the rotation (``rotate`` tag or display matrix) from the cached
+        media probe of the video. Returns the rotation angle in degrees (0,
+        90, 180 or 270), ``0`` when the video cannot be probed.
 
     Português:
-        Executa ``ffprobe`` para ler a tag ``rotate`` do primeiro stream de
-        vídeo. Retorna o ângulo de rotação em graus (0, 90, 180 ou 270).
+        Lê a rotação (tag ``rotate`` ou matriz de exibição) da sonda de mídia
+        em cache. Retorna o ângulo de rotação em graus (0, 90, 180 ou 270).
     """
 
-    try:
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream_tags=rotate",
-            "-of",
-            "default=nw=1:nk=1",
-            video_path,
-        ]
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
-        )
-        rotation = int(result.stdout.strip())
-        return rotation % 360
-    except Exception as e:  # pragma: no cover - fallback in case of failure
-        logger.debug("Rotation metadata not found or ffprobe failed: %s", e)
-        return 0
+    media = probe_media(video_path)
+    return media["rotation"] if media else 0
 
 
 def apply_rotation(frame: np.ndarray, rotation: int) -> np.ndarray:
@@ -99,6 +123,157 @@ def apply_rotation(frame: np.ndarray, rotation: int) -> np.ndarray:
     return frame
 
 
+def rotate_boxes(
+    boxes: np.ndarray, rotation: int, width: int, height: int
+) -> np.ndarray:
+    """Map boxes as :func:`apply_rotation` maps the frame / Rotaciona caixas.
+
+    English:
+        ``boxes`` are ``xyxy`` in an unrotated ``width`` x ``height`` frame;
+        the result is ``xyxy`` in the rotated frame, so detection can run on
+        the frame as decoded.
+
+    Português:
+        ``boxes`` são ``xyxy`` no frame sem rotação (``width`` x ``height``);
+        o resultado está nas coordenadas do frame rotacionado.
+    """
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    if rotation == 90:
+        return np.column_stack((height - y2, x1, height - y1, x2))
+    if rotation == 180:
+        return np.column_stack((width - x2, height - y2, width - x1, height - y1))
+    if rotation == 270:
+        return np.column_stack((y1, width - x2, y2, width - x1))
+    return boxes
+
+
+def unrotate_band(
+    line_type: str, band: Tuple[float, float], rotation: int
+) -> Tuple[str, Tuple[float, float]]:
+    """Line type and band of the rotated frame in the unrotated one.
+
+    Used by the ROI band, tiles and motion gate when detection runs on frames
+    that were not rotated (``ROTATION_MODE=boxes``).
+    """
+
+    flipped = (1.0 - band[1], 1.0 - band[0])
+    other = LINE_VERTICAL if line_type == LINE_HORIZONTAL else LINE_HORIZONTAL
+    if rotation == 180:
+        return line_type, flipped
+    if rotation == 90:
+        return other, band if line_type == LINE_HORIZONTAL else flipped
+    if rotation == 270:
+        return other, flipped if line_type == LINE_HORIZONTAL else band
+    return line_type, band
+
+
+def _scale_points(points: Optional[Tuple], scale: float) -> Optional[Tuple]:
+    if not points:
+        return points
+    return tuple((int(x * scale), int(y * scale)) for x, y in points)
+
+
+def draw_annotations(
+    frame: np.ndarray,
+    boxes: List[Tuple],
+    line_points: Optional[Tuple],
+    arrow_points: Optional[Tuple],
+    total_count: int,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """Draw boxes, counting line and total in place / Desenha as anotações.
+
+    English:
+        ``boxes`` holds ``(x1, y1, x2, y2, label, color)`` tuples. Coordinates
+        are multiplied by ``scale`` when the frame is smaller than the space
+        they were computed in.
+
+    Português:
+        ``boxes`` contém tuplas ``(x1, y1, x2, y2, rótulo, cor)``. As
+        coordenadas são multiplicadas por ``scale`` quando o frame é menor.
+    """
+
+    if scale != 1.0:
+        boxes = [
+            (int(x1 * scale), int(y1 * scale), int(x2 * scale), int(y2 * scale), *rest)
+            for x1, y1, x2, y2, *rest in boxes
+        ]
+        line_points = _scale_points(line_points, scale)
+        arrow_points = _scale_points(arrow_points, scale)
+    for x1, y1, x2, y2, label, color in boxes:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(
+            frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2
+        )
+    if line_points:
+        cv2.line(frame, line_points[0], line_points[1], (0, 0, 255), 3)
+    if arrow_points:
+        cv2.arrowedLine(
+            frame, arrow_points[0], arrow_points[1], (0, 255, 0), 2, tipLength=0.4
+        )
+    info_txt = f"Contagem: {total_count}"
+    cv2.putText(
+        frame,
+        info_txt,
+        (10, 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.0,
+        (0, 0, 0),
+        3,
+        cv2.LINE_AA,
+    )
+    cv2.putText(
+        frame,
+        info_txt,
+        (10, 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.0,
+        (255, 255, 255),
+        2,
+        cv2.LINE_AA,
+    )
+    return frame
+
+
+def annotation_boxes(
+    track_ids: np.ndarray,
+    classes: np.ndarray,
+    boxes: np.ndarray,
+    counted: np.ndarray,
+    names: Dict[int, str],
+    target_classes: Optional[List[str]] = None,
+) -> List[Tuple]:
+    """Boxes for :func:`draw_annotations` / Caixas para ``draw_annotations``.
+
+    English:
+        Counted tracks are orange, classes outside ``target_classes`` grey and
+        the other tracks green, labelled with class name and track id.
+
+    Português:
+        Trilhas contadas em laranja, classes fora de ``target_classes`` em
+        cinza e as demais em verde, com nome da classe e id da trilha.
+    """
+
+    caixas = []
+    for track_id, cls_id, box_coord, contado in zip(
+        track_ids.tolist(), classes.tolist(), boxes, counted.tolist()
+    ):
+        x1, y1, x2, y2 = map(int, box_coord)
+        nome_cls = names[int(cls_id)]
+        color = (
+            COLOR_COUNTED
+            if contado
+            else (
+                COLOR_IGNORED
+                if target_classes and nome_cls not in target_classes
+                else COLOR_TRACKED
+            )
+        )
+        caixas.append((x1, y1, x2, y2, f"{nome_cls} ID:{track_id}", color))
+    return caixas
+
+
 def get_line_and_direction_config(
     orientation_code: str, width: int, height: int, line_ratio: float = 0.5
 ) -> Tuple[
@@ -200,6 +375,339 @@ def get_line_and_direction_config(
         arrow_points,
     )
 
+class _CountingState:
+    """Counts of one job, updated frame by frame / Estado da contagem.
+
+    English:
+        :meth:`contar` maps the detector boxes back to the original, rotated
+        frame, feeds the line and zone counters and logs the counted
+        crossings; in a segment worker the crossings and the head/tail tracks
+        used for stitching are kept in ``eventos``, ``cabeca`` and ``cauda``
+        instead.
+
+    Português:
+        :meth:`contar` converte as caixas para o frame original, atualiza os
+        contadores de linha e zonas e registra as travessias; num segmento
+        guarda os eventos e as trilhas de costura.
+    """
+
+    def __init__(
+        self,
+        line_counter: LineCounter,
+        zone_counter: Optional[ZoneCounter],
+        names: Dict[int, str],
+        fps: float,
+        source_size: Tuple[int, int],
+        decode_scale: float = 1.0,
+        box_rotation: int = 0,
+        segment: Optional[Segment] = None,
+        recorder: Optional[DetectionRecorder] = None,
+        event_log: Optional[EventLog] = None,
+        annotate: bool = False,
+        target_classes: Optional[List[str]] = None,
+    ):
+        self.line_counter = line_counter
+        self.zone_counter = zone_counter
+        self.names = names
+        self.fps = fps
+        self.source_size = source_size
+        self.decode_scale = decode_scale
+        self.box_rotation = box_rotation
+        self.segment = segment
+        self.recorder = recorder
+        self.event_log = event_log
+        self.annotate = annotate
+        self.target_classes = target_classes
+        self.total_count = 0
+        self.por_classe: Dict[str, int] = defaultdict(int)
+        self.max_track_id = 0
+        self.ultimas_trilhas: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.id_mapper: Optional[ResumeIdMapper] = None
+        self.eventos: List[Tuple] = []
+        self.cabeca: Dict[int, List[List[float]]] = {}
+        self.cauda: Dict[int, List[List[float]]] = {}
+        # Annotation boxes of the last inferred frame, reused by gated frames.
+        self.caixas: List[Tuple] = []
+
+    def restore(self, checkpoint: Dict[str, Any]) -> None:
+        self.line_counter.restore(checkpoint["counter"])
+        if self.zone_counter is not None and checkpoint.get("zones"):
+            self.zone_counter.restore(checkpoint["zones"])
+        self.total_count = checkpoint["total_count"]
+        self.por_classe.update(checkpoint["por_classe"])
+        self.max_track_id = checkpoint["max_track_id"]
+        # The tracker restarts empty; its first tracks inherit the old ids.
+        self.id_mapper = ResumeIdMapper(checkpoint["last_tracks"], self.max_track_id)
+
+    def contar(self, deteccoes: FrameDetections, timestamp_ms: float) -> List[Tuple]:
+        if self.recorder is not None:
+            self.recorder.add(timestamp_ms, deteccoes)
+        boxes = deteccoes.boxes
+        if self.decode_scale != 1.0:
+            boxes = boxes * self.decode_scale
+        if self.box_rotation:
+            boxes = rotate_boxes(boxes, self.box_rotation, *self.source_size)
+        if self.id_mapper is not None:
+            deteccoes = replace(
+                deteccoes, track_ids=self.id_mapper(deteccoes.track_ids, boxes)
+            )
+        if len(deteccoes):
+            self.max_track_id = max(
+                self.max_track_id, int(deteccoes.track_ids.max())
+            )
+        self.ultimas_trilhas = (deteccoes.track_ids, boxes)
+        centroids = box_centroids(boxes)
+        novos = self.line_counter.update(
+            deteccoes.track_ids, deteccoes.classes, boxes, centroids
+        )
+        if self.zone_counter is not None:
+            self.zone_counter.update(
+                deteccoes.track_ids, deteccoes.classes, boxes, centroids
+            )
+        segment = self.segment
+        if segment is not None:
+            # Warm-up crossings belong to the previous segment.
+            if not segment.in_core(timestamp_ms):
+                novos = np.zeros_like(novos)
+            janela = (
+                self.cabeca
+                if segment.in_head(timestamp_ms)
+                else self.cauda if segment.in_tail(timestamp_ms) else None
+            )
+            if janela is not None and len(deteccoes):
+                janela[int(round(timestamp_ms * self.fps / 1000.0))] = (
+                    np.column_stack((deteccoes.track_ids, boxes)).tolist()
+                )
+        if novos.any():
+            frame_no = int(round(timestamp_ms * self.fps / 1000.0))
+            for track_id, cls_id, conf, box in zip(
+                deteccoes.track_ids[novos].tolist(),
+                deteccoes.classes[novos].tolist(),
+                deteccoes.confidences[novos].tolist(),
+                boxes[novos].tolist(),
+            ):
+                nome_cls = self.names[int(cls_id)]
+                self.por_classe[nome_cls] += 1
+                self.total_count += 1
+                evento = (timestamp_ms, track_id, nome_cls, frame_no, conf, box)
+                if segment is not None:
+                    self.eventos.append(evento)
+                elif self.event_log is not None:
+                    self.event_log.append(evento)
+        if not self.annotate:
+            return []
+
+        return annotation_boxes(
+            deteccoes.track_ids,
+            deteccoes.classes,
+            boxes,
+            self.line_counter.is_counted(deteccoes.track_ids),
+            self.names,
+            self.target_classes,
+        )
+
+
+def _decodificar(
+    pipeline: Pipeline,
+    frames_q: Any,
+    cap: Any,
+    frame_idx: int,
+    frame_skip: int,
+    frame_step: int,
+    rotation: int = 0,
+) -> None:
+    """Decode stage: ``(frame_idx, timestamp_ms, frame)`` into ``frames_q``.
+
+    ``rotation`` is applied here when the source does not rotate frames itself.
+    """
+
+    stats = pipeline.stage("decode")
+    try:
+        while not pipeline.stop_event.is_set():
+            start = time.perf_counter()
+            if frame_step == 1 and frame_idx % frame_skip:
+                # Skipped frames are only demuxed, never decoded to BGR.
+                ret = cap.grab()
+                stats.busy_seconds += time.perf_counter() - start
+                if not ret:
+                    break
+                frame_idx += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if rotation:
+                frame = apply_rotation(frame, rotation)
+            stats.busy_seconds += time.perf_counter() - start
+            stats.items += 1
+            item = (frame_idx, cap.timestamp_ms, frame)
+            if not pipeline.put(frames_q, item, stats):
+                break
+            frame_idx += frame_step
+    finally:
+        pipeline.put(frames_q, END_OF_STREAM, stats)
+
+
+class _AnnotatedVideoWriter:
+    """Encode stage of the annotated video / Estágio de codificação.
+
+    English:
+        :meth:`run` rotates (boxes mode), draws and writes the frames queued
+        by the inference stage. With checkpoints the video is written in
+        parts: a checkpoint dict in the queue closes the current part, opens
+        the next one and saves the checkpoint once every frame before it is
+        on disk.
+
+    Português:
+        :meth:`run` rotaciona, desenha e grava os frames. Com checkpoints o
+        vídeo é gravado em partes: um checkpoint na fila fecha a parte atual,
+        abre a próxima e grava o checkpoint.
+    """
+
+    def __init__(
+        self,
+        out: Any,
+        video_name: str,
+        output_path: str,
+        fps: float,
+        size: Tuple[int, int],
+        partes: List[str],
+        line_points: Tuple,
+        arrow_points: Tuple,
+        box_rotation: int = 0,
+        decode_scale: float = 1.0,
+    ):
+        self.out = out
+        self.video_name = video_name
+        self.output_path = output_path
+        self.fps = fps
+        self.size = size
+        self.partes = partes
+        self.line_points = line_points
+        self.arrow_points = arrow_points
+        self.box_rotation = box_rotation
+        self.decode_scale = decode_scale
+        # Encode time of the parts already closed.
+        self.encode_seconds_partes = 0.0
+
+    def run(self, pipeline: Pipeline, encode_q: Any) -> None:
+        stats = pipeline.stage("encode")
+        while True:
+            item = pipeline.get(encode_q, stats)
+            if item is END_OF_STREAM:
+                break
+            start = time.perf_counter()
+            if isinstance(item, dict):
+                # Checkpoint: close the part so it only references whole files.
+                self.out.release()
+                self.encode_seconds_partes += self.out.encode_seconds
+                self.partes.append(self.out.output_path)
+                self.out = open_video_sink(
+                    part_path(self.output_path, len(self.partes)),
+                    self.fps,
+                    self.size,
+                )
+                save_checkpoint(self.video_name, dict(item, parts=list(self.partes)))
+                stats.busy_seconds += time.perf_counter() - start
+                continue
+            frame, caixas, total = item
+            if self.box_rotation:
+                frame = apply_rotation(frame, self.box_rotation)
+            draw_annotations(
+                frame,
+                caixas,
+                self.line_points,
+                self.arrow_points,
+                total,
+                1.0 / self.decode_scale,
+            )
+            self.out.write(frame)
+            stats.items += 1
+            stats.busy_seconds += time.perf_counter() - start
+
+
+def _processar_lote(
+    pipeline: Pipeline,
+    detector: Any,
+    contador: _CountingState,
+    frames: List[np.ndarray],
+    ativos: List[bool],
+    tempos: List[float],
+    encode_q: Any = None,
+) -> bool:
+    """Inference stage for one batch; ``False`` once the pipeline stops.
+
+    Frames rejected by the motion gate (``ativos``) skip the detector and keep
+    the tracker and counters untouched. With ``encode_q`` every frame is
+    queued for the annotated video.
+    """
+
+    stats = pipeline.stage("inference")
+    start = time.perf_counter()
+    lote_deteccoes = iter(
+        detector([frame for frame, ativo in zip(frames, ativos) if ativo])
+    )
+    for frame, ativo, tempo in zip(frames, ativos, tempos):
+        if ativo:
+            contador.caixas = contador.contar(next(lote_deteccoes), tempo)
+        stats.items += 1
+        if encode_q is not None:
+            item = (frame, contador.caixas, contador.total_count)
+            stats.busy_seconds += time.perf_counter() - start
+            if not pipeline.put(encode_q, item, stats):
+                return False
+            start = time.perf_counter()
+    stats.busy_seconds += time.perf_counter() - start
+    return True
+
+
+def _estado_checkpoint(
+    video_name: str,
+    opcoes: Dict[str, Any],
+    contador: _CountingState,
+    frame_atual: int,
+    tempo: float,
+    fps: float,
+    frame_skip: int,
+    total_frames: int,
+    partes: List[str],
+) -> Dict[str, Any]:
+    """Snapshot saved by :func:`utils.checkpoint.save_checkpoint`."""
+
+    event_log = contador.event_log
+    return {
+        "video_name": video_name,
+        # Request payload used to re-enqueue the job on startup.
+        "options": opcoes,
+        "pts_ms": tempo,
+        "frame": frame_atual,
+        # Timestamp of the next sampled frame.
+        "resume_ms": (round(tempo * fps / 1000.0) + frame_skip) * 1000.0 / fps,
+        "next_frame": frame_atual + frame_skip,
+        "total_frames": total_frames,
+        "total_count": contador.total_count,
+        "por_classe": dict(contador.por_classe),
+        "counter": contador.line_counter.state(),
+        "zones": (
+            contador.zone_counter.state()
+            if contador.zone_counter is not None
+            else None
+        ),
+        "last_tracks": (
+            np.column_stack(contador.ultimas_trilhas).tolist()
+            if contador.ultimas_trilhas is not None
+            else []
+        ),
+        "max_track_id": contador.max_track_id,
+        "events": (
+            {"count": event_log.count, "bytes": event_log.bytes}
+            if event_log is not None
+            else None
+        ),
+        "parts": list(partes),
+    }
+
+
 def contar_gado_em_video(
     video_path: str,
     video_name: str,
@@ -213,14 +721,28 @@ def contar_gado_em_video(
     trim_end_ms: Optional[int] = None,
     status_check_interval: int = 30,
     cancel_callback: Optional[Callable[[], bool]] = None,
+    target_fps: Optional[float] = None,
+    roi_band_ratio: Optional[float] = None,
+    tiled_inference: Optional[bool] = None,
+    imgsz: Optional[int] = None,
+    tracker: Optional[str] = None,
+    zones: Optional[List[Dict[str, Any]]] = None,
+    sweep: Optional[List[Dict[str, Any]]] = None,
+    resume: bool = False,
+    video_hash: Optional[str] = None,
+    segment_workers: Optional[int] = None,
+    segment: Optional[Segment] = None,
 ) -> Optional[Dict[str, Any]]:
     """Realiza a contagem de gado em um arquivo de vídeo.
 
     Count cattle in a video file. Frames are rotated according to rotation
-    metadata before processing.
+    metadata before processing; with ``ROTATION_MODE=boxes`` detection runs on
+    the frames as decoded and only the boxes (and the annotated frames) are
+    rotated.
 
     Os frames são rotacionados conforme metadados de rotação antes do
-    processamento.
+    processamento; com ``ROTATION_MODE=boxes`` só as caixas (e os frames do
+    vídeo anotado) são rotacionadas.
 
     Parâmetros / Parameters:
         video_path (str): Caminho local para o vídeo.
@@ -249,6 +771,51 @@ def contar_gado_em_video(
         cancel_callback (Callable, opcional): Função que retorna ``True``
             quando o processamento deve ser cancelado. Callback returning
             ``True`` when the process should be cancelled.
+        target_fps (float, opcional): Taxa de análise desejada; quando
+            informada substitui ``frame_skip``. Target analysis frame rate;
+            overrides ``frame_skip`` when given.
+        roi_band_ratio (float, opcional): Espessura da faixa em torno da
+            linha, como fração do frame, onde a detecção é executada; ``0``
+            usa o frame inteiro (padrão: ``ROI_BAND_RATIO``). Thickness of the
+            band around the line, as a fraction of the frame, where detection
+            runs; ``0`` uses the full frame (default: ``ROI_BAND_RATIO``).
+        tiled_inference (bool, opcional): Decodifica na resolução original e
+            detecta em blocos sobrepostos de ``YOLO_IMG_SIZE`` que cruzam a
+            faixa da linha (padrão: ``TILED_INFERENCE``). Decodes at native
+            resolution and detects on overlapping ``YOLO_IMG_SIZE`` tiles
+            crossing the line band (default: ``TILED_INFERENCE``).
+        imgsz (int, opcional): Tamanho de entrada do modelo; substitui
+            ``YOLO_IMG_SIZE``. Com ``YOLO_IMG_SIZE=auto`` é escolhido por uma
+            amostra de frames. Model input size; overrides ``YOLO_IMG_SIZE``.
+            With ``YOLO_IMG_SIZE=auto`` it is chosen from sampled frames.
+        tracker (str, opcional): ``"botsort"`` (``model.track``) ou ``"iou"``
+            (rastreador NumPy leve sobre ``model.predict``) (padrão:
+            ``TRACKER``). ``"botsort"`` or ``"iou"`` (lightweight NumPy
+            tracker over ``model.predict``) (default: ``TRACKER``).
+        zones (List[dict], opcional): Segmentos de reta e polígonos contados
+            além da linha principal, na mesma passada (veja
+            :func:`utils.zones.parse_zones`). Line segments and polygons
+            counted besides the main line, in the same pass.
+        sweep (List[dict], opcional): Configurações candidatas
+            (``orientation``, ``line_position_ratio``) contadas cada uma com
+            seu próprio estado, sobre as mesmas detecções. Candidate line
+            settings, each counted with its own state over the same
+            detections.
+        resume (bool, opcional): Retoma do último checkpoint do vídeo, se
+            houver, em vez do início. Resumes from the video's last
+            checkpoint, if any, instead of the start.
+        video_hash (str, opcional): SHA-256 do vídeo já calculado no upload;
+            evita ler o arquivo de novo para o cache de detecções. SHA-256 of
+            the video computed during upload; avoids reading the file again
+            for the detection cache.
+        segment_workers (int, opcional): Processos usados para contar
+            segmentos do vídeo em paralelo (padrão: ``SEGMENT_WORKERS``).
+            Processes counting video segments in parallel (default:
+            ``SEGMENT_WORKERS``).
+        segment (Segment, opcional): Uso interno dos processos de segmento;
+            conta só a janela principal e devolve os dados de costura.
+            Internal, set by segment workers: counts only the core window and
+            returns the stitching data.
 
     Retorno / Returns:
         dict | None: Dicionário com estatísticas da contagem ou ``None`` em
@@ -281,9 +848,26 @@ def contar_gado_em_video(
     CREATE_ANNOTATED_VIDEO = (
         os.getenv("CREATE_ANNOTATED_VIDEO", "true").lower() == "true"
     )
+    if segment is not None:
+        # The parent process owns uploads, cleanup and the annotated video.
+        USE_SFTP = False
+        CREATE_ANNOTATED_VIDEO = False
+    # Deferred: keep the detections and render on the first request instead.
+    render_deferred = (
+        CREATE_ANNOTATED_VIDEO
+        and os.getenv("ANNOTATED_VIDEO_MODE", "inline").lower() == "deferred"
+    )
+    if render_deferred and USE_SFTP:
+        logger.warning(
+            "[CONFIG] Renderização sob demanda exige disco local; usando modo inline."
+        )
+        render_deferred = False
+    if render_deferred:
+        CREATE_ANNOTATED_VIDEO = False
 
     logger.info(f"[CONFIG] Modo SFTP Ativado: {USE_SFTP}")
     logger.info(f"[CONFIG] Gerar Vídeo Anotado: {CREATE_ANNOTATED_VIDEO}")
+    logger.info(f"[CONFIG] Vídeo anotado sob demanda: {render_deferred}")
 
     sftp_current_action = ""
 
@@ -313,41 +897,137 @@ def contar_gado_em_video(
                 progresso_manager.erro(video_name, error_msg)
             if os.path.exists(local_video_path):
                 os.remove(local_video_path)
+            discard_probe(local_video_path)
             return None
     else:
         progresso_manager.update_status_message(
             video_name, "Iniciando processamento..."
         )
 
-    model_files = {
-        "n": "yolov8n.pt",
-        "m": "yolov8m.pt",
-        "l": "yolov8l.pt",
-        "p": "best.pt",
-    }
-    actual_model_path = model_files.get(str(model_choice).lower(), "yolov8l.pt")
-
-    try:
-        model = YOLO(actual_model_path)
-    except Exception as e:
-        if progresso_manager:
-            progresso_manager.erro(video_name, f"Falha ao carregar modelo: {e}")
-        return None
+    if tiled_inference is None:
+        tiled_inference = os.getenv("TILED_INFERENCE", "false").lower() == "true"
+
+    tracker = tracker_choice(tracker)
+    logger.info(f"[CONFIG] Rastreador: {tracker}")
+
+    imgsz_probe = None
+    int8 = is_int8_choice(model_choice)
+    if int8:
+        # Only the calibrated export size exists for INT8 models.
+        imgsz = int8_imgsz(imgsz)
+    if imgsz is None:
+        auto_imgsz = os.getenv("YOLO_IMG_SIZE", "").strip().lower() == AUTO_IMGSZ
+        # Tiles already keep small animals at native resolution.
+        if auto_imgsz and not tiled_inference:
+            ladder = imgsz_ladder()
+            try:
+                with get_model_registry().lease(
+                    model_choice, imgsz=max(ladder)
+                ) as probe_model:
+                    imgsz_probe = probe_video_imgsz(
+                        local_video_path,
+                        probe_model,
+                        start_ms=max(trim_start_ms or 0, 0),
+                        end_ms=max(trim_end_ms, 0) if trim_end_ms is not None else None,
+                        ladder=ladder,
+                        frame_count=get_env_int(
+                            "IMGSZ_PROBE_FRAMES", DEFAULT_PROBE_FRAMES
+                        ),
+                        min_box_px=get_env_float(
+                            "IMGSZ_MIN_BOX_PX", DEFAULT_MIN_BOX_PX
+                        ),
+                        percentile=get_env_float(
+                            "IMGSZ_BOX_PERCENTILE", DEFAULT_BOX_PERCENTILE
+                        ),
+                    )
+                logger.info(f"[CONFIG] Sonda de imgsz: {imgsz_probe}")
+            except Exception as exc:
+                logger.warning(f"[CONFIG] Sonda de imgsz falhou ({exc}); usando 512.")
+            imgsz = (imgsz_probe or {}).get("imgsz")
+        if imgsz is None:
+            imgsz = get_env_int("YOLO_IMG_SIZE", 512)
+    if imgsz <= 0:
+        imgsz = 512
+    logger.info(f"[CONFIG] YOLO imgsz: {imgsz}")
+    batch_size = max(get_env_int("INFERENCE_BATCH_SIZE", 1), 1)
+    queue_size = max(get_env_int("PIPELINE_QUEUE_SIZE", 8), 2 * batch_size)
+    logger.info(f"[CONFIG] Batch de inferência: {batch_size}")
+
+    checkpoint_interval = 0.0
+    checkpoint = None
+    if segment is None:
+        checkpoint_interval = get_env_float(
+            "CHECKPOINT_INTERVAL_SECONDS", DEFAULT_CHECKPOINT_INTERVAL_S
+        )
+        if resume:
+            checkpoint = load_checkpoint(video_name)
+            if checkpoint is None:
+                logger.warning(f"[CHECKPOINT] Nenhum checkpoint para {video_name}.")
+            else:
+                logger.info(
+                    f"[CHECKPOINT] Retomando {video_name} de "
+                    f"{checkpoint['pts_ms']:.0f}ms (frame {checkpoint['frame']})"
+                )
+                if render_deferred:
+                    # Detections before the checkpoint were not kept.
+                    logger.warning(
+                        "[CHECKPOINT] Job retomado; vídeo anotado sob demanda "
+                        "indisponível."
+                    )
+                    render_deferred = False
+        else:
+            # A new job must not inherit the checkpoint of a previous one.
+            remove_checkpoint(video_name)
+    # Accounting (progress, trim range) still uses the original trim start.
+    source_start_ms = checkpoint["resume_ms"] if checkpoint else trim_start_ms
 
-    cap = cv2.VideoCapture(local_video_path)
+    rotation = get_video_rotation(local_video_path)
+    # Boxes mode: detect on the decoded frame and rotate only the boxes.
+    box_rotation = (
+        rotation if os.getenv("ROTATION_MODE", "frames").lower() == "boxes" else 0
+    )
+    logger.info(f"[CONFIG] Rotação: {rotation} (caixas: {bool(box_rotation)})")
+    source_frame_skip = max(int(frame_skip or 1), 1)
+    cap = open_frame_source(
+        local_video_path,
+        start_ms=max(source_start_ms, 0) if source_start_ms else None,
+        end_ms=max(trim_end_ms, 0) if trim_end_ms is not None else None,
+        # Only used by the ffmpeg pipe decoder.
+        rotation=0 if box_rotation else rotation,
+        # Tiles need native resolution; otherwise decode near the model size.
+        target_size=None if tiled_inference else imgsz,
+        frame_skip=source_frame_skip,
+        target_fps=target_fps,
+        ring_size=2 * queue_size + batch_size + 4,
+    )
     if not cap.isOpened():
         if progresso_manager:
             progresso_manager.erro(video_name, "Falha ao abrir o arquivo de vídeo.")
         return None
 
-    rotation = get_video_rotation(local_video_path)
-    total_frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    # The probe counts packets and averages fps over the duration, which the
+    # decoder properties only estimate (notably for variable frame rate).
+    media = probe_media(local_video_path)
+    total_frame_count = media["frame_count"] if media else cap.frame_count
+    fps = media["fps"] if media and media["fps"] > 0 else cap.fps
     _fps = fps if fps > 0 else 30.0
-    imgsz = _get_env_int("YOLO_IMG_SIZE", 512)
-    if imgsz <= 0:
-        imgsz = 512
-    logger.info(f"[CONFIG] YOLO imgsz: {imgsz}")
+    frame_step = getattr(cap, "frame_step", 1)
+    rotate_frames = (
+        bool(rotation)
+        and not box_rotation
+        and not getattr(cap, "applies_rotation", False)
+    )
+    decode_scale = getattr(cap, "scale", 1.0)
+    # Size of the frames given to the detector, before any rotation.
+    source_width = getattr(cap, "output_width", cap.width)
+    source_height = getattr(cap, "output_height", cap.height)
+
+    if frame_step > 1:
+        frame_skip = frame_step
+    elif target_fps:
+        frame_skip = max(int(round(_fps / target_fps)), 1)
+    frame_skip = max(int(frame_skip or 1), 1)
+    logger.info(f"[CONFIG] Frame skip: {frame_skip}")
 
     start_frame = 0
     end_frame = max(total_frame_count - 1, 0) if total_frame_count > 0 else 0
@@ -363,6 +1043,7 @@ def contar_gado_em_video(
         start_frame = max(start_frame, 0)
         end_frame = max(end_frame, start_frame)
 
+    # Frame numbers only estimate progress; the source trims by timestamp.
     logger.info(
         "[CONFIG] Trim range ms: start=%s end=%s -> frames %s-%s",
         trim_start_ms,
@@ -378,12 +1059,9 @@ def contar_gado_em_video(
         cap.release()
         return None
 
-    if start_frame > 0:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-
     original_frame_count = trimmed_frame_count
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    width = cap.width
+    height = cap.height
     if rotation in (90, 270):
         width, height = height, width
 
@@ -409,15 +1087,140 @@ def contar_gado_em_video(
         cap.release()
         return None
 
-    current_total_count = 0
-    current_por_classe = defaultdict(int)
-    track_ids_contados = set()
-    track_previous_x = {}
-    track_previous_y = {}
+    try:
+        zonas = parse_zones(zones, width, height)
+        # Each candidate is an unbounded line zone with its own counted ids.
+        varredura = []
+        for index, candidato in enumerate(sweep or []):
+            c_type, c_dir, _, c_coord, _ = get_line_and_direction_config(
+                candidato["orientation"],
+                width,
+                height,
+                candidato.get("line_position_ratio", 0.5),
+            )
+            varredura.append(
+                axis_line_zone(
+                    f"sweep_{index + 1}", c_type, c_dir, c_coord, width, height
+                )
+            )
+    except ValueError as exc:
+        if progresso_manager:
+            progresso_manager.erro(video_name, str(exc))
+        cap.release()
+        return None
+
+    if roi_band_ratio is None:
+        roi_band_ratio = get_env_float("ROI_BAND_RATIO", 0.0)
+    zonas_extras = zonas + varredura
+    if zonas_extras and 0 < roi_band_ratio < 1:
+        logger.warning("[ZONAS] Zonas exigem o frame inteiro; ignorando a faixa ROI.")
+        roi_band_ratio = 0.0
+    motion_threshold = get_env_float("MOTION_GATE_THRESHOLD", 0.0)
+
+    # Only detections that do not depend on the line can be replayed with
+    # other line settings.
+    detection_key = None
+    cache_hit = None
+    if (
+        segment is None
+        and checkpoint is None
+        and os.getenv("DETECTION_CACHE", "false").lower() == "true"
+        and not tiled_inference
+        and not 0 < roi_band_ratio < 1
+        and motion_threshold <= 0
+    ):
+        detection_key = cache_key(
+            video_hash or content_hash(local_video_path),
+            {
+                "model_choice": model_choice,
+                "inference_backend": inference_backend(),
+                "imgsz": imgsz,
+                "tracker": tracker,
+                "frame_skip": frame_skip,
+                "trim_start_ms": trim_start_ms,
+                "trim_end_ms": trim_end_ms,
+                "decode_scale": round(decode_scale, 6),
+                # Boxes mode records unrotated boxes.
+                **({"box_rotation": box_rotation} if box_rotation else {}),
+            },
+        )
+        cache_hit = load_cached(detection_key)
+        logger.info(
+            f"[CACHE] {detection_key}: {'reaproveitado' if cache_hit else 'novo'}"
+        )
+
+    if segment_workers is None:
+        segment_workers = get_env_int("SEGMENT_WORKERS", 1)
+    if segment is None and segment_workers > 1 and cache_hit is None:
+        if CREATE_ANNOTATED_VIDEO or render_deferred or zonas_extras:
+            logger.warning(
+                "[SEGMENTOS] Vídeo anotado e zonas exigem passada única; "
+                "ignorando SEGMENT_WORKERS."
+            )
+        else:
+            cap.release()
+            return _contar_em_segmentos(
+                local_video_path,
+                video_name,
+                progresso_manager,
+                segment_workers,
+                start_ms=max(trim_start_ms or 0, 0),
+                end_ms=(
+                    max(trim_end_ms, 0)
+                    if trim_end_ms is not None
+                    else (end_frame + 1) * 1000.0 / _fps
+                ),
+                max_gap=frame_skip,
+                total_frames=original_frame_count,
+                cancel_callback=cancel_callback,
+                remote_video_original=remote_video_original if USE_SFTP else None,
+                options={
+                    "model_choice": model_choice,
+                    "frame_skip": frame_skip,
+                    "orientation": orientation,
+                    "target_classes": target_classes,
+                    "line_position_ratio": line_position_ratio,
+                    "target_fps": target_fps,
+                    "roi_band_ratio": roi_band_ratio,
+                    "tiled_inference": tiled_inference,
+                    # Workers reuse the probed size instead of probing again.
+                    "imgsz": imgsz,
+                    "tracker": tracker,
+                },
+                imgsz_probe=imgsz_probe,
+            )
 
     out = None
     local_output_path = ""
     processed_fn = ""
+    # With checkpoints the annotated video is written in parts, one per
+    # checkpoint, and concatenated at the end.
+    if CREATE_ANNOTATED_VIDEO and checkpoint_interval > 0 and not shutil.which(
+        "ffmpeg"
+    ):
+        # The parts cannot be joined without ffmpeg, and a resumed job would
+        # overwrite a single output file: write one file, without checkpoints.
+        logger.warning(
+            "[CHECKPOINT] ffmpeg não encontrado; checkpoints desativados para "
+            f"{video_name} (vídeo anotado em arquivo único)"
+        )
+        checkpoint_interval = 0.0
+    gravar_partes = CREATE_ANNOTATED_VIDEO and checkpoint_interval > 0
+    partes: List[str] = [
+        parte for parte in (checkpoint or {}).get("parts", []) if os.path.exists(parte)
+    ]
+    sink_size = (
+        getattr(cap, "output_width", width),
+        getattr(cap, "output_height", height),
+    )
+    if box_rotation in (90, 270) and hasattr(cap, "output_width"):
+        sink_size = sink_size[::-1]
+    if CREATE_ANNOTATED_VIDEO and getattr(cap, "scale", 1.0) != 1.0:
+        # Drawing on the downscaled decode frames avoids an upscale per frame.
+        logger.info(
+            f"[VIDEO] Vídeo anotado em {sink_size[0]}x{sink_size[1]} "
+            f"(tamanho de decodificação do {cap.backend})"
+        )
     if CREATE_ANNOTATED_VIDEO:
         output_dir_local = _resolve_output_dir(USE_SFTP)
         os.makedirs(output_dir_local, exist_ok=True)
@@ -426,203 +1229,388 @@ def contar_gado_em_video(
         processed_fn = f"processed_{base_name}{vid_ext}"
         local_output_path = os.path.join(output_dir_local, processed_fn)
         try:
-            out = cv2.VideoWriter(
-                local_output_path,
-                cv2.VideoWriter_fourcc(*"mp4v"),
-                _fps,
-                (width, height),
+            out = open_video_sink(
+                (
+                    part_path(local_output_path, len(partes))
+                    if gravar_partes
+                    else local_output_path
+                ),
+                _fps / frame_skip,
+                sink_size,
+            )
+            # The sink may change the extension of the requested path.
+            local_output_path = (
+                os.path.splitext(local_output_path)[0]
+                + os.path.splitext(out.output_path)[1]
             )
+            processed_fn = os.path.basename(local_output_path)
             if not out.isOpened():
-                raise IOError(f"VideoWriter falhou para {local_output_path}")
+                raise IOError(f"VideoWriter falhou para {out.output_path}")
         except Exception as e:
             if progresso_manager:
                 progresso_manager.erro(video_name, f"VideoWriter: {e}")
             cap.release()
             return None
+    elif render_deferred:
+        # Both encoders can write ``.mp4``, so the public name is known now.
+        processed_fn = f"processed_{os.path.splitext(video_name)[0]}.mp4"
+
+    roi_report = None
+    detector_imgsz = imgsz
+    # Zones may lie anywhere, so tiles and the motion gate cover the frame.
+    band = (
+        (0.0, 1.0)
+        if zonas_extras
+        else line_band(line_position_ratio, DEFAULT_BAND_RATIO)
+    )
+    if 0 < roi_band_ratio < 1:
+        band = line_band(line_position_ratio, roi_band_ratio)
+        if not tiled_inference and not int8:
+            detector_imgsz = roi_imgsz(imgsz, width, height, line_type, band)
+        roi_report = {"band": list(band), "imgsz": detector_imgsz}
+        logger.info(f"[CONFIG] ROI em torno da linha: {roi_report}")
+    # Line type and band as seen by the detector and the motion gate.
+    source_line_type, source_band = unrotate_band(line_type, band, box_rotation)
+    tiles_report = None
+
+    model = None
+    model_registry = get_model_registry()
+    if cache_hit is not None:
+        names = cache_hit.names
+    else:
+        try:
+            model = model_registry.acquire(model_choice, imgsz=detector_imgsz)
+        except Exception as e:
+            if progresso_manager:
+                progresso_manager.erro(video_name, f"Falha ao carregar modelo: {e}")
+            cap.release()
+            if out and out.isOpened():
+                out.release()
+            return None
+        names = model.names
+
+    target_class_ids = (
+        None
+        if target_classes is None
+        else [cls_id for cls_id, nome in names.items() if nome in target_classes]
+    )
+    line_counter = LineCounter(
+        line_type,
+        effective_counting_dir,
+        line_coord_val,
+        target_class_ids=target_class_ids,
+    )
+    # Zones and sweep candidates share one vectorized counter.
+    zone_counter = (
+        ZoneCounter(zonas_extras, target_class_ids) if zonas_extras else None
+    )
+    recorder = (
+        DetectionRecorder()
+        if (detection_key is not None or render_deferred) and cache_hit is None
+        else None
+    )
+
+    pipeline = Pipeline(queue_size)
+    pipeline.stage("decode")
+    infer_stats = pipeline.stage("inference")
+    pipeline.stage("encode")
+    frames_q = pipeline.new_queue()
+    encode_q = pipeline.new_queue() if out is not None else None
+    escritor = (
+        _AnnotatedVideoWriter(
+            out,
+            video_name,
+            local_output_path,
+            _fps / frame_skip,
+            sink_size,
+            partes,
+            line_points,
+            arrow_points,
+            box_rotation=box_rotation,
+            decode_scale=decode_scale,
+        )
+        if out is not None
+        else None
+    )
+
+    motion_gate = None
+    if motion_threshold > 0:
+        motion_gate = MotionGate(
+            motion_threshold,
+            max_idle=get_env_int("MOTION_GATE_MAX_IDLE", DEFAULT_MAX_IDLE),
+            line_type=source_line_type,
+            band=source_band,
+        )
+        logger.info(f"[CONFIG] Filtro de movimento: limiar={motion_threshold}")
+
+    event_log = None
+    if segment is None and os.getenv("EVENT_LOG", "true").lower() == "true":
+        registro = (checkpoint or {}).get("events") or {}
+        event_log = EventLog(
+            event_log_path(video_name),
+            offset=registro.get("bytes", 0),
+            count=registro.get("count", 0),
+        )
+
+    contador = _CountingState(
+        line_counter,
+        zone_counter,
+        names,
+        _fps,
+        (cap.width, cap.height),
+        decode_scale=decode_scale,
+        box_rotation=box_rotation,
+        segment=segment,
+        recorder=recorder,
+        event_log=event_log,
+        annotate=CREATE_ANNOTATED_VIDEO,
+        target_classes=target_classes,
+    )
+    if checkpoint:
+        contador.restore(checkpoint)
+
+    opcoes = {
+        "model_choice": model_choice,
+        "frame_skip": frame_skip,
+        "orientation": orientation,
+        "target_classes": target_classes,
+        "line_position_ratio": line_position_ratio,
+        "trim_start_ms": trim_start_ms,
+        "trim_end_ms": trim_end_ms,
+        "target_fps": target_fps,
+        "roi_band_ratio": roi_band_ratio,
+        "tiled_inference": tiled_inference,
+        "imgsz": imgsz,
+        "tracker": tracker,
+        "zones": zones,
+        "sweep": sweep,
+    }
+    checkpoints = 0
+    ultimo_checkpoint = time.perf_counter()
 
-    frame_atual = 0
     cancelado_cache = False
+    sem_memoria = False
     last_status_check_frame = -status_check_interval
-    while cap.isOpened() and frame_atual < original_frame_count:
-        if cancel_callback:
-            cancelado_cache = cancel_callback()
-        elif frame_atual - last_status_check_frame >= status_check_interval:
-            cancelado_cache = progresso_manager.status(video_name).get("cancelado")
-            last_status_check_frame = frame_atual
-        if cancelado_cache:
-            break
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if rotation:
-            frame = apply_rotation(frame, rotation)
-
-        if frame_atual % frame_skip == 0:
-            if not progresso_manager.atualizar(
-                video_name, frame_atual, original_frame_count
-            ):
-                break
-
-            try:
-                results = model.track(
-                    frame, persist=True, verbose=False, conf=0.3, imgsz=imgsz
+    lote: List[np.ndarray] = []
+    lote_ativos: List[bool] = []
+    lote_tempos: List[float] = []
+    try:
+        if cache_hit is not None:
+            detector = cache_hit.detector()
+        elif tiled_inference:
+            detector = TiledTrackDetector(
+                model,
+                imgsz,
+                line_type=source_line_type,
+                band=source_band,
+                overlap=get_env_float("TILE_OVERLAP", DEFAULT_TILE_OVERLAP),
+                tracker=create_tracker(tracker),
+            )
+            frame_w, frame_h = (
+                (source_width, source_height)
+                if box_rotation
+                else (
+                    getattr(cap, "output_width", width),
+                    getattr(cap, "output_height", height),
                 )
-            except RuntimeError as exc:
-                if "not enough memory" in str(exc).lower():
-                    if progresso_manager:
-                        progresso_manager.erro(
-                            video_name,
-                            "Memoria insuficiente para processar o video. Use modelo menor (n/m) ou reduza YOLO_IMG_SIZE.",
-                        )
-                    if cap.isOpened():
-                        cap.release()
-                    if out and out.isOpened():
-                        out.release()
-                    return None
-                raise
-
-            annotated_frame = frame.copy() if CREATE_ANNOTATED_VIDEO else None
-            if results[0].boxes is not None and results[0].boxes.id is not None:
-                current_tracked_ids = set(results[0].boxes.id.cpu().numpy().astype(int))
-                for r_id, cls_id, box_coord in zip(
-                    current_tracked_ids,
-                    results[0].boxes.cls.cpu().numpy(),
-                    results[0].boxes.xyxy.cpu().numpy(),
+            )
+            tiles_report = {
+                "tile_size": imgsz,
+                "overlap": detector.overlap,
+                "tiles_per_frame": len(detector.grid(frame_h, frame_w)),
+            }
+            logger.info(f"[CONFIG] Inferência em blocos: {tiles_report}")
+        else:
+            detector = create_frame_detector(
+                model, detector_imgsz, batch_size, tracker
+            )
+            if roi_report is not None:
+                detector = RoiBandDetector(detector, source_line_type, source_band)
+        if cache_hit is not None and out is None:
+            # Nothing to decode or draw: replay the cached frames directly.
+            for tempo, deteccoes in cache_hit.frames():
+                contador.contar(deteccoes, tempo)
+            progresso_manager.atualizar(
+                video_name, original_frame_count, original_frame_count
+            )
+        else:
+            pipeline.start_thread(
+                f"decode-{video_name}",
+                lambda: _decodificar(
+                    pipeline,
+                    frames_q,
+                    cap,
+                    checkpoint["next_frame"] if checkpoint else 0,
+                    frame_skip,
+                    frame_step,
+                    rotation if rotate_frames else 0,
+                ),
+            )
+            if escritor is not None:
+                pipeline.start_thread(
+                    f"encode-{video_name}", lambda: escritor.run(pipeline, encode_q)
+                )
+            while True:
+                item = pipeline.get(frames_q, infer_stats)
+                if item is END_OF_STREAM:
+                    break
+                frame_atual, tempo, frame = item
+                if cancel_callback:
+                    cancelado_cache = cancel_callback()
+                elif frame_atual - last_status_check_frame >= status_check_interval:
+                    cancelado_cache = progresso_manager.status(video_name).get(
+                        "cancelado"
+                    )
+                    last_status_check_frame = frame_atual
+                if cancelado_cache:
+                    break
+                if not progresso_manager.atualizar(
+                    video_name, frame_atual, original_frame_count
                 ):
-                    track_id = int(r_id)
-                    x1, y1, x2, y2 = map(int, box_coord)
-                    curr_x, curr_y = (x1 + x2) // 2, (y1 + y2) // 2
-                    nome_cls = model.names[int(cls_id)]
-
-                    if track_id not in track_ids_contados:
-                        crossed = False
-                        has_prev_pos = (
-                            track_id in track_previous_x
-                            and track_id in track_previous_y
-                        )
-                        if (
-                            line_type == LINE_HORIZONTAL
-                            and has_prev_pos
-                            and line_coord_val is not None
-                        ):
-                            prev_y = track_previous_y[track_id]
-                            if (
-                                effective_counting_dir == MOVE_TB
-                                and prev_y < line_coord_val
-                                and curr_y >= line_coord_val
-                            ) or (
-                                effective_counting_dir == MOVE_BT
-                                and prev_y > line_coord_val
-                                and curr_y <= line_coord_val
-                            ):
-                                crossed = True
-                        elif (
-                            line_type == LINE_VERTICAL
-                            and has_prev_pos
-                            and line_coord_val is not None
-                        ):
-                            prev_x = track_previous_x[track_id]
-                            if (
-                                effective_counting_dir == MOVE_LR
-                                and prev_x < line_coord_val
-                                and curr_x >= line_coord_val
-                            ) or (
-                                effective_counting_dir == MOVE_RL
-                                and prev_x > line_coord_val
-                                and curr_x <= line_coord_val
-                            ):
-                                crossed = True
-                        if crossed and (
-                            target_classes is None or nome_cls in target_classes
-                        ):
-                            track_ids_contados.add(track_id)
-                            current_total_count += 1
-                            current_por_classe[nome_cls] += 1
-
-                    track_previous_x[track_id], track_previous_y[track_id] = (
-                        curr_x,
-                        curr_y,
+                    break
+                lote.append(frame)
+                lote_ativos.append(
+                    motion_gate is None or motion_gate.should_infer(frame)
+                )
+                lote_tempos.append(
+                    tempo if tempo is not None else frame_atual * 1000.0 / _fps
+                )
+                if len(lote) >= batch_size:
+                    if not _processar_lote(
+                        pipeline,
+                        detector,
+                        contador,
+                        lote,
+                        lote_ativos,
+                        lote_tempos,
+                        encode_q,
+                    ):
+                        break
+                    checkpoint_due = (
+                        checkpoint_interval > 0
+                        and time.perf_counter() - ultimo_checkpoint
+                        >= checkpoint_interval
                     )
-                    if CREATE_ANNOTATED_VIDEO and annotated_frame is not None:
-                        color = (
-                            (0, 165, 255)
-                            if track_id in track_ids_contados
-                            else (
-                                (200, 200, 200)
-                                if target_classes and nome_cls not in target_classes
-                                else (0, 255, 0)
-                            )
-                        )
-                        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                        cv2.putText(
-                            annotated_frame,
-                            f"{nome_cls} ID:{track_id}",
-                            (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6,
-                            color,
-                            2,
+                    if checkpoint_due:
+                        estado = _estado_checkpoint(
+                            video_name,
+                            opcoes,
+                            contador,
+                            frame_atual,
+                            lote_tempos[-1],
+                            _fps,
+                            frame_skip,
+                            original_frame_count,
+                            partes,
                         )
-
-            for tid_set in [track_previous_x, track_previous_y]:
-                for tid in list(tid_set.keys()):
-                    if tid not in current_tracked_ids:
-                        del tid_set[tid]
-
-            if (
-                CREATE_ANNOTATED_VIDEO
-                and out is not None
-                and annotated_frame is not None
-            ):
-                if line_points:
-                    cv2.line(
-                        annotated_frame, line_points[0], line_points[1], (0, 0, 255), 3
-                    )
-                if arrow_points:
-                    cv2.arrowedLine(
-                        annotated_frame,
-                        arrow_points[0],
-                        arrow_points[1],
-                        (0, 255, 0),
-                        2,
-                        tipLength=0.4,
-                    )
-                info_txt = f"Contagem: {current_total_count}"
-                cv2.putText(
-                    annotated_frame,
-                    info_txt,
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    1.0,
-                    (0, 0, 0),
-                    3,
-                    cv2.LINE_AA,
+                        checkpoints += 1
+                        ultimo_checkpoint = time.perf_counter()
+                        if escritor is None:
+                            save_checkpoint(video_name, estado)
+                        # Saved by the encoder once every frame before it is
+                        # written.
+                        elif not pipeline.put(encode_q, estado, infer_stats):
+                            break
+                    lote, lote_ativos, lote_tempos = [], [], []
+            if lote and not cancelado_cache and not pipeline.stop_event.is_set():
+                _processar_lote(
+                    pipeline,
+                    detector,
+                    contador,
+                    lote,
+                    lote_ativos,
+                    lote_tempos,
+                    encode_q,
                 )
-                cv2.putText(
-                    annotated_frame,
-                    info_txt,
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    1.0,
-                    (255, 255, 255),
-                    2,
-                    cv2.LINE_AA,
-                )
-                out.write(annotated_frame)
-        frame_atual += 1
+    except RuntimeError as exc:
+        if "not enough memory" not in str(exc).lower():
+            raise
+        sem_memoria = True
+    finally:
+        # Stops the decoder; the encoder drains what is already queued.
+        pipeline.stop()
+        pipeline.join()
+        if model is not None:
+            model_registry.release(model)
+        if event_log is not None:
+            event_log.close()
+    if escritor is not None:
+        # The encoder may have moved on to a new part.
+        out = escritor.out
+
+    if sem_memoria or pipeline.errors:
+        if sem_memoria:
+            mensagem = (
+                "Memoria insuficiente para processar o video. "
+                "Use modelo menor (n/m) ou reduza YOLO_IMG_SIZE."
+            )
+        else:
+            logger.error(
+                f"[PIPELINE] Falha ao processar {video_name}: {pipeline.errors[0]!r}",
+                exc_info=pipeline.errors[0],
+            )
+            mensagem = f"Falha no processamento do vídeo: {pipeline.errors[0]}"
+        if progresso_manager:
+            progresso_manager.erro(video_name, mensagem)
+        if cap.isOpened():
+            cap.release()
+        if out and out.isOpened():
+            try:
+                out.release()
+            except IOError as exc:
+                logger.error(f"[ENCODER] Falha ao finalizar {out.output_path}: {exc}")
+        for parte in partes + ([out.output_path] if out is not None else []):
+            if os.path.exists(parte):
+                os.remove(parte)
+        remove_checkpoint(video_name)
+        return None
+    pipeline_stats = pipeline.report()
+    logger.info("[PIPELINE] Tempos por estágio para %s: %s", video_name, pipeline_stats)
 
     if cap.isOpened():
         cap.release()
-    if out and out.isOpened():
-        out.release()
+    encode_report = None
+    if out is not None:
+        try:
+            out.release()
+        except IOError as exc:
+            logger.error("[ENCODER] Falha ao finalizar %s: %s", out.output_path, exc)
+        if gravar_partes:
+            try:
+                concat_videos(partes + [out.output_path], local_output_path)
+            except (OSError, subprocess.CalledProcessError) as exc:
+                logger.error(f"[ENCODER] Falha ao unir partes de {video_name}: {exc}")
+                if progresso_manager:
+                    progresso_manager.erro(
+                        video_name, f"Falha ao unir as partes do vídeo anotado: {exc}"
+                    )
+                for parte in partes + [out.output_path, local_output_path]:
+                    if os.path.exists(parte):
+                        os.remove(parte)
+                remove_checkpoint(video_name)
+                return None
+        encode_report = {
+            "backend": out.backend,
+            "encode_seconds": round(
+                escritor.encode_seconds_partes + out.encode_seconds, 3
+            ),
+            "output_bytes": (
+                os.path.getsize(local_output_path)
+                if os.path.exists(local_output_path)
+                else 0
+            ),
+        }
+        logger.info("[ENCODER] %s: %s", video_name, encode_report)
 
     cancelado_final = cancelado_cache
     if progresso_manager and not cancelado_final:
         cancelado_final = progresso_manager.status(video_name).get("cancelado")
     if cancelado_final:
-        if os.path.exists(local_video_path):
-            os.remove(local_video_path)
+        if segment is None:
+            remove_checkpoint(video_name)
+            if os.path.exists(local_video_path):
+                os.remove(local_video_path)
+            discard_probe(local_video_path)
         if CREATE_ANNOTATED_VIDEO and os.path.exists(local_output_path):
             os.remove(local_output_path)
         return None
@@ -650,7 +1638,7 @@ def contar_gado_em_video(
                 if progresso_manager:
                     progresso_manager.erro(video_name, public_url)
         else:
-            # Store the processed video locally and expose it via the static mount.
+            # Stored locally and served by the /videos_processados route.
             public_url = f"/videos_processados/{processed_fn}"
             logger.info(f"[INFO] Processed video saved at {local_output_path}.")
             if not os.path.exists(local_output_path):
@@ -658,23 +1646,204 @@ def contar_gado_em_video(
                     "[INFO] Processed video missing at %s", local_output_path
                 )
                 public_url = None
+    elif render_deferred:
+        try:
+            # Takes the uploaded video along, so it is not removed below.
+            register_render(
+                processed_fn,
+                local_video_path,
+                recorder if recorder is not None else cache_hit,
+                names,
+                {
+                    "line_type": line_type,
+                    "direction": effective_counting_dir,
+                    "line_coord": line_coord_val,
+                    "line_points": line_points,
+                    "arrow_points": arrow_points,
+                    "target_classes": target_classes,
+                    "rotation": rotation,
+                    "box_rotation": box_rotation,
+                    "source_size": [cap.width, cap.height],
+                    "start_ms": max(trim_start_ms, 0) if trim_start_ms else None,
+                    "end_ms": max(trim_end_ms, 0) if trim_end_ms is not None else None,
+                    "target_size": None if tiled_inference else imgsz,
+                    "frame_skip": source_frame_skip,
+                    "target_fps": target_fps,
+                    "sample_every": frame_skip,
+                },
+            )
+            public_url = f"/videos_processados/{processed_fn}"
+        except OSError as exc:
+            logger.error(f"[RENDER] Falha ao registrar {processed_fn}: {exc}")
+            public_url = None
 
     if USE_SFTP:
         if CREATE_ANNOTATED_VIDEO and os.path.exists(local_output_path):
             os.remove(local_output_path)
-    if os.path.exists(local_video_path):
-        os.remove(local_video_path)
+    if segment is None:
+        if os.path.exists(local_video_path):
+            os.remove(local_video_path)
+        discard_probe(local_video_path)
     if USE_SFTP:
         delete_file_sftp(remote_video_original)
 
+    if segment is None:
+        remove_checkpoint(video_name)
+    detection_cache_report = None
+    if detection_key is not None:
+        if recorder is not None:
+            try:
+                recorder.save(
+                    detection_key,
+                    names,
+                    meta={"video": video_name, "fps": _fps, "size": [width, height]},
+                )
+                evict()
+            except OSError as exc:
+                logger.warning(f"[CACHE] Falha ao gravar detecções: {exc}")
+        detection_cache_report = {"key": detection_key, "hit": cache_hit is not None}
     logger.info(
-        f"[INFO CONTAGEM] Contagem finalizada: {current_total_count} para {video_name}"
+        f"[INFO CONTAGEM] Contagem finalizada: {contador.total_count} para "
+        f"{video_name}"
     )
 
-    return {
+    zonas_report, sweep_report = None, None
+    if zone_counter is not None:
+        report = zone_counter.report(names)
+        zonas_report = report[: len(zonas)] or None
+        sweep_report = [
+            {
+                "orientation": candidato["orientation"],
+                "line_position_ratio": candidato.get("line_position_ratio", 0.5),
+                "total_count": linha["total_count"],
+                "por_classe": linha["por_classe"],
+            }
+            for candidato, linha in zip(sweep or [], report[len(zonas) :])
+        ] or None
+
+    resultado = {
         "video": video_name,
         "video_processado": public_url,
         "total_frames": original_frame_count,
-        "total_count": current_total_count,
-        "por_classe": dict(current_por_classe),
+        "total_count": contador.total_count,
+        "por_classe": dict(contador.por_classe),
+        "zones": zonas_report,
+        "sweep": sweep_report,
+        "pipeline": pipeline_stats,
+        "encode": encode_report,
+        "roi": roi_report,
+        "tiles": tiles_report,
+        "imgsz": imgsz,
+        "imgsz_probe": imgsz_probe,
+        "tracker": tracker,
+        "events": event_log.count if event_log is not None else None,
+        "checkpoint": (
+            {
+                "resumed_from_ms": checkpoint["pts_ms"] if checkpoint else None,
+                "checkpoints": checkpoints,
+            }
+            if segment is None
+            else None
+        ),
+        "motion_gate": motion_gate.report() if motion_gate is not None else None,
+        "detection_cache": detection_cache_report,
+        "render": "pending" if render_deferred and public_url else None,
+    }
+    if segment is not None:
+        resultado["segment"] = {
+            "index": segment.index,
+            "events": contador.eventos,
+            "counted_ids": line_counter.counted_ids.tolist(),
+            "head": contador.cabeca,
+            "tail": contador.cauda,
+        }
+    return resultado
+
+
+def _contar_em_segmentos(
+    local_video_path: str,
+    video_name: str,
+    progresso_manager: Any,
+    workers: int,
+    start_ms: float,
+    end_ms: float,
+    max_gap: int,
+    total_frames: int,
+    cancel_callback: Optional[Callable[[], bool]],
+    remote_video_original: Optional[str],
+    options: Dict[str, Any],
+    imgsz_probe: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Count ``local_video_path`` in parallel segments / Conta em segmentos.
+
+    English:
+        Used by ``contar_gado_em_video`` when ``SEGMENT_WORKERS > 1`` and no
+        annotated video is requested. Like the single-pass path, the local
+        (and remote) video is removed after success or cancellation and kept
+        when processing fails.
+
+    Português:
+        Usado quando ``SEGMENT_WORKERS > 1`` e o vídeo anotado está
+        desabilitado; como a passada única, remove o vídeo local (e remoto)
+        após sucesso ou cancelamento e o mantém em caso de falha.
+    """
+
+    overlap_ms = get_env_int("SEGMENT_OVERLAP_MS", DEFAULT_OVERLAP_MS)
+    segments = plan_segments(start_ms, end_ms, workers, overlap_ms)
+    logger.info(
+        "[SEGMENTOS] %s: %s segmentos, sobreposição %sms",
+        video_name,
+        len(segments),
+        overlap_ms,
+    )
+    resultado = run_segments(
+        local_video_path,
+        video_name,
+        progresso_manager,
+        segments,
+        options,
+        max_gap=max_gap,
+        cancel_callback=cancel_callback,
+    )
+    if resultado is None:
+        # Like the single pass: a cancelled job drops the upload, a failed one
+        # keeps it so the video can be processed again.
+        if cancel_callback:
+            cancelado = cancel_callback()
+        else:
+            cancelado = progresso_manager.status(video_name).get("cancelado")
+        if cancelado:
+            if os.path.exists(local_video_path):
+                os.remove(local_video_path)
+            discard_probe(local_video_path)
+        return None
+    if os.path.exists(local_video_path):
+        os.remove(local_video_path)
+    discard_probe(local_video_path)
+    if remote_video_original:
+        from utils.sftp_handler import delete_file_sftp
+
+        delete_file_sftp(remote_video_original)
+
+    eventos = None
+    if os.getenv("EVENT_LOG", "true").lower() == "true":
+        with EventLog(event_log_path(video_name)) as event_log:
+            for evento in sorted(resultado["events"], key=lambda e: e[0]):
+                event_log.append(evento)
+        eventos = event_log.count
+
+    logger.info(
+        f"[INFO CONTAGEM] Contagem finalizada: {resultado['total_count']} para {video_name}"
+    )
+    return {
+        "video": video_name,
+        "video_processado": "Vídeo processado não foi gerado (opção desabilitada).",
+        "total_frames": total_frames,
+        "total_count": resultado["total_count"],
+        "por_classe": resultado["por_classe"],
+        "segments": resultado["segments"],
+        "imgsz": options.get("imgsz"),
+        "imgsz_probe": imgsz_probe,
+        "tracker": options.get("tracker"),
+        "events": eventos,
     }
@@ -0,0 +1,223 @@
+"""Per-video cache of tracked detections / Cache de detecções rastreadas.
+
+English:
+    The first run of a video stores, for every analysed frame, the tracked
+    detections handed to the line counter (track id, class, confidence and
+    box) in one compressed ``.npz`` of flat columns plus per-frame offsets.
+    The file is keyed by the video content hash and by everything that
+    changes the detections (model, ``imgsz``, tracker, frame sampling and
+    trim range), but not by the line settings: a re-submission with another
+    ``orientation``, ``line_position_ratio`` or ``target_classes`` replays
+    the cached frames through :class:`utils.line_counter.LineCounter`
+    without decoding or inferring again.
+
+    Runs whose detections depend on the line (ROI band, tiled inference,
+    motion gate) are not cached. The directory is kept under
+    ``DETECTION_CACHE_MAX_MB`` by evicting the least recently used files.
+
+Português:
+    A primeira execução de um vídeo grava as detecções rastreadas de cada
+    frame analisado em um ``.npz`` compactado, indexado pelo hash do conteúdo
+    do vídeo e pelos parâmetros que alteram as detecções. Um novo pedido com
+    outra linha ou outras classes recalcula a contagem a partir do cache, sem
+    decodificar nem inferir. Os arquivos menos usados são removidos quando o
+    diretório passa de ``DETECTION_CACHE_MAX_MB``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.tracking import FrameDetections
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_MAX_MB = 1024
+_HASH_CHUNK = 1 << 20
+
+
+def cache_dir() -> str:
+    data_dir = os.getenv("RENDER_DATA_DIR", "data")
+    return os.getenv("DETECTION_CACHE_DIR") or os.path.join(data_dir, "detections")
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 of the file contents / SHA-256 do conteúdo do arquivo."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(video_hash: str, params: Dict[str, Any]) -> str:
+    """File stem for ``video_hash`` and the detection parameters."""
+
+    encoded = json.dumps(
+        dict(params, version=CACHE_VERSION), sort_keys=True, separators=(",", ":")
+    )
+    return f"{video_hash[:32]}-{hashlib.sha256(encoded.encode()).hexdigest()[:16]}"
+
+
+def cache_path(key: str, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or cache_dir(), f"{key}.npz")
+
+
+class DetectionRecorder:
+    """Collects the detections of a run / Acumula as detecções da execução."""
+
+    def __init__(self) -> None:
+        self._pts: List[float] = []
+        self._frames: List[FrameDetections] = []
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def add(self, timestamp_ms: float, deteccoes: FrameDetections) -> None:
+        self._pts.append(timestamp_ms)
+        self._frames.append(deteccoes)
+
+    def save(
+        self,
+        key: str,
+        names: Dict[int, str],
+        meta: Optional[Dict[str, Any]] = None,
+        directory: Optional[str] = None,
+    ) -> str:
+        """Write the cache file atomically and return its path."""
+
+        path = cache_path(key, directory)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        counts = [len(frame) for frame in self._frames]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        frames = self._frames or [FrameDetections.empty()]
+        meta = dict(meta or {}, names={str(k): v for k, v in names.items()})
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            pts_ms=np.asarray(self._pts, dtype=np.float64),
+            offsets=offsets,
+            track_ids=np.concatenate([f.track_ids for f in frames]).astype(np.int32),
+            classes=np.concatenate([f.classes for f in frames]).astype(np.int16),
+            confidences=np.concatenate([f.confidences for f in frames]).astype(
+                np.float32
+            ),
+            boxes=np.concatenate([f.boxes for f in frames]).astype(np.float32),
+            meta=np.asarray(json.dumps(meta)),
+        )
+        os.replace(tmp_path, path)
+        return path
+
+
+class CachedDetections:
+    """Detections loaded from the cache / Detecções carregadas do cache."""
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            self.pts_ms = data["pts_ms"]
+            self._offsets = data["offsets"]
+            self._track_ids = data["track_ids"].astype(np.int64)
+            self._classes = data["classes"].astype(np.int64)
+            self._confidences = data["confidences"]
+            self._boxes = data["boxes"]
+            self.meta = json.loads(str(data["meta"]))
+        self.names = {int(k): v for k, v in self.meta.pop("names").items()}
+        self.path = path
+
+    def __len__(self) -> int:
+        return int(self.pts_ms.shape[0])
+
+    def frame(self, index: int) -> FrameDetections:
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return FrameDetections(
+            boxes=self._boxes[start:end],
+            track_ids=self._track_ids[start:end],
+            classes=self._classes[start:end],
+            confidences=self._confidences[start:end],
+        )
+
+    def frames(self) -> Iterator[Tuple[float, FrameDetections]]:
+        for index, timestamp_ms in enumerate(self.pts_ms.tolist()):
+            yield timestamp_ms, self.frame(index)
+
+    def detector(self) -> "CachedDetector":
+        return CachedDetector(self)
+
+
+class CachedDetector:
+    """Frame detector replaying the cache in decode order.
+
+    Substitui o modelo quando o vídeo anotado ainda precisa dos frames.
+    Replaces the model when the annotated video still needs the frames.
+    """
+
+    def __init__(self, cache: CachedDetections):
+        self._frames = (frame for _, frame in cache.frames())
+
+    def __call__(self, frames: Sequence[Any]) -> List[FrameDetections]:
+        return [next(self._frames, FrameDetections.empty()) for _ in frames]
+
+
+def load_cached(
+    key: str, directory: Optional[str] = None
+) -> Optional[CachedDetections]:
+    """Return the cache entry of ``key`` (marking it as used) or ``None``."""
+
+    path = cache_path(key, directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        cached = CachedDetections(path)
+    except (OSError, ValueError, KeyError) as exc:
+        logger.warning("[CACHE] %s ilegível (%s); removendo", path, exc)
+        os.remove(path)
+        return None
+    # The modification time doubles as the LRU clock.
+    os.utime(path)
+    return cached
+
+
+def evict(
+    max_bytes: Optional[int] = None, directory: Optional[str] = None
+) -> List[str]:
+    """Remove least recently used entries until the cache fits ``max_bytes``.
+
+    Retorno / Returns:
+        List[str]: Arquivos removidos. Removed files.
+    """
+
+    directory = directory or cache_dir()
+    if max_bytes is None:
+        max_mb = os.getenv("DETECTION_CACHE_MAX_MB")
+        try:
+            max_bytes = int(float(max_mb or DEFAULT_CACHE_MAX_MB) * 1024 * 1024)
+        except ValueError:
+            max_bytes = DEFAULT_CACHE_MAX_MB * 1024 * 1024
+    if not os.path.isdir(directory):
+        return []
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(".npz") and ".tmp" not in name:
+            stat = os.stat(os.path.join(directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, name in entries:
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(directory, name))
+        total -= size
+        removed.append(name)
+    if removed:
+        logger.info("[CACHE] %s entradas removidas (LRU)", len(removed))
+    return removed
@@ -0,0 +1,32 @@
+"""Environment variable helpers / Leitura de variáveis de ambiente.
+
+English:
+    Unset, empty or malformed values fall back to ``default``.
+
+Português:
+    Valores ausentes, vazios ou inválidos usam ``default``.
+"""
+
+from __future__ import annotations
+
+import os
+
+
+def get_env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def get_env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
@@ -0,0 +1,132 @@
+"""Per-job counting event log / Registro de eventos de contagem por job.
+
+English:
+    Every counted crossing is appended, as it happens, to
+    ``EVENTS_DIR/<video_name>.jsonl`` (one compact JSON object per line:
+    ``pts_ms``, ``track_id``, ``class``, ``frame``, ``conf`` and ``box`` in
+    original-resolution ``xyxy``). Nothing is kept in memory, the file is
+    line buffered so it can be paged while the job is running, and auditors
+    can check a disputed count without re-running the video.
+
+Português:
+    Cada cruzamento contado é gravado na hora em
+    ``EVENTS_DIR/<video_name>.jsonl`` (um JSON compacto por linha). Nada fica
+    em memória e o arquivo pode ser paginado durante o processamento.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from itertools import islice
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Field order of the event tuples produced by the counting loop.
+EVENT_FIELDS = ("pts_ms", "track_id", "class", "frame", "conf", "box")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+Event = Tuple[float, int, str, int, float, Sequence[float]]
+
+
+def events_dir() -> str:
+    data_dir = os.getenv("RENDER_DATA_DIR", "data")
+    return os.getenv("EVENTS_DIR") or os.path.join(data_dir, "events")
+
+
+def event_log_path(video_name: str, directory: Optional[str] = None) -> str:
+    """Path of the log of ``video_name`` (never outside ``directory``)."""
+
+    name = os.path.basename(video_name)
+    return os.path.join(directory or events_dir(), f"{name}.jsonl")
+
+
+def event_record(event: Event) -> Dict[str, Any]:
+    record = dict(zip(EVENT_FIELDS, event))
+    record["pts_ms"] = round(float(record["pts_ms"]), 1)
+    record["conf"] = round(float(record["conf"]), 4)
+    record["box"] = [round(float(v), 1) for v in record["box"]]
+    return record
+
+
+class EventLog:
+    """Append-only JSON Lines writer / Gravador JSON Lines só de acréscimo.
+
+    Um novo job substitui o registro anterior do mesmo vídeo; ao retomar de
+    um checkpoint, ``offset``/``count`` descartam o que foi escrito depois
+    dele. A new job replaces the previous log of the same video; when
+    resuming from a checkpoint, ``offset``/``count`` drop what was written
+    after it.
+    """
+
+    def __init__(self, path: str, offset: int = 0, count: int = 0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.count = count if offset else 0
+        self.bytes = offset
+        if offset and os.path.exists(path):
+            self._handle = open(path, "r+", encoding="utf-8", buffering=1)
+            self._handle.truncate(offset)
+            self._handle.seek(offset)
+        else:
+            self.count, self.bytes = 0, 0
+            self._handle = open(path, "w", encoding="utf-8", buffering=1)
+
+    def append(self, event: Event) -> None:
+        line = json.dumps(event_record(event), separators=(",", ":")) + "\n"
+        self._handle.write(line)
+        self.count += 1
+        self.bytes += len(line.encode("utf-8"))
+
+    def close(self) -> None:
+        if not self._handle.closed:
+            self._handle.close()
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def read_events(
+    path: str, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    """Return one page of events / Retorna uma página de eventos.
+
+    Parâmetros / Parameters:
+        path (str): Arquivo ``.jsonl``. ``.jsonl`` file.
+        offset (int): Índice do primeiro evento. Index of the first event.
+        limit (int): Eventos por página (máx. ``MAX_PAGE_SIZE``). Events per
+            page (max ``MAX_PAGE_SIZE``).
+
+    Retorno / Returns:
+        dict: ``events``, ``offset``, ``limit``, ``total`` e ``next_offset``
+        (``None`` na última página / on the last page).
+
+    Exceções / Exceptions:
+        FileNotFoundError: Vídeo sem registro. Video without a log.
+    """
+
+    offset = max(int(offset), 0)
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+    with open(path, "r", encoding="utf-8") as handle:
+        lines = islice(handle, offset, offset + limit)
+        # A line still being written has no newline yet.
+        page = [json.loads(line) for line in lines if line.endswith("\n")]
+    # Only the page is parsed; the rest is just counted.
+    total = _count_lines(path)
+    next_offset = offset + len(page)
+    return {
+        "events": page,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "next_offset": next_offset if next_offset < total else None,
+    }
+
+
+def _count_lines(path: str) -> int:
+    with open(path, "rb") as handle:
+        chunks = iter(lambda: handle.read(1 << 20), b"")
+        return sum(chunk.count(b"\n") for chunk in chunks)
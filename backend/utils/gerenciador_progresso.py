@@ -70,8 +70,13 @@ def create_progress_table_if_not_exists():
                     resultado JSONB,
                     erro TEXT,
                     cancelado BOOLEAN DEFAULT FALSE,
-                    last_updated TIMESTAMPTZ DEFAULT NOW()
+                    last_updated TIMESTAMPTZ DEFAULT NOW(),
+                    result_key VARCHAR(64)
                 );
+                ALTER TABLE video_progress
+                    ADD COLUMN IF NOT EXISTS result_key VARCHAR(64);
+                CREATE INDEX IF NOT EXISTS video_progress_result_key_idx
+                    ON video_progress (result_key);
             """
             )
             conn.commit()
@@ -151,7 +156,7 @@ class ProgressoManager:
             if conn:
                 pool.putconn(conn)
 
-    def iniciar(self, video_name: str):
+    def iniciar(self, video_name: str, result_key: Optional[str] = None):
         """Inicia ou reseta o progresso para um vídeo no banco de dados.
 
         Start or reset progress for a video in the database.
@@ -159,6 +164,10 @@ class ProgressoManager:
         Parâmetros / Parameters:
             video_name (str): Identificador do vídeo.
                 Video identifier.
+            result_key (str, opcional): Chave do resultado (conteúdo do vídeo
+                e opções) usada por :meth:`resultado_por_chave`. Result key
+                (video content and options) used by
+                :meth:`resultado_por_chave`.
 
         Retorno / Returns:
             None: Não retorna valores.
@@ -174,15 +183,15 @@ class ProgressoManager:
             Database errors are handled by ``_execute_query``.
         """
         query = """
-            INSERT INTO video_progress (video_name, tempo_inicio, tempo_restante, finalizado, cancelado, erro, resultado, frame_atual, total_frames_estimado, last_updated)
-            VALUES (%s, %s, %s, %s, %s, NULL, NULL, 0, 1, NOW())
+            INSERT INTO video_progress (video_name, tempo_inicio, tempo_restante, finalizado, cancelado, erro, resultado, frame_atual, total_frames_estimado, last_updated, result_key)
+            VALUES (%s, %s, %s, %s, %s, NULL, NULL, 0, 1, NOW(), %s)
             ON CONFLICT (video_name) DO UPDATE SET
                 tempo_inicio = EXCLUDED.tempo_inicio, tempo_restante = EXCLUDED.tempo_restante,
                 finalizado = EXCLUDED.finalizado, cancelado = EXCLUDED.cancelado,
                 erro = NULL, resultado = NULL, frame_atual = 0, total_frames_estimado = 1,
-                last_updated = NOW();
+                last_updated = NOW(), result_key = EXCLUDED.result_key;
         """
-        params = (video_name, time.time(), "Na fila...", False, False)
+        params = (video_name, time.time(), "Na fila...", False, False, result_key)
         self._execute_query(query, params)
         logger.info(f"[DB Progresso] Progresso iniciado/resetado para: {video_name}")
 
@@ -398,6 +407,33 @@ class ProgressoManager:
             "video_name": video_name,
         }
 
+    def resultado_por_chave(self, result_key: str) -> Optional[Dict[str, Any]]:
+        """Retorna o último resultado finalizado com ``result_key``.
+
+        Return the latest successful result stored under ``result_key``.
+
+        Parâmetros / Parameters:
+            result_key (str): Chave gerada por
+                :func:`utils.result_cache.result_key`. Key built by
+                :func:`utils.result_cache.result_key`.
+
+        Retorno / Returns:
+            dict | None: Resultado da contagem, ou ``None`` se não houver.
+            Counting result, or ``None`` when there is none.
+
+        Exceções / Exceptions:
+            Erros de banco são capturados pelo ``_execute_query``.
+            Database errors are handled by ``_execute_query``.
+        """
+        query = """
+            SELECT resultado FROM video_progress
+            WHERE result_key = %s AND finalizado AND NOT cancelado
+                AND erro IS NULL AND resultado IS NOT NULL
+            ORDER BY last_updated DESC LIMIT 1;
+        """
+        row = self._execute_query(query, (result_key,), fetch="one")
+        return row[0] if row else None
+
     def cancelar(self, video_name: str) -> bool:
         """Sinaliza no banco de dados que o processamento deve ser cancelado.
 
@@ -0,0 +1,212 @@
+"""Per-video ``imgsz`` selection / Escolha do ``imgsz`` por vídeo.
+
+English:
+    With ``YOLO_IMG_SIZE=auto`` a few frames spread over the video are
+    detected once at the largest size of the ladder (``IMGSZ_LADDER``). The
+    size of the detected boxes relative to the longest frame side does not
+    depend on the inference size, so the smallest ladder step at which the
+    smaller animals (``IMGSZ_BOX_PERCENTILE``) still measure
+    ``IMGSZ_MIN_BOX_PX`` pixels can be chosen up front: close-up videos run
+    at 320 and distant ones at 960+.
+
+Português:
+    Com ``YOLO_IMG_SIZE=auto`` alguns frames espalhados pelo vídeo são
+    detectados uma vez no maior tamanho da escada. O tamanho relativo das
+    caixas não depende do ``imgsz``; escolhe-se o menor degrau em que os
+    animais menores ainda medem ``IMGSZ_MIN_BOX_PX`` pixels.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.media_probe import probe_media
+from utils.tracking import DEFAULT_CONF
+from utils.video_io import open_frame_source
+
+logger = logging.getLogger(__name__)
+
+AUTO_IMGSZ = "auto"
+DEFAULT_IMGSZ_LADDER: Tuple[int, ...] = (320, 416, 512, 640, 800, 960, 1280)
+DEFAULT_MIN_BOX_PX = 24
+DEFAULT_PROBE_FRAMES = 6
+DEFAULT_BOX_PERCENTILE = 25.0
+
+
+def imgsz_ladder(value: Optional[str] = None) -> Tuple[int, ...]:
+    """Parse ``IMGSZ_LADDER`` (``"320,512,640"``) into sorted sizes."""
+
+    value = value if value is not None else os.getenv("IMGSZ_LADDER", "")
+    try:
+        sizes = sorted({int(item) for item in value.split(",") if item.strip()})
+    except ValueError:
+        logger.warning("[IMGSZ] IMGSZ_LADDER inválido: %s", value)
+        sizes = []
+    sizes = [size for size in sizes if size > 0]
+    return tuple(sizes) if sizes else DEFAULT_IMGSZ_LADDER
+
+
+def sample_times(start_ms: float, end_ms: float, count: int) -> List[float]:
+    """Midpoints of ``count`` equal slices of ``[start_ms, end_ms]``."""
+
+    if count <= 0 or end_ms <= start_ms:
+        return [start_ms]
+    step = (end_ms - start_ms) / count
+    return [start_ms + step * (index + 0.5) for index in range(count)]
+
+
+def video_end_ms(video_path: str) -> float:
+    """Duration from the media probe, else the source's frame count and fps.
+
+    ``0`` if unknown.
+    """
+
+    media = probe_media(video_path)
+    if media and media["duration_ms"] > 0:
+        return media["duration_ms"]
+    source = open_frame_source(video_path)
+    try:
+        if source.fps > 0 and source.frame_count > 0:
+            return source.frame_count * 1000.0 / source.fps
+        return 0.0
+    finally:
+        source.release()
+
+
+def read_probe_frames(
+    video_path: str, times_ms: Sequence[float], target_size: int
+) -> List[np.ndarray]:
+    """Read one frame at each timestamp, seeking a fresh source per sample."""
+
+    frames = []
+    for timestamp in times_ms:
+        source = open_frame_source(
+            video_path, start_ms=timestamp, target_size=target_size, ring_size=2
+        )
+        try:
+            ok, frame = source.read() if source.isOpened() else (False, None)
+            if ok and frame is not None:
+                # Ring buffers are reused once the source is released.
+                frames.append(np.array(frame))
+        finally:
+            source.release()
+    return frames
+
+
+def box_size_ratios(
+    boxes: Sequence[np.ndarray], shapes: Sequence[Tuple[int, ...]]
+) -> np.ndarray:
+    """Smaller box side divided by the longest side of its frame."""
+
+    ratios = []
+    for xyxy, shape in zip(boxes, shapes):
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        if len(xyxy):
+            sides = np.minimum(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1])
+            ratios.append(sides / float(max(shape[:2])))
+    if not ratios:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(ratios)
+
+
+def choose_imgsz(
+    ratios: np.ndarray,
+    ladder: Sequence[int] = DEFAULT_IMGSZ_LADDER,
+    min_box_px: float = DEFAULT_MIN_BOX_PX,
+    percentile: float = DEFAULT_BOX_PERCENTILE,
+) -> Optional[int]:
+    """Smallest ladder size keeping the ``percentile`` box at ``min_box_px``.
+
+    Retorna ``None`` sem detecções; o maior degrau quando nenhum basta.
+    Returns ``None`` without detections; the largest step when none is enough.
+    """
+
+    if len(ratios) == 0:
+        return None
+    typical = float(np.percentile(ratios, percentile))
+    for size in sorted(ladder):
+        if typical * size >= min_box_px:
+            return size
+    return max(ladder)
+
+
+def probe_imgsz(
+    model: Any,
+    frames: Sequence[np.ndarray],
+    ladder: Sequence[int] = DEFAULT_IMGSZ_LADDER,
+    min_box_px: float = DEFAULT_MIN_BOX_PX,
+    percentile: float = DEFAULT_BOX_PERCENTILE,
+    conf: float = DEFAULT_CONF,
+) -> Dict[str, Any]:
+    """Detect ``frames`` at the largest ladder size and pick ``imgsz``.
+
+    Parâmetros / Parameters:
+        model (Any): Modelo com ``predict``. Model exposing ``predict``.
+        frames (Sequence[np.ndarray]): Frames de amostra. Sampled frames.
+        ladder (Sequence[int]): Tamanhos candidatos. Candidate sizes.
+        min_box_px (float): Lado mínimo da caixa em pixels na entrada do
+            modelo. Minimum box side in model-input pixels.
+        percentile (float): Percentil das caixas que deve atingir o mínimo.
+            Percentile of boxes that must reach the minimum.
+        conf (float): Confiança mínima. Minimum confidence.
+
+    Retorno / Returns:
+        dict: ``imgsz`` (``None`` sem detecções / without detections),
+        ``box_ratio``, ``detections``, ``frames`` e ``probe_seconds``.
+    """
+
+    start = time.perf_counter()
+    boxes = []
+    if frames:
+        results = model.predict(
+            list(frames), verbose=False, conf=conf, imgsz=max(ladder)
+        )
+        for result in results:
+            if result.boxes is None:
+                boxes.append(np.zeros((0, 4), dtype=np.float32))
+            else:
+                boxes.append(result.boxes.xyxy.cpu().numpy())
+    ratios = box_size_ratios(boxes, [frame.shape for frame in frames])
+    return {
+        "imgsz": choose_imgsz(ratios, ladder, min_box_px, percentile),
+        "box_ratio": (
+            round(float(np.percentile(ratios, percentile)), 4) if len(ratios) else None
+        ),
+        "detections": int(len(ratios)),
+        "frames": len(frames),
+        "probe_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def probe_video_imgsz(
+    video_path: str,
+    model: Any,
+    start_ms: float,
+    end_ms: Optional[float],
+    ladder: Sequence[int] = DEFAULT_IMGSZ_LADDER,
+    frame_count: int = DEFAULT_PROBE_FRAMES,
+    min_box_px: float = DEFAULT_MIN_BOX_PX,
+    percentile: float = DEFAULT_BOX_PERCENTILE,
+) -> Dict[str, Any]:
+    """Sample ``frame_count`` frames of ``video_path`` and run :func:`probe_imgsz`.
+
+    ``probe_seconds`` inclui a leitura dos frames; ``end_ms=None`` usa a
+    duração do vídeo. ``probe_seconds`` includes reading the frames;
+    ``end_ms=None`` uses the video duration.
+    """
+
+    start = time.perf_counter()
+    if end_ms is None:
+        end_ms = video_end_ms(video_path)
+    frames = read_probe_frames(
+        video_path, sample_times(start_ms, end_ms, frame_count), max(ladder)
+    )
+    report = probe_imgsz(model, frames, ladder, min_box_px, percentile)
+    report["probe_seconds"] = round(time.perf_counter() - start, 3)
+    report["ladder"] = list(ladder)
+    return report
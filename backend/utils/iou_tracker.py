@@ -0,0 +1,185 @@
+"""Pure NumPy IoU/centroid tracker / Rastreador IoU/centroide em NumPy.
+
+English:
+    A lighter alternative to BoT-SORT for single-direction line crossing.
+    Each track keeps its last box and a smoothed centroid velocity; before
+    association the box is shifted by that velocity (no Kalman filter).
+    Detections are matched greedily, first by IoU with the predicted boxes,
+    then the leftovers by centroid distance relative to the box size, always
+    within the same class. Tracks unseen for ``max_age`` updates are dropped.
+
+    :class:`IoUTracker` has the ``update(det, frame)`` interface of the
+    Ultralytics trackers, so :class:`utils.tracking.BatchedTrackDetector`
+    drives it with plain ``model.predict`` detections.
+
+Português:
+    Alternativa leve ao BoT-SORT para contagem em uma direção. Cada trilha
+    guarda a última caixa e a velocidade suavizada do centroide; a caixa é
+    deslocada por essa velocidade antes da associação (sem Kalman). As
+    detecções são associadas de forma gulosa por IoU e, em seguida, por
+    distância entre centroides, sempre na mesma classe.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from utils.tracking import box_iou
+
+DEFAULT_MATCH_IOU = 0.3
+# Centroid distance, in units of the track's box diagonal, still matched.
+DEFAULT_MAX_DISTANCE = 0.75
+DEFAULT_MAX_AGE = 30
+DEFAULT_VELOCITY_SMOOTHING = 0.5
+
+
+def _greedy_pairs(
+    score: np.ndarray, valid: np.ndarray, descending: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """One-to-one ``(rows, cols)`` pairs taken in score order."""
+
+    rows, cols = np.nonzero(valid)
+    if rows.size == 0:
+        return rows, cols
+    values = score[rows, cols]
+    order = np.argsort(-values if descending else values, kind="stable")
+    used_rows, used_cols, keep = set(), set(), []
+    for index in order:
+        row, col = rows[index], cols[index]
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        keep.append(index)
+    keep = np.asarray(keep, dtype=np.int64)
+    return rows[keep], cols[keep]
+
+
+class IoUTracker:
+    """Greedy IoU + centroid tracker / Rastreador guloso por IoU e centroide.
+
+    Parâmetros / Parameters:
+        match_iou (float): IoU mínimo com a caixa prevista. Minimum IoU with
+            the predicted box.
+        max_distance (float): Distância máxima entre centroides, em
+            diagonais da caixa. Maximum centroid distance, in box diagonals.
+        max_age (int): Atualizações sem detecção antes de descartar a
+            trilha. Updates without a detection before a track is dropped.
+        smoothing (float): Peso da velocidade anterior. Weight of the
+            previous velocity.
+    """
+
+    def __init__(
+        self,
+        match_iou: float = DEFAULT_MATCH_IOU,
+        max_distance: float = DEFAULT_MAX_DISTANCE,
+        max_age: int = DEFAULT_MAX_AGE,
+        smoothing: float = DEFAULT_VELOCITY_SMOOTHING,
+    ):
+        self.match_iou = match_iou
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self) -> None:
+        self._next_id = 1
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+        self._velocity = np.zeros((0, 2), dtype=np.float32)
+        self._classes = np.zeros(0, dtype=np.int64)
+        self._age = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self._ids.shape[0])
+
+    def _predicted(self) -> np.ndarray:
+        shift = self._velocity * (self._age + 1)[:, None]
+        return self._boxes + np.hstack([shift, shift])
+
+    def update(self, det: Any, frame: Optional[np.ndarray] = None) -> np.ndarray:
+        """Associate ``det`` with the tracks and return the matched tracks.
+
+        ``det`` é um ``Boxes`` do Ultralytics ou um array
+        ``[x1, y1, x2, y2, conf, cls]``. ``det`` is an Ultralytics ``Boxes``
+        or an ``[x1, y1, x2, y2, conf, cls]`` array.
+
+        Retorno / Returns:
+            np.ndarray: ``(N, 8)`` ``[x1, y1, x2, y2, id, conf, cls, idx]``,
+            como os trackers do Ultralytics. Like the Ultralytics trackers.
+        """
+
+        data = np.asarray(getattr(det, "data", det), dtype=np.float32)
+        data = data.reshape(-1, data.shape[-1]) if data.size else np.zeros((0, 6))
+        boxes, conf, cls = data[:, :4], data[:, -2], data[:, -1].astype(np.int64)
+        track_for = np.full(len(boxes), -1, dtype=np.int64)
+
+        if len(self) and len(boxes):
+            predicted = self._predicted()
+            same_class = self._classes[:, None] == cls[None, :]
+            iou = box_iou(predicted, boxes)
+            rows, cols = _greedy_pairs(iou, same_class & (iou >= self.match_iou), True)
+            track_for[cols] = rows
+
+            free_tracks = np.setdiff1d(np.arange(len(self)), rows)
+            free_dets = np.flatnonzero(track_for < 0)
+            if free_tracks.size and free_dets.size:
+                pred = predicted[free_tracks]
+                centers_t = (pred[:, :2] + pred[:, 2:]) / 2
+                centers_d = (boxes[free_dets, :2] + boxes[free_dets, 2:]) / 2
+                distance = np.linalg.norm(
+                    centers_t[:, None, :] - centers_d[None, :, :], axis=2
+                )
+                sizes = pred[:, 2:] - pred[:, :2]
+                limit = self.max_distance * np.linalg.norm(sizes, axis=1)
+                valid = same_class[free_tracks][:, free_dets] & (
+                    distance <= limit[:, None]
+                )
+                rows, cols = _greedy_pairs(distance, valid, False)
+                track_for[free_dets[cols]] = free_tracks[rows]
+
+        matched = np.flatnonzero(track_for >= 0)
+        tracks = track_for[matched]
+        if tracks.size:
+            old = (self._boxes[tracks, :2] + self._boxes[tracks, 2:]) / 2
+            new = (boxes[matched, :2] + boxes[matched, 2:]) / 2
+            step = (new - old) / (self._age[tracks] + 1)[:, None]
+            self._velocity[tracks] = (
+                self.smoothing * self._velocity[tracks] + (1 - self.smoothing) * step
+            )
+            self._boxes[tracks] = boxes[matched]
+        self._age += 1
+        self._age[tracks] = 0
+
+        new_dets = np.flatnonzero(track_for < 0)
+        new_ids = np.arange(self._next_id, self._next_id + new_dets.size)
+        self._next_id += new_dets.size
+        track_for[new_dets] = np.arange(len(self), len(self) + new_dets.size)
+        self._ids = np.concatenate([self._ids, new_ids])
+        self._boxes = np.concatenate([self._boxes, boxes[new_dets]])
+        self._velocity = np.concatenate(
+            [self._velocity, np.zeros((new_dets.size, 2), dtype=np.float32)]
+        )
+        self._classes = np.concatenate([self._classes, cls[new_dets]])
+        self._age = np.concatenate([self._age, np.zeros(new_dets.size, np.int64)])
+
+        output = np.column_stack(
+            [
+                boxes,
+                self._ids[track_for],
+                conf,
+                cls,
+                np.arange(len(boxes)),
+            ]
+        ).astype(np.float32)
+
+        alive = self._age <= self.max_age
+        if not alive.all():
+            self._ids = self._ids[alive]
+            self._boxes = self._boxes[alive]
+            self._velocity = self._velocity[alive]
+            self._classes = self._classes[alive]
+            self._age = self._age[alive]
+        return output
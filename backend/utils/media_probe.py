@@ -0,0 +1,164 @@
+"""Cached media probe / Sonda de mídia com cache.
+
+English:
+    One ``ffprobe`` run reads everything the pipeline needs from a video:
+    codec, coded size, rotation (``rotate`` tag or display-matrix side data),
+    the exact frame count (demuxed packets are counted, without decoding),
+    duration and the average fps over that duration, which stays right for
+    variable frame rate videos where ``cv2.CAP_PROP_FPS`` and
+    ``CAP_PROP_FRAME_COUNT`` are estimates. The result is written next to the
+    upload as ``<video>.probe.json`` when the upload arrives and reused by
+    ``/predict-video/``, the counting job (rotation, trim range and progress
+    ETA) and the decoders.
+
+Português:
+    Uma única execução do ``ffprobe`` lê codec, tamanho, rotação (tag
+    ``rotate`` ou matriz de exibição), número exato de frames, duração e fps
+    médio. O resultado fica ao lado do upload em ``<video>.probe.json`` e é
+    reaproveitado pelo ``/predict-video/``, pelo job de contagem (rotação,
+    corte e ETA) e pelos decodificadores.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import subprocess
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROBE_SUFFIX = ".probe.json"
+
+
+def probe_path(video_path: str) -> str:
+    return f"{video_path}{PROBE_SUFFIX}"
+
+
+def _rate(value: Any) -> float:
+    num, _, den = str(value or "0/1").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_probe(output: Dict[str, Any]) -> Dict[str, Any]:
+    """Media info from the JSON printed by :func:`run_ffprobe`."""
+
+    stream = output["streams"][0]
+    rotation = _float((stream.get("tags") or {}).get("rotate"))
+    for side_data in stream.get("side_data_list") or []:
+        if "rotation" in side_data:
+            # The display matrix holds the counter-clockwise angle.
+            rotation = -_float(side_data["rotation"])
+    frame_count = int(_float(stream.get("nb_read_packets"))) or int(
+        _float(stream.get("nb_frames"))
+    )
+    duration_s = _float(stream.get("duration")) or _float(
+        (output.get("format") or {}).get("duration")
+    )
+    fps = _rate(stream.get("avg_frame_rate")) or _rate(stream.get("r_frame_rate"))
+    if frame_count and duration_s:
+        fps = frame_count / duration_s
+    return {
+        "codec": stream.get("codec_name"),
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "rotation": int(round(rotation)) % 360,
+        "fps": fps,
+        "frame_count": frame_count,
+        "duration_ms": duration_s * 1000.0,
+    }
+
+
+def run_ffprobe(video_path: str) -> Dict[str, Any]:
+    """Probe ``video_path`` with a single ``ffprobe`` call (no caching)."""
+
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-count_packets",
+        "-show_entries",
+        "stream=codec_name,width,height,avg_frame_rate,r_frame_rate,nb_frames,"
+        "nb_read_packets,duration:stream_tags=rotate:stream_side_data=rotation:"
+        "format=duration",
+        "-of",
+        "json",
+        video_path,
+    ]
+    result = subprocess.run(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+    )
+    return parse_probe(json.loads(result.stdout))
+
+
+def probe_media(video_path: str) -> Optional[Dict[str, Any]]:
+    """Media info of ``video_path``, probed once per file / Informações do vídeo.
+
+    English:
+        Returns the cached ``<video>.probe.json`` while the video keeps its
+        size and modification time; otherwise runs :func:`run_ffprobe` and
+        caches the result. ``None`` when ``ffprobe`` is missing or fails, in
+        which case callers fall back to the decoder properties.
+
+    Português:
+        Devolve o ``<video>.probe.json`` em cache enquanto o vídeo mantém
+        tamanho e data de modificação; senão executa o ``ffprobe`` e grava o
+        resultado. ``None`` quando o ``ffprobe`` falha.
+
+    Retorno / Returns:
+        dict | None: ``codec``, ``width``, ``height`` (sem rotação/unrotated),
+        ``rotation``, ``fps``, ``frame_count`` e ``duration_ms``.
+    """
+
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    cache = probe_path(video_path)
+    try:
+        with open(cache, "r", encoding="utf-8") as handle:
+            cached = json.load(handle)
+        if cached.get("source") == signature:
+            return cached["media"]
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        media = run_ffprobe(video_path)
+    except Exception as exc:
+        logger.warning(f"[PROBE] ffprobe falhou para {video_path}: {exc}")
+        return None
+    try:
+        with open(f"{cache}.tmp", "w", encoding="utf-8") as handle:
+            json.dump({"source": signature, "media": media}, handle)
+        os.replace(f"{cache}.tmp", cache)
+    except OSError as exc:
+        logger.warning(f"[PROBE] Falha ao gravar {cache}: {exc}")
+    logger.info(
+        f"[PROBE] {os.path.basename(video_path)}: {media['codec']} "
+        f"{media['width']}x{media['height']} rot={media['rotation']} "
+        f"{media['frame_count']} frames, {media['fps']:.3f} fps"
+    )
+    return media
+
+
+def discard_probe(video_path: str) -> None:
+    """Remove the cached probe of an upload that is being deleted."""
+
+    cache = probe_path(video_path)
+    if os.path.exists(cache):
+        os.remove(cache)
+
@@ -0,0 +1,175 @@
+"""Exported-model cache for CPU inference backends.
+
+Cache de modelos exportados (ONNX / OpenVINO) para inferência em CPU.
+
+English:
+    ``INFERENCE_BACKEND`` selects how detection runs: ``torch`` (the ``.pt``
+    weights through PyTorch), ``onnx`` (ONNX Runtime, ``pip install
+    onnxruntime``) or ``openvino`` (``pip install openvino``). Exported
+    artifacts are written once to ``MODEL_EXPORT_DIR`` under a name keyed by
+    the weights hash and the image size, and Ultralytics loads them like any
+    other model, so ``model.track`` and the batched tracker keep working.
+
+    INT8 variants (``model_choice`` such as ``"l-int8"``) are OpenVINO
+    exports quantized with the calibration set of :mod:`utils.calibration`.
+
+Português:
+    ``INFERENCE_BACKEND`` define o backend de detecção. Os artefatos
+    exportados são gravados uma vez em ``MODEL_EXPORT_DIR`` com nome baseado
+    no hash dos pesos e no tamanho de imagem, e carregados pelo Ultralytics
+    como qualquer outro modelo. As variantes INT8 (``"l-int8"``) são
+    exportações OpenVINO quantizadas com o conjunto de calibração.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.calibration import calibration_hash, write_dataset_yaml
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_OPENVINO = "openvino"
+INFERENCE_BACKENDS = (BACKEND_TORCH, BACKEND_ONNX, BACKEND_OPENVINO)
+DEFAULT_EXPORT_DIR = os.path.join(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)),
+    "model_exports",
+)
+
+# Ultralytics writes exports next to the weights, so exports are serialised.
+_export_lock = threading.Lock()
+_hash_cache: Dict[Tuple[str, float, int], str] = {}
+
+Exporter = Callable[..., str]
+
+
+def inference_backend(backend: Optional[str] = None) -> str:
+    """Return the configured backend / Retorna o backend configurado."""
+
+    backend = (backend or os.getenv("INFERENCE_BACKEND") or BACKEND_TORCH).lower()
+    if backend not in INFERENCE_BACKENDS:
+        logger.warning(
+            "[MODELOS] INFERENCE_BACKEND=%s desconhecido; usando torch", backend
+        )
+        return BACKEND_TORCH
+    return backend
+
+
+def weights_hash(path: str) -> str:
+    """Short SHA-256 of ``path``, memoised by modification time and size."""
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+    if key not in _hash_cache:
+        digest = hashlib.sha256()
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(chunk)
+        _hash_cache[key] = digest.hexdigest()[:16]
+    return _hash_cache[key]
+
+
+def export_path(
+    weights: str,
+    backend: str,
+    imgsz: int,
+    cache_dir: str,
+    calibration: Optional[str] = None,
+) -> str:
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    name = f"{stem}-{weights_hash(weights)}-{imgsz}"
+    if calibration:
+        name = f"{name}-int8-{calibration_hash(calibration)}"
+    if backend == BACKEND_OPENVINO:
+        return os.path.join(cache_dir, f"{name}_openvino_model")
+    return os.path.join(cache_dir, f"{name}.onnx")
+
+
+def _ultralytics_export(
+    weights: str, backend: str, imgsz: int, calibration: Optional[str] = None
+) -> str:
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    # Dynamic axes keep batched prediction (INFERENCE_BATCH_SIZE > 1) working.
+    options: Dict[str, Any] = {"format": backend, "imgsz": imgsz, "dynamic": True}
+    if calibration:
+        options.update(int8=True, data=write_dataset_yaml(calibration, model.names))
+    return model.export(**options)
+
+
+def _ensure_weights(weights: str) -> None:
+    if os.path.exists(weights):
+        return
+    from ultralytics import YOLO
+
+    # Ultralytics downloads the official weights on first load.
+    YOLO(weights)
+
+
+def export_model(
+    weights: str,
+    backend: str,
+    imgsz: int,
+    cache_dir: Optional[str] = None,
+    exporter: Optional[Exporter] = None,
+    calibration: Optional[str] = None,
+    create: bool = True,
+) -> str:
+    """Return the cached export of ``weights``, exporting it on first use.
+
+    Parâmetros / Parameters:
+        weights (str): Arquivo ``.pt``. ``.pt`` weights file.
+        backend (str): ``"onnx"`` ou ``"openvino"``.
+        imgsz (int): Tamanho de imagem da exportação. Export image size.
+        cache_dir (str, opcional): Diretório do cache (padrão:
+            ``MODEL_EXPORT_DIR``). Cache directory.
+        exporter (Callable, opcional): Substitui a exportação do Ultralytics
+            (testes). Replaces the Ultralytics export (tests).
+        calibration (str, opcional): Diretório de imagens de calibração; gera
+            uma exportação INT8. Calibration images directory; produces an
+            INT8 export.
+        create (bool): ``False`` só consulta o cache e levanta
+            ``FileNotFoundError`` quando a exportação não existe. ``False``
+            only looks up the cache and raises ``FileNotFoundError`` when the
+            export is missing.
+
+    Retorno / Returns:
+        str: Caminho do arquivo ``.onnx`` ou diretório OpenVINO.
+        Path of the ``.onnx`` file or OpenVINO directory.
+    """
+
+    if backend == BACKEND_TORCH:
+        return weights
+    cache_dir = cache_dir or os.getenv("MODEL_EXPORT_DIR") or DEFAULT_EXPORT_DIR
+    with _export_lock:
+        if exporter is None and create:
+            _ensure_weights(weights)
+        target = export_path(weights, backend, imgsz, cache_dir, calibration)
+        if os.path.exists(target):
+            return target
+        if not create:
+            raise FileNotFoundError(f"Exportação {target} não encontrada")
+        os.makedirs(cache_dir, exist_ok=True)
+        start = time.time()
+        exporter = exporter or _ultralytics_export
+        if calibration:
+            exported = exporter(weights, backend, imgsz, calibration=calibration)
+        else:
+            exported = exporter(weights, backend, imgsz)
+        shutil.move(str(exported), target)
+        logger.info(
+            "[MODELOS] %s exportado para %s em %.1fs",
+            weights,
+            target,
+            time.time() - start,
+        )
+        return target
@@ -0,0 +1,381 @@
+"""Process-wide registry of warm YOLO model instances.
+
+Registro de modelos YOLO residentes em memória, compartilhados entre jobs.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils.calibration import calibration_dir, require_calibration_images
+from utils.env import get_env_int
+from utils.model_export import (
+    BACKEND_OPENVINO,
+    BACKEND_TORCH,
+    Exporter,
+    export_model,
+    inference_backend,
+)
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILES: Dict[str, str] = {
+    "n": "yolov8n.pt",
+    "m": "yolov8m.pt",
+    "l": "yolov8l.pt",
+    "p": "best.pt",
+}
+DEFAULT_MODEL_FILE = "yolov8l.pt"
+INT8_SUFFIX = "-int8"
+
+
+def resolve_model_path(model_choice: Optional[str]) -> str:
+    """Return the weights file for ``model_choice`` / Retorna o arquivo de pesos.
+
+    English:
+        Unknown choices fall back to ``yolov8l.pt``. INT8 choices
+        (``"l-int8"``) resolve to the weights they are quantized from.
+
+    Português:
+        Escolhas desconhecidas usam ``yolov8l.pt``. Escolhas INT8
+        (``"l-int8"``) retornam os pesos de origem.
+    """
+
+    choice = str(model_choice).lower()
+    if choice.endswith(INT8_SUFFIX):
+        choice = choice[: -len(INT8_SUFFIX)]
+    return MODEL_FILES.get(choice, DEFAULT_MODEL_FILE)
+
+
+def is_int8_choice(model_choice: Optional[str]) -> bool:
+    return str(model_choice).lower().endswith(INT8_SUFFIX)
+
+
+def int8_imgsz(imgsz: Optional[int] = None) -> int:
+    """Image size of INT8 jobs / Tamanho de imagem dos jobs INT8.
+
+    English:
+        INT8 exports are only built by ``calibrate_int8.py`` (``YOLO_IMG_SIZE``
+        by default), so INT8 jobs stay at that size: no ``auto`` ladder and no
+        ROI-band resize.
+
+    Português:
+        Exportações INT8 só são geradas pelo ``calibrate_int8.py`` (padrão
+        ``YOLO_IMG_SIZE``); jobs INT8 ficam nesse tamanho, sem ``auto`` nem
+        redimensionamento da faixa ROI.
+    """
+
+    return imgsz or get_env_int("YOLO_IMG_SIZE", 512)
+
+
+class Int8UnavailableError(RuntimeError):
+    """An ``-int8`` choice has no quantized export / Variante INT8 ausente."""
+
+
+def _default_loader(model_path: str) -> Any:
+    from ultralytics import YOLO
+
+    if model_path.endswith(".pt"):
+        return YOLO(model_path)
+    # Exported models carry no task metadata Ultralytics can rely on.
+    return YOLO(model_path, task="detect")
+
+
+def _estimate_model_bytes(model: Any, model_path: str) -> int:
+    """Estimate resident size from parameters, falling back to file size."""
+
+    try:
+        return int(
+            sum(p.numel() * p.element_size() for p in model.model.parameters())
+        )
+    except Exception:
+        pass
+    try:
+        if os.path.isdir(model_path):
+            return sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(model_path)
+                for name in names
+            )
+        return os.path.getsize(model_path)
+    except OSError:
+        return 0
+
+
+# Module of the callbacks ``register_tracker`` adds on the first ``track`` call.
+_TRACKER_CALLBACKS_MODULE = "ultralytics.trackers.track"
+
+
+def _remove_tracker_callbacks(callbacks: Any) -> None:
+    for funcs in (callbacks or {}).values():
+        # Lists are shared between the model and its predictor: edit in place.
+        funcs[:] = [
+            func
+            for func in funcs
+            if getattr(getattr(func, "func", func), "__module__", None)
+            != _TRACKER_CALLBACKS_MODULE
+        ]
+
+
+def reset_tracker_state(model: Any) -> None:
+    """Drop tracker state kept by Ultralytics between ``track`` calls.
+
+    English:
+        ``model.track(persist=True)`` stores trackers on the predictor and,
+        whenever they are missing, registers the tracking callbacks again on
+        the model's shared callback lists. Both are removed together, so the
+        next ``track`` call starts a fresh tracker with a single set of
+        callbacks and ``predict``-based detectors run without tracking.
+
+    Português:
+        ``model.track(persist=True)`` guarda os trackers no predictor e
+        registra os callbacks de tracking sempre que eles faltam. Ambos são
+        removidos juntos: o próximo ``track`` recebe um tracker novo com um
+        único conjunto de callbacks e o ``predict`` não roda o tracker.
+    """
+
+    _remove_tracker_callbacks(getattr(model, "callbacks", None))
+    predictor = getattr(model, "predictor", None)
+    if predictor is None:
+        return
+    _remove_tracker_callbacks(getattr(predictor, "callbacks", None))
+    if hasattr(predictor, "trackers"):
+        try:
+            del predictor.trackers
+        except AttributeError:  # pragma: no cover - defensive
+            predictor.trackers = None
+    if hasattr(predictor, "vid_path"):
+        predictor.vid_path = [None] * len(predictor.vid_path or [None])
+
+
+@dataclass
+class _Entry:
+    key: str
+    model: Any
+    size_bytes: int
+    last_used: float = field(default_factory=time.time)
+
+
+class ModelRegistry:
+    """LRU cache of loaded models bounded by a memory budget.
+
+    English:
+        Each job leases an instance exclusively. Idle instances stay resident
+        until the total estimated size exceeds ``memory_budget_bytes``; the
+        least recently used idle instances are evicted first. Instances in use
+        are never evicted. With an ONNX/OpenVINO ``INFERENCE_BACKEND`` the
+        key is the exported artifact, which already encodes the weights hash
+        and the image size.
+
+    Português:
+        Cada job recebe uma instância exclusiva. Instâncias ociosas ficam em
+        memória até o orçamento ser excedido; as menos usadas recentemente são
+        descartadas primeiro.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: Optional[int] = None,
+        loader: Optional[Callable[[str], Any]] = None,
+        exporter: Optional[Exporter] = None,
+        export_dir: Optional[str] = None,
+        calibration: Optional[str] = None,
+    ):
+        if memory_budget_bytes is None:
+            budget_mb = get_env_int("YOLO_MODEL_CACHE_MB", 2048)
+            memory_budget_bytes = budget_mb * 1024 * 1024
+        self.memory_budget_bytes = max(int(memory_budget_bytes), 0)
+        self._loader = loader or _default_loader
+        self._exporter = exporter
+        self._export_dir = export_dir
+        self._calibration = calibration
+        self._lock = threading.Lock()
+        self._idle: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._in_use: Dict[int, _Entry] = {}
+
+    def resolve_key(
+        self,
+        model_choice: Optional[str],
+        imgsz: Optional[int] = None,
+        backend: Optional[str] = None,
+        quantize: bool = False,
+    ) -> str:
+        """Return the file to load for ``model_choice`` on ``backend``.
+
+        English:
+            INT8 choices only use exports built ahead of time by
+            ``calibrate_int8.py`` (``quantize=True``); a missing export raises
+            :class:`Int8UnavailableError` instead of silently using FP32.
+
+        Português:
+            Escolhas INT8 usam apenas exportações geradas antes pelo
+            ``calibrate_int8.py`` (``quantize=True``); sem exportação levanta
+            :class:`Int8UnavailableError` em vez de usar FP32.
+        """
+
+        weights = resolve_model_path(model_choice)
+        backend = inference_backend(backend)
+        if is_int8_choice(model_choice):
+            imgsz = int8_imgsz(imgsz)
+            calibration = self._calibration or calibration_dir()
+            try:
+                require_calibration_images(calibration)
+                return export_model(
+                    weights,
+                    BACKEND_OPENVINO,
+                    imgsz,
+                    self._export_dir,
+                    self._exporter,
+                    calibration=calibration,
+                    create=quantize,
+                )
+            except Exception as exc:
+                raise Int8UnavailableError(
+                    f"Variante INT8 de {weights} ({imgsz}px) indisponível: {exc}. "
+                    f"Execute 'python calibrate_int8.py --imgsz {imgsz}'."
+                ) from exc
+        if backend == BACKEND_TORCH or not imgsz:
+            return weights
+        try:
+            return export_model(
+                weights, backend, imgsz, self._export_dir, self._exporter
+            )
+        except Exception as exc:
+            logger.warning(
+                "[MODELOS] Exportação %s de %s falhou (%s); usando PyTorch",
+                backend,
+                weights,
+                exc,
+            )
+            return weights
+
+    def int8_available(
+        self, model_choice: Optional[str], imgsz: Optional[int] = None
+    ) -> bool:
+        """Whether ``calibrate_int8.py`` built ``model_choice`` at the job size.
+
+        ``imgsz`` defaults to :func:`int8_imgsz`, the size INT8 jobs run at.
+        """
+
+        try:
+            self.resolve_key(model_choice, imgsz=int8_imgsz(imgsz))
+        except Int8UnavailableError:
+            return False
+        return True
+
+    def acquire(
+        self,
+        model_choice: Optional[str],
+        imgsz: Optional[int] = None,
+        backend: Optional[str] = None,
+    ) -> Any:
+        """Lease a model instance for ``model_choice``.
+
+        English:
+            ``imgsz`` is required by the exported backends, whose artifacts
+            are specific to one image size.
+
+        Português:
+            ``imgsz`` é necessário para os backends exportados.
+        """
+
+        key = self.resolve_key(model_choice, imgsz, backend)
+        with self._lock:
+            for entry_id in reversed(self._idle):
+                entry = self._idle[entry_id]
+                if entry.key == key:
+                    del self._idle[entry_id]
+                    self._in_use[id(entry.model)] = entry
+                    entry.last_used = time.time()
+                    logger.info("[MODELOS] Reutilizando modelo residente: %s", key)
+                    break
+            else:
+                entry = None
+        if entry is None:
+            start = time.time()
+            model = self._loader(key)
+            entry = _Entry(key, model, _estimate_model_bytes(model, key))
+            logger.info(
+                "[MODELOS] Modelo %s carregado em %.2fs (~%.0f MB)",
+                key,
+                time.time() - start,
+                entry.size_bytes / (1024 * 1024),
+            )
+            with self._lock:
+                self._in_use[id(model)] = entry
+                self._evict_locked()
+        reset_tracker_state(entry.model)
+        return entry.model
+
+    def release(self, model: Any) -> None:
+        """Return a leased instance to the idle pool."""
+
+        reset_tracker_state(model)
+        with self._lock:
+            entry = self._in_use.pop(id(model), None)
+            if entry is None:
+                return
+            entry.last_used = time.time()
+            self._idle[id(model)] = entry
+            self._evict_locked()
+
+    @contextmanager
+    def lease(
+        self,
+        model_choice: Optional[str],
+        imgsz: Optional[int] = None,
+        backend: Optional[str] = None,
+    ) -> Iterator[Any]:
+        model = self.acquire(model_choice, imgsz, backend)
+        try:
+            yield model
+        finally:
+            self.release(model)
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return self._resident_bytes_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "idle": [entry.key for entry in self._idle.values()],
+                "in_use": [entry.key for entry in self._in_use.values()],
+                "resident_bytes": self._resident_bytes_locked(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._idle.clear()
+
+    def _resident_bytes_locked(self) -> int:
+        return sum(e.size_bytes for e in self._idle.values()) + sum(
+            e.size_bytes for e in self._in_use.values()
+        )
+
+    def _evict_locked(self) -> None:
+        while self._idle and self._resident_bytes_locked() > self.memory_budget_bytes:
+            _, entry = self._idle.popitem(last=False)
+            logger.info("[MODELOS] Modelo %s removido da memória (LRU)", entry.key)
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide registry / Retorna o registro global do processo."""
+
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
@@ -0,0 +1,104 @@
+"""Motion gate in front of inference / Filtro de movimento antes da inferência.
+
+English:
+    Chute cameras spend long stretches with nothing moving. ``MotionGate``
+    compares a subsampled grayscale copy of the band around the counting line
+    with the one of the last frame sent to the detector; frames whose
+    changed-pixel fraction stays below ``threshold`` skip YOLO and the tracker, which keep
+    their state unchanged. After ``max_idle`` gated frames in a row a full
+    inference is forced.
+
+Português:
+    Compara uma cópia subamostrada, em tons de cinza, da faixa em torno da
+    linha com a do último frame enviado ao detector; frames com fração de pixels
+    alterados abaixo de ``threshold`` não passam pelo YOLO nem pelo tracker.
+    Após ``max_idle`` frames seguidos sem inferência, uma é forçada.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.line_counter import LINE_HORIZONTAL
+from utils.tracking import DEFAULT_BAND_RATIO, crop_band
+
+DEFAULT_MAX_IDLE = 30
+DEFAULT_GATE_SIZE = 96
+DEFAULT_PIXEL_DELTA = 20
+# Band watched when no ROI band is configured / Faixa observada sem ROI.
+DEFAULT_MOTION_BAND_RATIO = DEFAULT_BAND_RATIO
+
+
+class MotionGate:
+    """Decide per frame whether inference must run / Decide se há inferência.
+
+    Parâmetros / Parameters:
+        threshold (float): Fração mínima de pixels alterados para executar a
+            inferência. Minimum changed-pixel fraction that triggers
+            inference.
+        max_idle (int): Máximo de frames seguidos sem inferência. Maximum
+            consecutive gated frames.
+        line_type (str): Tipo da linha de contagem. Counting line type.
+        band (tuple): Faixa observada, em frações do frame. Watched band as
+            frame fractions.
+        size (int): Maior lado da imagem reduzida. Longest side of the
+            downscaled image.
+        pixel_delta (int): Diferença de intensidade que marca um pixel como
+            alterado. Intensity difference marking a pixel as changed.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        max_idle: int = DEFAULT_MAX_IDLE,
+        line_type: str = LINE_HORIZONTAL,
+        band: Tuple[float, float] = (0.0, 1.0),
+        size: int = DEFAULT_GATE_SIZE,
+        pixel_delta: int = DEFAULT_PIXEL_DELTA,
+    ):
+        self.threshold = float(threshold)
+        self.max_idle = max(int(max_idle), 1)
+        self.line_type = line_type
+        self.band = band
+        self.size = size
+        self.pixel_delta = pixel_delta
+        self.frames = 0
+        self.gated = 0
+        self._reference: Optional[np.ndarray] = None
+        self._idle = 0
+
+    def _signature(self, frame: np.ndarray) -> np.ndarray:
+        crop, _ = crop_band(frame, self.line_type, self.band)
+        # Strided subsampling is enough for differencing and costs no resize.
+        step = max(int(math.ceil(max(crop.shape[:2]) / self.size)), 1)
+        small = np.asarray(crop[::step, ::step], dtype=np.int16)
+        if small.ndim == 3:
+            small = small.sum(axis=2) // small.shape[2]
+        return small
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        """Return ``False`` when ``frame`` can skip inference."""
+
+        self.frames += 1
+        signature = self._signature(frame)
+        if self._reference is not None and self._idle < self.max_idle:
+            changed = np.count_nonzero(
+                np.abs(signature - self._reference) > self.pixel_delta
+            )
+            if changed < self.threshold * signature.size:
+                self._idle += 1
+                self.gated += 1
+                return False
+        self._reference = signature
+        self._idle = 0
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "gated_frames": self.gated,
+            "gated_fraction": round(self.gated / self.frames, 4) if self.frames else 0.0,
+        }
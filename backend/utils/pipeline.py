@@ -0,0 +1,120 @@
+"""Helpers for the threaded decode → infer → encode pipeline.
+
+Utilitários para o pipeline com threads decodificação → inferência → codificação.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+END_OF_STREAM = object()
+_POLL_SECONDS = 0.1
+
+
+@dataclass
+class StageStats:
+    """Timing of one pipeline stage / Tempos de um estágio do pipeline.
+
+    English:
+        ``wait_seconds`` is the time spent blocked on an empty input queue or
+        a full output queue; the stage with the lowest wait relative to its
+        busy time is the bottleneck.
+
+    Português:
+        ``wait_seconds`` é o tempo bloqueado em fila de entrada vazia ou fila
+        de saída cheia; o estágio com menor espera é o gargalo.
+    """
+
+    name: str
+    wait_seconds: float = 0.0
+    busy_seconds: float = 0.0
+    items: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "wait_seconds": round(self.wait_seconds, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items": self.items,
+        }
+
+
+class Pipeline:
+    """Bounded queues, a shared stop flag and per-stage statistics."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = max(int(queue_size), 1)
+        self.stop_event = threading.Event()
+        self.stats: Dict[str, StageStats] = {}
+        self.errors: List[BaseException] = []
+        self._threads: List[threading.Thread] = []
+
+    def new_queue(self) -> "queue.Queue[Any]":
+        return queue.Queue(maxsize=self.queue_size)
+
+    def stage(self, name: str) -> StageStats:
+        return self.stats.setdefault(name, StageStats(name))
+
+    def put(self, q: "queue.Queue[Any]", item: Any, stats: StageStats) -> bool:
+        """Put ``item``, giving up (``False``) once the pipeline is stopped."""
+
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.stop_event.is_set() and item is not END_OF_STREAM:
+                    return False
+                try:
+                    q.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    if item is END_OF_STREAM and self.stop_event.is_set():
+                        _drain(q)
+        finally:
+            stats.wait_seconds += time.perf_counter() - start
+
+    def get(self, q: "queue.Queue[Any]", stats: StageStats) -> Any:
+        """Return the next item or ``END_OF_STREAM``."""
+
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if self.stop_event.is_set():
+                        return END_OF_STREAM
+        finally:
+            stats.wait_seconds += time.perf_counter() - start
+
+    def start_thread(self, name: str, target: Callable[[], None]) -> None:
+        def runner() -> None:
+            try:
+                target()
+            except BaseException as exc:  # pragma: no cover - propagated by join
+                self.errors.append(exc)
+                self.stop_event.set()
+
+        thread = threading.Thread(target=runner, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+
+def _drain(q: "queue.Queue[Any]") -> None:
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
@@ -0,0 +1,320 @@
+"""Deferred annotated-video rendering / Renderização sob demanda do vídeo anotado.
+
+English:
+    With ``ANNOTATED_VIDEO_MODE=deferred`` the counting job neither draws nor
+    encodes. It keeps the tracked detections of every analysed frame
+    (:class:`utils.detection_cache.DetectionRecorder`), the uploaded video and
+    a JSON manifest with the decode and line settings in ``RENDER_DIR``. The
+    first request for ``/videos_processados/<name>`` enqueues
+    :func:`render_annotated_video` on a separate low-priority queue; it
+    decodes the video again with the same sampling, replays the detections
+    through a fresh :class:`utils.line_counter.LineCounter` (so counted boxes
+    and the running total match the job) and encodes the annotated file,
+    which is then served as a static file. Pending renders older than
+    ``RENDER_PENDING_MAX_HOURS`` are discarded.
+
+Português:
+    Com ``ANNOTATED_VIDEO_MODE=deferred`` o job de contagem só guarda as
+    detecções, o vídeo enviado e um manifesto em ``RENDER_DIR``. O primeiro
+    acesso a ``/videos_processados/<nome>`` enfileira a renderização numa
+    fila separada de baixa prioridade, que decodifica o vídeo com a mesma
+    amostragem, reaplica as detecções no contador e grava o vídeo anotado.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from utils.detection_cache import CachedDetections, DetectionRecorder
+from utils.line_counter import LineCounter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PENDING_MAX_HOURS = 72.0
+# Niceness added to the render thread (and the encoder it spawns).
+RENDER_NICENESS = 10
+# Decoded frames match recorded ones when their timestamps are this close.
+_PTS_TOLERANCE_MS = 0.5
+
+
+def render_dir() -> str:
+    data_dir = os.getenv("RENDER_DATA_DIR", "data")
+    return os.getenv("RENDER_DIR") or os.path.join(data_dir, "renders")
+
+
+def _manifest_path(processed_fn: str, directory: Optional[str] = None) -> str:
+    name = os.path.basename(processed_fn)
+    return os.path.join(directory or render_dir(), f"{name}.json")
+
+
+def pending_render(
+    processed_fn: str, directory: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Manifest of a render not produced yet, or ``None``."""
+
+    path = _manifest_path(processed_fn, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def register_render(
+    processed_fn: str,
+    video_path: str,
+    detections: Union[DetectionRecorder, CachedDetections],
+    names: Dict[int, str],
+    settings: Dict[str, Any],
+    directory: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Keep what a later render of ``processed_fn`` needs.
+
+    Parâmetros / Parameters:
+        processed_fn (str): Nome do vídeo anotado. Annotated video name.
+        video_path (str): Vídeo enviado; é movido para ``RENDER_DIR``.
+            Uploaded video; moved into ``RENDER_DIR``.
+        detections: Detecções gravadas ou já em cache. Recorded or cached
+            detections.
+        names (dict): Nomes das classes do modelo. Model class names.
+        settings (dict): Parâmetros de decodificação e da linha (veja
+            :func:`render_annotated_video`). Decode and line settings.
+
+    Retorno / Returns:
+        dict: O manifesto gravado. The written manifest.
+    """
+
+    directory = directory or render_dir()
+    os.makedirs(directory, exist_ok=True)
+    prune_pending(directory=directory)
+    stem = os.path.splitext(os.path.basename(processed_fn))[0]
+    if isinstance(detections, DetectionRecorder):
+        detections_path = detections.save(stem, names, directory=directory)
+    else:
+        detections_path = os.path.join(directory, f"{stem}.npz")
+        shutil.copyfile(detections.path, detections_path)
+    source = os.path.join(
+        directory, f"{stem}.source{os.path.splitext(video_path)[1]}"
+    )
+    os.replace(video_path, source)
+    manifest = dict(
+        settings,
+        processed_fn=processed_fn,
+        source=source,
+        detections=detections_path,
+        created_at=time.time(),
+    )
+    path = _manifest_path(processed_fn, directory)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle)
+    os.replace(f"{path}.tmp", path)
+    logger.info(f"[RENDER] {processed_fn} aguardando primeira requisição")
+    return manifest
+
+
+def discard_render(processed_fn: str, directory: Optional[str] = None) -> None:
+    """Remove the manifest, detections and source of a pending render."""
+
+    path = _manifest_path(processed_fn, directory)
+    manifest = pending_render(processed_fn, directory) or {}
+    for file_path in (manifest.get("detections"), manifest.get("source"), path):
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def prune_pending(
+    max_age_s: Optional[float] = None, directory: Optional[str] = None
+) -> List[str]:
+    """Discard renders nobody requested within ``RENDER_PENDING_MAX_HOURS``."""
+
+    directory = directory or render_dir()
+    if max_age_s is None:
+        try:
+            hours = float(
+                os.getenv("RENDER_PENDING_MAX_HOURS") or DEFAULT_PENDING_MAX_HOURS
+            )
+        except ValueError:
+            hours = DEFAULT_PENDING_MAX_HOURS
+        max_age_s = hours * 3600
+    if max_age_s <= 0 or not os.path.isdir(directory):
+        return []
+    removed = []
+    now = time.time()
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        processed_fn = name[: -len(".json")]
+        manifest = pending_render(processed_fn, directory) or {}
+        if now - manifest.get("created_at", now) > max_age_s:
+            discard_render(processed_fn, directory)
+            removed.append(processed_fn)
+    return removed
+
+
+def lower_thread_priority(increment: int = RENDER_NICENESS) -> None:
+    """Raise the niceness of the calling thread (Linux; no-op elsewhere)."""
+
+    try:
+        thread_id = threading.get_native_id()
+        current = os.getpriority(os.PRIO_PROCESS, thread_id)
+        os.setpriority(os.PRIO_PROCESS, thread_id, current + increment)
+    except (AttributeError, OSError):
+        pass
+
+
+def render_annotated_video(
+    processed_fn: str, output_dir: str, directory: Optional[str] = None
+) -> Optional[str]:
+    """Render ``processed_fn`` into ``output_dir`` / Renderiza o vídeo anotado.
+
+    English:
+        The manifest holds the ``open_frame_source`` arguments of the job
+        (``start_ms``, ``end_ms``, ``rotation``, ``target_size``,
+        ``frame_skip``, ``target_fps``), the line geometry (``line_type``,
+        ``direction``, ``line_coord``, ``line_points``, ``arrow_points``) and
+        ``target_classes``; ``box_rotation`` and ``source_size`` when the
+        detections are unrotated. On success the pending files are removed.
+
+    Português:
+        O manifesto guarda os argumentos de decodificação, a geometria da
+        linha e ``target_classes``. Em caso de sucesso os arquivos pendentes
+        são removidos.
+
+    Retorno / Returns:
+        str | None: Caminho do vídeo anotado, ou ``None`` sem renderização
+        pendente. Path of the annotated video, or ``None`` without a pending
+        render.
+    """
+
+    from utils.contagem_video import (
+        annotation_boxes,
+        apply_rotation,
+        draw_annotations,
+        rotate_boxes,
+    )
+    from utils.video_io import open_frame_source, open_video_sink
+
+    manifest = pending_render(processed_fn, directory)
+    if manifest is None:
+        return None
+    started = time.perf_counter()
+    cached = CachedDetections(manifest["detections"])
+    names = cached.names
+    target_classes = manifest.get("target_classes")
+    counter = LineCounter(
+        manifest["line_type"],
+        manifest["direction"],
+        manifest["line_coord"],
+        target_class_ids=(
+            None
+            if target_classes is None
+            else [cls_id for cls_id, nome in names.items() if nome in target_classes]
+        ),
+    )
+    line_points = tuple(map(tuple, manifest["line_points"]))
+    arrow_points = (
+        tuple(map(tuple, manifest["arrow_points"]))
+        if manifest.get("arrow_points")
+        else None
+    )
+
+    rotation = manifest.get("rotation", 0)
+    # Jobs counted with ROTATION_MODE=boxes recorded unrotated boxes.
+    box_rotation = manifest.get("box_rotation", 0)
+    cap = open_frame_source(
+        manifest["source"],
+        start_ms=manifest.get("start_ms"),
+        end_ms=manifest.get("end_ms"),
+        rotation=rotation,
+        target_size=manifest.get("target_size"),
+        frame_skip=manifest.get("frame_skip", 1),
+        target_fps=manifest.get("target_fps"),
+    )
+    if not cap.isOpened():
+        raise IOError(f"Falha ao abrir {manifest['source']}")
+    fps = cap.fps if cap.fps > 0 else 30.0
+    frame_step = getattr(cap, "frame_step", 1)
+    frame_skip = frame_step if frame_step > 1 else manifest["sample_every"]
+    rotate_frames = bool(rotation) and not getattr(cap, "applies_rotation", False)
+    decode_scale = getattr(cap, "scale", 1.0)
+    width, height = cap.width, cap.height
+    if rotation in (90, 270):
+        width, height = height, width
+
+    os.makedirs(output_dir, exist_ok=True)
+    final_path = os.path.join(output_dir, os.path.basename(processed_fn))
+    base, ext = os.path.splitext(final_path)
+    out = open_video_sink(
+        f"{base}.rendering{ext}",
+        fps / frame_skip,
+        (getattr(cap, "output_width", width), getattr(cap, "output_height", height)),
+    )
+    if not out.isOpened():
+        cap.release()
+        raise IOError(f"VideoWriter falhou para {out.output_path}")
+
+    index, caixas, frame_idx = 0, [], 0
+    try:
+        while True:
+            if frame_step == 1 and frame_idx % frame_skip:
+                if not cap.grab():
+                    break
+                frame_idx += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp_ms = cap.timestamp_ms
+            if timestamp_ms is None:
+                timestamp_ms = frame_idx * 1000.0 / fps
+            # Frames skipped by the motion gate keep the previous boxes.
+            if (
+                index < len(cached)
+                and abs(cached.pts_ms[index] - timestamp_ms) <= _PTS_TOLERANCE_MS
+            ):
+                deteccoes = cached.frame(index)
+                index += 1
+                boxes = deteccoes.boxes
+                if decode_scale != 1.0:
+                    boxes = boxes * decode_scale
+                if box_rotation:
+                    boxes = rotate_boxes(
+                        boxes, box_rotation, *manifest["source_size"]
+                    )
+                counter.update(deteccoes.track_ids, deteccoes.classes, boxes)
+                caixas = annotation_boxes(
+                    deteccoes.track_ids,
+                    deteccoes.classes,
+                    boxes,
+                    counter.is_counted(deteccoes.track_ids),
+                    names,
+                    target_classes,
+                )
+            if rotate_frames:
+                frame = apply_rotation(frame, rotation)
+            draw_annotations(
+                frame,
+                caixas,
+                line_points,
+                arrow_points,
+                counter.total,
+                1.0 / decode_scale,
+            )
+            out.write(frame)
+            frame_idx += frame_step
+    finally:
+        cap.release()
+        out.release()
+
+    os.replace(out.output_path, final_path)
+    discard_render(processed_fn, directory)
+    logger.info(
+        f"[RENDER] {processed_fn}: {index}/{len(cached)} frames com detecções, "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+    return final_path
@@ -0,0 +1,200 @@
+"""Deduplication of re-uploaded videos / Deduplicação de vídeos reenviados.
+
+English:
+    A retried upload gets a new uuid name, so the same video used to be
+    counted again from scratch. The upload route now hashes each file while
+    it streams to disk, and ``/predict-video/`` derives a :func:`result_key`
+    from that hash and every option that changes the count. The key is stored
+    with the job in ``video_progress.result_key``: a finished result under the
+    same key is returned at once, and a job still queued or running under it
+    is shared through :class:`RunningJobs` instead of enqueueing a copy.
+
+Português:
+    O upload calcula o SHA-256 do arquivo enquanto ele é gravado e o
+    ``/predict-video/`` monta uma chave com esse hash e as opções que alteram
+    a contagem. Um resultado já finalizado com a mesma chave é devolvido na
+    hora; um job ainda na fila ou em execução com a mesma chave é
+    compartilhado em vez de processado de novo.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional
+
+from utils.detection_cache import cache_key
+from utils.env import get_env_float, get_env_int
+from utils.imgsz_probe import AUTO_IMGSZ, imgsz_ladder
+from utils.model_export import inference_backend
+from utils.motion import DEFAULT_MAX_IDLE
+from utils.tracking import DEFAULT_TILE_OVERLAP, tracker_choice
+
+# Request options that change the count; anything else is irrelevant to it.
+RESULT_KEY_FIELDS = (
+    "model_choice",
+    "orientation",
+    "line_position_ratio",
+    "target_classes",
+    "trim_start_ms",
+    "trim_end_ms",
+    "frame_skip",
+    "target_fps",
+    "roi_band_ratio",
+    "tiled_inference",
+    "tracker",
+    "zones",
+    "sweep",
+)
+
+
+def effective_settings(options: Mapping[str, Any]) -> Dict[str, Any]:
+    """Server settings the job resolves for ``options``.
+
+    English:
+        Options left out of the request fall back to environment defaults in
+        the counting job (``TRACKER``, ``TILED_INFERENCE``, ``ROI_BAND_RATIO``),
+        and ``YOLO_IMG_SIZE``, ``INFERENCE_BACKEND``, the motion gate and the
+        tile overlap change the detections too. Resolving them here keeps a
+        cached result from outliving a configuration change.
+
+    Português:
+        Resolve os padrões do ambiente usados pelo job (rastreador, tiles,
+        faixa ROI, ``YOLO_IMG_SIZE``, ``INFERENCE_BACKEND``, filtro de
+        movimento), para que uma mudança de configuração não reaproveite um
+        resultado antigo.
+    """
+
+    imgsz: Any = options.get("imgsz")
+    if imgsz is None:
+        if os.getenv("YOLO_IMG_SIZE", "").strip().lower() == AUTO_IMGSZ:
+            imgsz = [AUTO_IMGSZ, *imgsz_ladder()]
+        else:
+            imgsz = get_env_int("YOLO_IMG_SIZE", 512)
+    tiled_inference = options.get("tiled_inference")
+    if tiled_inference is None:
+        tiled_inference = os.getenv("TILED_INFERENCE", "false").lower() == "true"
+    roi_band_ratio = options.get("roi_band_ratio")
+    if roi_band_ratio is None:
+        roi_band_ratio = get_env_float("ROI_BAND_RATIO", 0.0)
+    return {
+        "imgsz": imgsz,
+        "inference_backend": inference_backend(),
+        "tracker": tracker_choice(options.get("tracker")),
+        "tiled_inference": tiled_inference,
+        "tile_overlap": get_env_float("TILE_OVERLAP", DEFAULT_TILE_OVERLAP),
+        "roi_band_ratio": roi_band_ratio,
+        "motion_gate": [
+            get_env_float("MOTION_GATE_THRESHOLD", 0.0),
+            get_env_int("MOTION_GATE_MAX_IDLE", DEFAULT_MAX_IDLE),
+        ],
+    }
+
+
+def result_key(video_hash: str, options: Mapping[str, Any]) -> str:
+    """Key of the count of ``video_hash`` under ``options``.
+
+    ``target_classes`` is order-insensitive and ``frame_skip`` ``None``/``0``
+    means 1, as in the counting job. Settings taken from the environment are
+    resolved by :func:`effective_settings`.
+    """
+
+    params = {field: options.get(field) for field in RESULT_KEY_FIELDS}
+    if params["target_classes"] is not None:
+        params["target_classes"] = sorted(set(params["target_classes"]))
+    params["frame_skip"] = max(int(params["frame_skip"] or 1), 1)
+    params.update(effective_settings(options))
+    return cache_key(video_hash, dict(params, kind="result"))
+
+
+class UploadHashes:
+    """SHA-256 of recent uploads, bounded to ``max_entries``.
+
+    Uploads that never reach ``/predict-video/`` would otherwise keep their
+    hash forever; the oldest entries are dropped and their hash is computed
+    again from the file if they are submitted later.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max(int(max_entries), 1)
+        self._lock = threading.Lock()
+        self._hashes: "OrderedDict[str, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._hashes)
+
+    def put(self, video_name: str, digest: str) -> None:
+        with self._lock:
+            self._hashes[video_name] = digest
+            self._hashes.move_to_end(video_name)
+            while len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+
+    def pop(self, video_name: str) -> Optional[str]:
+        with self._lock:
+            return self._hashes.pop(video_name, None)
+
+
+class RunningJobs:
+    """Jobs in ``video_queue`` by result key, with the uploads sharing them.
+
+    Thread-safe: uploads attach from the API while the queue worker
+    releases finished jobs.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._owner_by_key: Dict[str, str] = {}
+        self._key_by_owner: Dict[str, str] = {}
+        self._attached: Dict[str, List[str]] = {}
+        self._owner_of: Dict[str, str] = {}
+
+    def claim(self, key: str, video_name: str) -> Optional[str]:
+        """Register ``video_name`` as the job of ``key``.
+
+        Retorno / Returns:
+            str | None: ``None`` quando ``video_name`` passa a ser o job da
+            chave; senão o nome do job existente, ao qual ``video_name`` foi
+            anexado. ``None`` when ``video_name`` becomes the job of the key;
+            otherwise the existing job, which ``video_name`` now shares.
+        """
+
+        with self._lock:
+            owner = self._owner_by_key.get(key)
+            if owner is None or owner == video_name:
+                self._owner_by_key[key] = video_name
+                self._key_by_owner[video_name] = key
+                return None
+            self._attached.setdefault(owner, []).append(video_name)
+            self._owner_of[video_name] = owner
+            return owner
+
+    def owner_of(self, video_name: str) -> Optional[str]:
+        """Job whose result ``video_name`` is waiting for, if attached."""
+
+        with self._lock:
+            return self._owner_of.get(video_name)
+
+    def detach(self, video_name: str) -> bool:
+        """Stop waiting for the shared job (e.g. on cancellation)."""
+
+        with self._lock:
+            owner = self._owner_of.pop(video_name, None)
+            if owner is None:
+                return False
+            self._attached[owner].remove(video_name)
+            return True
+
+    def release(self, video_name: str) -> List[str]:
+        """Forget the job ``video_name`` and return the uploads attached to it."""
+
+        with self._lock:
+            key = self._key_by_owner.pop(video_name, None)
+            if key is not None and self._owner_by_key.get(key) == video_name:
+                del self._owner_by_key[key]
+            attached = self._attached.pop(video_name, [])
+            for name in attached:
+                self._owner_of.pop(name, None)
+            return attached
@@ -0,0 +1,362 @@
+"""Segment-parallel counting of one video / Contagem paralela por segmentos.
+
+English:
+    A long video is split into time segments. Each segment is counted by
+    ``contar_gado_em_video`` in its own worker process, with its own model
+    and tracker, starting ``overlap_ms`` before its core window so the
+    tracker is warmed up when the core starts. A segment only reports the
+    crossings inside its core window; crossings during the warm-up mark the
+    track as counted without reporting it (the previous segment owns them).
+
+    The boxes seen in the overlap windows are kept so that the stitcher can
+    match the tracks of consecutive segments by IoU: a track that continues
+    one already counted in the previous segment is not counted again, so an
+    animal crossing at a boundary (or going back and forth over it) is
+    counted exactly once.
+
+Português:
+    O vídeo é dividido em segmentos de tempo processados em processos
+    separados, cada um com modelo e tracker próprios e começando
+    ``overlap_ms`` antes da sua janela principal. Os tracks das janelas de
+    sobreposição são casados por IoU para que um animal cruzando na fronteira
+    seja contado uma única vez.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.tracking import box_iou
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OVERLAP_MS = 2000
+MATCH_IOU = 0.3
+_POLL_SECONDS = 1.0
+
+# frame key -> rows of (track_id, x1, y1, x2, y2)
+OverlapBoxes = Dict[int, List[List[float]]]
+
+
+@dataclass
+class Segment:
+    """Time window of one worker / Janela de tempo de um processo.
+
+    English:
+        Frames are read from ``read_start_ms`` to ``core_end_ms``; crossings
+        are reported only when ``core_start_ms <= t < core_end_ms`` (the last
+        segment also keeps ``t == core_end_ms``).
+
+    Português:
+        Lê de ``read_start_ms`` até ``core_end_ms`` e reporta apenas os
+        cruzamentos dentro da janela principal.
+    """
+
+    index: int
+    read_start_ms: float
+    core_start_ms: float
+    core_end_ms: float
+    overlap_ms: float
+    last: bool
+
+    def in_core(self, timestamp_ms: float) -> bool:
+        if timestamp_ms < self.core_start_ms:
+            return False
+        if self.last:
+            return timestamp_ms <= self.core_end_ms
+        return timestamp_ms < self.core_end_ms
+
+    def in_head(self, timestamp_ms: float) -> bool:
+        return self.index > 0 and timestamp_ms < self.core_start_ms
+
+    def in_tail(self, timestamp_ms: float) -> bool:
+        return (
+            not self.last
+            and self.core_end_ms - self.overlap_ms <= timestamp_ms < self.core_end_ms
+        )
+
+
+def plan_segments(
+    start_ms: float, end_ms: float, workers: int, overlap_ms: float
+) -> List[Segment]:
+    """Split ``[start_ms, end_ms]`` into at most ``workers`` segments.
+
+    English:
+        Segments shorter than twice the overlap are not worth a process, so
+        fewer segments may be returned.
+
+    Português:
+        Segmentos menores que duas sobreposições não compensam um processo;
+        pode retornar menos segmentos.
+    """
+
+    duration = max(end_ms - start_ms, 0.0)
+    if overlap_ms > 0:
+        workers = min(workers, int(duration // (2 * overlap_ms)))
+    workers = max(int(workers), 1)
+    bounds = np.linspace(start_ms, end_ms, workers + 1)
+    segments = []
+    for index in range(workers):
+        core_start = float(bounds[index])
+        read_start = max(core_start - overlap_ms, start_ms) if index else core_start
+        segments.append(
+            Segment(
+                index=index,
+                read_start_ms=read_start,
+                core_start_ms=core_start,
+                core_end_ms=float(bounds[index + 1]),
+                overlap_ms=float(overlap_ms),
+                last=index == workers - 1,
+            )
+        )
+    return segments
+
+
+def match_tracks(
+    tail: OverlapBoxes,
+    head: OverlapBoxes,
+    max_gap: int = 0,
+    iou_threshold: float = MATCH_IOU,
+) -> Dict[int, int]:
+    """Map head track ids of a segment to tail track ids of the previous one.
+
+    English:
+        Each head frame is paired with the nearest tail frame (at most
+        ``max_gap`` frames apart, since ``frame_skip`` may sample different
+        frames in each segment). Pairs of boxes above ``iou_threshold`` vote
+        for a match and tracks are assigned greedily by votes, one to one.
+
+    Português:
+        Cada frame da cabeça é pareado com o frame mais próximo da cauda;
+        pares de caixas com IoU acima do limiar votam e a associação é feita
+        de forma gulosa, um para um.
+    """
+
+    tail_keys = sorted(tail)
+    votes: Dict[Tuple[int, int], int] = defaultdict(int)
+    for key, head_rows in head.items():
+        if not head_rows or not tail_keys:
+            continue
+        pos = bisect.bisect_left(tail_keys, key)
+        candidates = tail_keys[max(pos - 1, 0) : pos + 1]
+        nearest = min(candidates, key=lambda k: abs(k - key))
+        if abs(nearest - key) > max_gap or not tail[nearest]:
+            continue
+        head_arr = np.asarray(head_rows, dtype=np.float64)
+        tail_arr = np.asarray(tail[nearest], dtype=np.float64)
+        iou = box_iou(head_arr[:, 1:5], tail_arr[:, 1:5])
+        best = iou.argmax(axis=1)
+        for row, col in enumerate(best):
+            if iou[row, col] >= iou_threshold:
+                votes[(int(head_arr[row, 0]), int(tail_arr[col, 0]))] += 1
+
+    mapping: Dict[int, int] = {}
+    used = set()
+    for (head_id, tail_id), _ in sorted(votes.items(), key=lambda kv: -kv[1]):
+        if head_id in mapping or tail_id in used:
+            continue
+        mapping[head_id] = tail_id
+        used.add(tail_id)
+    return mapping
+
+
+def stitched_events(
+    parts: Sequence[Dict[str, Any]], max_gap: int = 0
+) -> List[Tuple]:
+    """Events of all segments, without recounts of boundary tracks.
+
+    English:
+        ``parts`` are the ``"segment"`` entries returned by each worker, with
+        ``events`` (``(timestamp_ms, track_id, class_name, ...)``),
+        ``counted_ids`` and the ``head``/``tail`` overlap boxes.
+
+    Português:
+        ``parts`` são as entradas ``"segment"`` retornadas por cada processo.
+    """
+
+    kept: List[Tuple] = []
+    previous: Optional[Dict[str, Any]] = None
+    counted_previous: set = set()
+    for part in sorted(parts, key=lambda p: p["index"]):
+        inherited = set()
+        if previous is not None:
+            mapping = match_tracks(previous["tail"], part["head"], max_gap)
+            inherited = {
+                head_id
+                for head_id, tail_id in mapping.items()
+                if tail_id in counted_previous
+            }
+        kept.extend(event for event in part["events"] if event[1] not in inherited)
+        counted_previous = inherited | set(part["counted_ids"])
+        previous = part
+    return kept
+
+
+def stitch_segments(
+    parts: Sequence[Dict[str, Any]], max_gap: int = 0
+) -> Tuple[int, Dict[str, int]]:
+    """Merge segment results into ``(total_count, por_classe)``."""
+
+    events = stitched_events(parts, max_gap)
+    return len(events), _count_by_class(events)
+
+
+def _count_by_class(events: Sequence[Tuple]) -> Dict[str, int]:
+    por_classe: Dict[str, int] = defaultdict(int)
+    for event in events:
+        por_classe[event[2]] += 1
+    return dict(por_classe)
+
+
+class _SegmentProgress:
+    """Progress manager stand-in used inside worker processes."""
+
+    def __init__(self, shared: Any, index: int, cancel_event: Any):
+        self.shared = shared
+        self.index = index
+        self.cancel_event = cancel_event
+
+    def atualizar(
+        self, video_name: str, frame_atual: int, total: int, **_: Any
+    ) -> bool:
+        self.shared[self.index] = (frame_atual, total)
+        return not self.cancel_event.is_set()
+
+    def status(self, video_name: str) -> Dict[str, Any]:
+        return {"cancelado": self.cancel_event.is_set()}
+
+    def update_status_message(self, video_name: str, message: str) -> None:
+        pass
+
+    def erro(self, video_name: str, mensagem: str) -> None:
+        self.shared[f"erro_{self.index}"] = mensagem
+
+
+def _process_segment(
+    video_path: str,
+    video_name: str,
+    segment: Segment,
+    shared: Any,
+    cancel_event: Any,
+    options: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    from utils.contagem_video import contar_gado_em_video
+
+    return contar_gado_em_video(
+        video_path,
+        video_name,
+        _SegmentProgress(shared, segment.index, cancel_event),
+        trim_start_ms=int(segment.read_start_ms),
+        trim_end_ms=int(round(segment.core_end_ms)),
+        segment=segment,
+        **options,
+    )
+
+
+def run_segments(
+    video_path: str,
+    video_name: str,
+    progresso_manager: Any,
+    segments: Sequence[Segment],
+    options: Dict[str, Any],
+    max_gap: int = 0,
+    cancel_callback: Optional[Any] = None,
+) -> Optional[Dict[str, Any]]:
+    """Count ``segments`` in a process pool and stitch the results.
+
+    Conta os segmentos em um pool de processos e une os resultados.
+
+    Retorno / Returns:
+        dict | None: ``total_count``, ``por_classe``, ``events`` (eventos
+        contados / counted events) e ``segments`` (tempo por segmento), ou
+        ``None`` em caso de erro ou cancelamento.
+        ``None`` on error or cancellation.
+    """
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager, ProcessPoolExecutor(
+        max_workers=len(segments), mp_context=ctx
+    ) as executor:
+        shared = manager.dict()
+        cancel_event = manager.Event()
+        started = time.perf_counter()
+        futures = [
+            executor.submit(
+                _process_segment,
+                video_path,
+                video_name,
+                segment,
+                shared,
+                cancel_event,
+                options,
+            )
+            for segment in segments
+        ]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(
+                pending, timeout=_POLL_SECONDS, return_when=FIRST_EXCEPTION
+            )
+            if any(f.done() and f.exception() for f in futures):
+                cancel_event.set()
+                break
+            progress = [v for k, v in shared.items() if isinstance(k, int)]
+            cancelado = (
+                cancel_callback()
+                if cancel_callback
+                else progresso_manager.status(video_name).get("cancelado")
+            )
+            if cancelado or not progresso_manager.atualizar(
+                video_name,
+                sum(frame for frame, _ in progress),
+                sum(total for _, total in progress),
+            ):
+                cancel_event.set()
+        wait(futures)
+        elapsed = time.perf_counter() - started
+        # The manager proxies stop working once the block exits.
+        cancelado = cancel_event.is_set()
+        erros = [v for k, v in shared.items() if isinstance(k, str)]
+
+    for future in futures:
+        if future.exception() is not None:
+            raise future.exception()
+    results = [future.result() for future in futures]
+    if cancelado or any(r is None for r in results):
+        if erros and progresso_manager:
+            progresso_manager.erro(video_name, erros[0])
+        return None
+
+    events = stitched_events([r["segment"] for r in results], max_gap)
+    total, por_classe = len(events), _count_by_class(events)
+    logger.info(
+        "[SEGMENTOS] %s: %s segmentos em %.1fs, contagem %s",
+        video_name,
+        len(segments),
+        elapsed,
+        total,
+    )
+    return {
+        "total_count": total,
+        "por_classe": por_classe,
+        "events": events,
+        "segments": [
+            {
+                "index": r["segment"]["index"],
+                "core_ms": [seg.core_start_ms, seg.core_end_ms],
+                "frames": r["total_frames"],
+                "events": len(r["segment"]["events"]),
+            }
+            for seg, r in zip(segments, results)
+        ],
+        "elapsed_seconds": round(elapsed, 3),
+    }
@@ -0,0 +1,476 @@
+"""Frame-to-detections adapters used by the counting loop.
+
+Adaptadores que convertem frames em detecções rastreadas.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.line_counter import LINE_HORIZONTAL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONF = 0.3
+DEFAULT_TRACKER_CFG = "botsort.yaml"
+TRACKER_BOTSORT = "botsort"
+TRACKER_IOU = "iou"
+TRACKERS = (TRACKER_BOTSORT, TRACKER_IOU)
+IMGSZ_STRIDE = 32
+# Band around the line watched when no ROI band is configured.
+DEFAULT_BAND_RATIO = 0.5
+DEFAULT_TILE_OVERLAP = 0.2
+DEFAULT_NMS_IOU = 0.5
+
+
+@dataclass
+class FrameDetections:
+    """Tracked detections of one frame / Detecções rastreadas de um frame.
+
+    English:
+        ``boxes`` holds ``(N, 4)`` ``xyxy`` coordinates; ``track_ids``,
+        ``classes`` and ``confidences`` hold one value per box.
+
+    Português:
+        ``boxes`` contém coordenadas ``xyxy`` ``(N, 4)``; os demais arrays têm
+        um valor por caixa.
+    """
+
+    boxes: np.ndarray
+    track_ids: np.ndarray
+    classes: np.ndarray
+    confidences: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.track_ids.shape[0])
+
+    @classmethod
+    def empty(cls) -> "FrameDetections":
+        return cls(
+            boxes=np.zeros((0, 4), dtype=np.float32),
+            track_ids=np.zeros(0, dtype=np.int64),
+            classes=np.zeros(0, dtype=np.int64),
+            confidences=np.zeros(0, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_result(cls, result: Any) -> "FrameDetections":
+        """Build from an Ultralytics ``Results`` produced by ``track``."""
+
+        boxes = result.boxes
+        if boxes is None or boxes.id is None:
+            return cls.empty()
+        return cls(
+            boxes=boxes.xyxy.cpu().numpy().astype(np.float32, copy=False),
+            track_ids=boxes.id.cpu().numpy().astype(np.int64),
+            classes=boxes.cls.cpu().numpy().astype(np.int64),
+            confidences=boxes.conf.cpu().numpy().astype(np.float32, copy=False),
+        )
+
+    @classmethod
+    def from_tracks(cls, tracks: np.ndarray) -> "FrameDetections":
+        """Build from the ``(x1, y1, x2, y2, id, score, cls, idx)`` tracker output."""
+
+        if tracks is None or len(tracks) == 0:
+            return cls.empty()
+        tracks = np.asarray(tracks)
+        return cls(
+            boxes=tracks[:, :4].astype(np.float32),
+            track_ids=tracks[:, 4].astype(np.int64),
+            classes=tracks[:, 6].astype(np.int64),
+            confidences=tracks[:, 5].astype(np.float32),
+        )
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of ``(N, 4)`` and ``(M, 4)`` ``xyxy`` boxes."""
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression; returns kept indices by score."""
+
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if order.size == 1:
+            break
+        overlap = box_iou(boxes[best : best + 1], boxes[order[1:]])[0]
+        order = order[1:][overlap <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def batched_nms(
+    boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_threshold: float
+) -> np.ndarray:
+    """Class-aware NMS: boxes of different classes never suppress each other."""
+
+    keep = [
+        np.flatnonzero(classes == cls)[
+            nms(boxes[classes == cls], scores[classes == cls], iou_threshold)
+        ]
+        for cls in np.unique(classes)
+    ]
+    if not keep:
+        return np.zeros(0, dtype=np.int64)
+    merged = np.concatenate(keep)
+    return merged[np.argsort(-scores[merged], kind="stable")]
+
+
+class ModelTrackDetector:
+    """Per-frame ``model.track(persist=True)`` (the original code path)."""
+
+    def __init__(self, model: Any, imgsz: int, conf: float = DEFAULT_CONF):
+        self.model = model
+        self.imgsz = imgsz
+        self.conf = conf
+
+    def __call__(self, frames: Sequence[np.ndarray]) -> List[FrameDetections]:
+        detections = []
+        for frame in frames:
+            results = self.model.track(
+                frame, persist=True, verbose=False, conf=self.conf, imgsz=self.imgsz
+            )
+            detections.append(FrameDetections.from_result(results[0]))
+        return detections
+
+
+def create_ultralytics_tracker(tracker_cfg: str = DEFAULT_TRACKER_CFG) -> Any:
+    """Instantiate the tracker ``model.track`` would use for ``tracker_cfg``."""
+
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+
+    try:
+        from ultralytics.utils import YAML
+
+        cfg_dict = YAML.load(check_yaml(tracker_cfg))
+    except ImportError:  # pragma: no cover - older Ultralytics releases
+        from ultralytics.utils import yaml_load
+
+        cfg_dict = yaml_load(check_yaml(tracker_cfg))
+    cfg = IterableSimpleNamespace(**cfg_dict)
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=30)
+
+
+def tracker_choice(tracker: Optional[str] = None) -> str:
+    """Return the configured tracker (``TRACKER``) / Retorna o rastreador."""
+
+    tracker = (tracker or os.getenv("TRACKER") or TRACKER_BOTSORT).lower()
+    if tracker not in TRACKERS:
+        logger.warning("[TRACKER] TRACKER=%s desconhecido; usando botsort", tracker)
+        return TRACKER_BOTSORT
+    return tracker
+
+
+def create_tracker(tracker: str = TRACKER_BOTSORT) -> Any:
+    """Instantiate ``tracker`` (``"botsort"`` or ``"iou"``)."""
+
+    if tracker == TRACKER_IOU:
+        from utils.iou_tracker import IoUTracker
+
+        return IoUTracker()
+    return create_ultralytics_tracker()
+
+
+class BatchedTrackDetector:
+    """Detect ``N`` frames in one forward pass, then track them in order.
+
+    English:
+        Mirrors what Ultralytics does inside ``model.track``: detections of
+        every frame are fed to the same tracker instance, in frame order,
+        including frames without detections, which age the lost tracks.
+
+    Português:
+        Reproduz o ``model.track``: as detecções de cada frame alimentam o
+        mesmo tracker, na ordem dos frames, inclusive frames sem detecções,
+        que envelhecem as trilhas perdidas.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        imgsz: int,
+        conf: float = DEFAULT_CONF,
+        tracker: Any = None,
+    ):
+        self.model = model
+        self.imgsz = imgsz
+        self.conf = conf
+        self.tracker = tracker if tracker is not None else create_ultralytics_tracker()
+
+    def __call__(self, frames: Sequence[np.ndarray]) -> List[FrameDetections]:
+        if not frames:
+            return []
+        results = self.model.predict(
+            list(frames), verbose=False, conf=self.conf, imgsz=self.imgsz
+        )
+        detections = []
+        for frame, result in zip(frames, results):
+            if result.boxes is None:
+                detections.append(FrameDetections.empty())
+                continue
+            # Empty frames still reach the tracker, as in ``model.track``.
+            tracks = self.tracker.update(result.boxes.cpu().numpy(), frame)
+            detections.append(FrameDetections.from_tracks(tracks))
+        return detections
+
+
+def line_band(line_ratio: float, band_ratio: float) -> Tuple[float, float]:
+    """Return the ``(start, end)`` fractions of a band centred on the line.
+
+    English:
+        ``band_ratio`` is the band thickness as a fraction of the frame
+        dimension perpendicular to the line; it should cover the largest
+        expected animal so that its centroid is tracked on both sides.
+
+    Português:
+        ``band_ratio`` é a espessura da faixa como fração da dimensão
+        perpendicular à linha; deve cobrir o maior animal esperado.
+    """
+
+    half = min(max(float(band_ratio), 0.0), 1.0) / 2
+    start = min(max(line_ratio - half, 0.0), 1.0)
+    end = min(max(line_ratio + half, 0.0), 1.0)
+    return start, end
+
+
+def roi_imgsz(
+    imgsz: int,
+    width: int,
+    height: int,
+    line_type: str,
+    band: Tuple[float, float],
+) -> int:
+    """Image size keeping the full-frame resolution inside the band.
+
+    Tamanho de imagem que mantém, na faixa, a resolução do frame inteiro.
+    """
+
+    thickness = band[1] - band[0]
+    if line_type == LINE_HORIZONTAL:
+        crop_w, crop_h = width, height * thickness
+    else:
+        crop_w, crop_h = width * thickness, height
+    size = imgsz * max(crop_w, crop_h) / max(width, height, 1)
+    return max(int(math.ceil(size / IMGSZ_STRIDE)) * IMGSZ_STRIDE, IMGSZ_STRIDE)
+
+
+def crop_band(
+    frame: np.ndarray, line_type: str, band: Tuple[float, float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the band view of ``frame`` and its ``xyxy`` offset."""
+
+    axis = 0 if line_type == LINE_HORIZONTAL else 1
+    size = frame.shape[axis]
+    start = min(int(size * band[0]), size - 1)
+    end = max(int(math.ceil(size * band[1])), start + 1)
+    if axis == 0:
+        crop, offset = frame[start:end], (0, start, 0, start)
+    else:
+        crop, offset = frame[:, start:end], (start, 0, start, 0)
+    return crop, np.asarray(offset, dtype=np.float32)
+
+
+class RoiBandDetector:
+    """Run ``detector`` on a band around the counting line only.
+
+    English:
+        Frames are cropped to ``band`` (fractions along the axis
+        perpendicular to the line) before detection and tracking; returned
+        boxes are shifted back to full-frame coordinates, so counting and
+        annotation are unchanged.
+
+    Português:
+        Os frames são recortados na faixa antes da detecção e do
+        rastreamento; as caixas retornam em coordenadas do frame inteiro.
+    """
+
+    def __init__(self, detector: Any, line_type: str, band: Tuple[float, float]):
+        self.detector = detector
+        self.line_type = line_type
+        self.band = band
+
+    def __call__(self, frames: Sequence[np.ndarray]) -> List[FrameDetections]:
+        crops, offsets = [], []
+        for frame in frames:
+            crop, offset = crop_band(frame, self.line_type, self.band)
+            crops.append(np.ascontiguousarray(crop))
+            offsets.append(offset)
+        detections = self.detector(crops)
+        for det, offset in zip(detections, offsets):
+            if len(det):
+                det.boxes = det.boxes + offset
+        return detections
+
+
+def _axis_starts(lo: int, hi: int, size: int, limit: int, overlap: float) -> List[int]:
+    if hi - lo <= size:
+        center = (lo + hi) // 2
+        return [min(max(center - size // 2, 0), limit - size)]
+    stride = max(int(size * (1 - overlap)), 1)
+    starts = list(range(lo, hi - size, stride))
+    starts.append(hi - size)
+    return starts
+
+
+def tile_grid(
+    width: int,
+    height: int,
+    tile_size: int,
+    overlap: float = DEFAULT_TILE_OVERLAP,
+    region: Optional[Tuple[int, int, int, int]] = None,
+) -> List[Tuple[int, int, int, int]]:
+    """Overlapping ``xyxy`` tiles covering ``region`` (default: whole frame).
+
+    English:
+        Tiles are ``tile_size`` square (smaller only when the frame is) and
+        consecutive tiles share ``overlap`` of their side, so an animal cut
+        by one tile border is whole in the neighbour tile.
+
+    Português:
+        Blocos quadrados de ``tile_size`` que se sobrepõem em ``overlap`` do
+        lado, cobrindo ``region``.
+    """
+
+    x0, y0, x1, y1 = region or (0, 0, width, height)
+    tile_w, tile_h = min(tile_size, width), min(tile_size, height)
+    xs = _axis_starts(x0, x1, tile_w, width, overlap)
+    ys = _axis_starts(y0, y1, tile_h, height, overlap)
+    return [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs]
+
+
+def _ultralytics_boxes(data: np.ndarray, shape: Tuple[int, int]) -> Any:
+    from ultralytics.engine.results import Boxes
+
+    return Boxes(data, shape)
+
+
+class TiledTrackDetector(BatchedTrackDetector):
+    """Detect on overlapping tiles near the line, merge, then track.
+
+    English:
+        Every frame is cut into ``imgsz`` tiles (see :func:`tile_grid`),
+        restricted to the tiles that intersect ``band`` around the counting
+        line, and analysed at native resolution. All tiles of the batch go
+        through one ``predict`` call; detections are shifted back to frame
+        coordinates, merged with class-aware NMS across tiles and fed to the
+        tracker in frame order, like :class:`BatchedTrackDetector`.
+
+    Português:
+        Cada frame é dividido em blocos de ``imgsz`` que cruzam a faixa da
+        linha, analisados na resolução nativa em uma única chamada
+        ``predict``; as detecções são unidas com NMS entre blocos antes do
+        rastreamento.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        imgsz: int,
+        line_type: str = LINE_HORIZONTAL,
+        band: Tuple[float, float] = (0.0, 1.0),
+        overlap: float = DEFAULT_TILE_OVERLAP,
+        conf: float = DEFAULT_CONF,
+        iou: float = DEFAULT_NMS_IOU,
+        tracker: Any = None,
+        boxes_factory: Any = None,
+    ):
+        super().__init__(model, imgsz, conf, tracker)
+        self.line_type = line_type
+        self.band = band
+        self.overlap = overlap
+        self.iou = iou
+        self.boxes_factory = boxes_factory or _ultralytics_boxes
+        self._grids: dict = {}
+
+    def grid(self, height: int, width: int) -> List[Tuple[int, int, int, int]]:
+        key = (height, width)
+        if key not in self._grids:
+            if self.line_type == LINE_HORIZONTAL:
+                region = (
+                    0,
+                    int(height * self.band[0]),
+                    width,
+                    int(math.ceil(height * self.band[1])),
+                )
+            else:
+                region = (
+                    int(width * self.band[0]),
+                    0,
+                    int(math.ceil(width * self.band[1])),
+                    height,
+                )
+            self._grids[key] = tile_grid(
+                width, height, self.imgsz, self.overlap, region
+            )
+        return self._grids[key]
+
+    def __call__(self, frames: Sequence[np.ndarray]) -> List[FrameDetections]:
+        if not frames:
+            return []
+        tiles, owners = [], []
+        for index, frame in enumerate(frames):
+            for x0, y0, x1, y1 in self.grid(*frame.shape[:2]):
+                tiles.append(np.ascontiguousarray(frame[y0:y1, x0:x1]))
+                owners.append((index, x0, y0))
+        results = self.model.predict(
+            tiles, verbose=False, conf=self.conf, imgsz=self.imgsz
+        )
+        per_frame: List[List[np.ndarray]] = [[] for _ in frames]
+        for (index, x0, y0), result in zip(owners, results):
+            if result.boxes is None:
+                continue
+            data = np.array(result.boxes.cpu().numpy().data, dtype=np.float32)
+            if len(data) == 0:
+                continue
+            data[:, [0, 2]] += x0
+            data[:, [1, 3]] += y0
+            per_frame[index].append(data[:, :6])
+
+        detections = []
+        for frame, parts in zip(frames, per_frame):
+            if parts:
+                data = np.concatenate(parts)
+                keep = batched_nms(data[:, :4], data[:, 4], data[:, 5], self.iou)
+                data = data[keep]
+            else:
+                data = np.zeros((0, 6), dtype=np.float32)
+            det = self.boxes_factory(data, frame.shape[:2])
+            tracks = self.tracker.update(det, frame)
+            detections.append(FrameDetections.from_tracks(tracks))
+        return detections
+
+
+def create_frame_detector(
+    model: Any, imgsz: int, batch_size: int = 1, tracker: str = TRACKER_BOTSORT
+) -> Any:
+    """Return the detector for ``batch_size`` / Retorna o detector adequado.
+
+    The IoU tracker always runs on ``model.predict`` detections.
+    O rastreador IoU sempre usa as detecções de ``model.predict``.
+    """
+
+    if tracker == TRACKER_IOU:
+        return BatchedTrackDetector(model, imgsz, tracker=create_tracker(tracker))
+    if batch_size <= 1:
+        return ModelTrackDetector(model, imgsz)
+    return BatchedTrackDetector(model, imgsz)
@@ -0,0 +1,637 @@
+"""Frame sources with timestamp-based trimming.
+
+Fontes de frames com corte baseado em timestamps do container.
+
+English:
+    Every source mimics the subset of ``cv2.VideoCapture`` used by the
+    counting pipeline (``isOpened``/``grab``/``read``/``release``) and stops
+    returning frames once the presentation timestamp passes ``end_ms``.
+    ``start_ms`` is reached by seeking to the closest keyframe before it and
+    decoding forward only up to the exact start timestamp.
+
+Português:
+    Todas as fontes imitam a parte de ``cv2.VideoCapture`` usada pelo pipeline
+    e param de entregar frames quando o timestamp de apresentação passa de
+    ``end_ms``. O início é alcançado buscando o keyframe anterior mais próximo
+    e decodificando somente até o timestamp exato.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from utils.env import get_env_float, get_env_int
+from utils.media_probe import probe_media
+
+logger = logging.getLogger(__name__)
+
+# Frames whose timestamp is within this tolerance of ``start_ms`` are kept.
+_START_TOLERANCE_MS = 0.5
+
+
+class OpenCVFrameSource:
+    """``cv2.VideoCapture`` seeking by ``CAP_PROP_POS_MSEC``."""
+
+    backend = "opencv"
+
+    def __init__(
+        self,
+        video_path: str,
+        start_ms: Optional[float] = None,
+        end_ms: Optional[float] = None,
+    ):
+        self.cap = cv2.VideoCapture(video_path)
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.timestamp_ms: Optional[float] = None
+        self.fps = float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        if start_ms and self.cap.isOpened():
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, float(start_ms))
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def _within_range(self) -> bool:
+        self.timestamp_ms = float(self.cap.get(cv2.CAP_PROP_POS_MSEC) or 0.0)
+        return self.end_ms is None or self.timestamp_ms <= self.end_ms
+
+    def grab(self) -> bool:
+        return bool(self.cap.grab()) and self._within_range()
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        # Checks the timestamp before decoding so the frame past the end is
+        # never converted.
+        if not self.grab():
+            return False, None
+        return self.cap.retrieve()
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class PyAVFrameSource:
+    """PyAV decoder with keyframe seek and exact start/end timestamps.
+
+    English:
+        Skipped frames (``grab``) are still decoded by the codec, which inter
+        frames require, but never converted to BGR.
+
+    Português:
+        Frames pulados (``grab``) ainda passam pelo codec, mas nunca são
+        convertidos para BGR.
+    """
+
+    backend = "pyav"
+
+    def __init__(
+        self,
+        video_path: str,
+        start_ms: Optional[float] = None,
+        end_ms: Optional[float] = None,
+    ):
+        import av
+
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.timestamp_ms: Optional[float] = None
+        self.container = av.open(video_path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 0.0
+        self.frame_count = int(self.stream.frames or 0)
+        self.width = int(self.stream.codec_context.width or 0)
+        self.height = int(self.stream.codec_context.height or 0)
+        self._time_base = float(self.stream.time_base)
+        self._start_pts = self.stream.start_time or 0
+        if start_ms:
+            target_pts = self._start_pts + int(start_ms / 1000.0 / self._time_base)
+            # backward=True lands on the closest keyframe at or before target.
+            self.container.seek(
+                target_pts, stream=self.stream, backward=True, any_frame=False
+            )
+        self._frames = self.container.decode(self.stream)
+        self._opened = True
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def _next_frame(self) -> Any:
+        for frame in self._frames:
+            if frame.pts is None:
+                continue
+            timestamp_ms = (frame.pts - self._start_pts) * self._time_base * 1000.0
+            if self.start_ms and timestamp_ms < self.start_ms - _START_TOLERANCE_MS:
+                continue
+            if self.end_ms is not None and timestamp_ms > self.end_ms:
+                return None
+            self.timestamp_ms = timestamp_ms
+            return frame
+        return None
+
+    def grab(self) -> bool:
+        return self._next_frame() is not None
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+        return True, frame.to_ndarray(format="bgr24")
+
+    def release(self) -> None:
+        if self._opened:
+            self.container.close()
+            self._opened = False
+
+
+def _probe_stream(video_path: str) -> Dict[str, Any]:
+    media = probe_media(video_path)
+    if media is None:
+        raise RuntimeError(f"ffprobe falhou para {video_path}")
+    return media
+
+
+def _even(value: float) -> int:
+    return max(int(round(value / 2.0)) * 2, 2)
+
+
+_PTS_TIME = re.compile(rb"pts_time:\s*(-?[0-9.]+)")
+# Upper bound to wait for the ``showinfo`` line of a frame already read.
+_PTS_TIMEOUT_S = 1.0
+# Upper bound to wait for ffmpeg to exit once it closed its output.
+_EXIT_TIMEOUT_S = 5.0
+# stderr lines kept to explain a failed ffmpeg run.
+_STDERR_TAIL_LINES = 10
+
+
+class FFmpegPipeFrameSource:
+    """Raw ``bgr24`` frames streamed from an ``ffmpeg`` subprocess.
+
+    English:
+        Rotation, downscaling to ``target_size`` (longest side) and frame
+        dropping (``select`` filter for ``frame_skip``) all happen inside
+        ffmpeg. Frames are read with ``readinto`` into a ring of
+        ``ring_size`` preallocated buffers, so no per-frame allocation or copy
+        happens; ``ring_size`` must exceed the number of frames in flight in
+        the pipeline. ``scale`` maps output coordinates back to the
+        original-resolution, rotated frame. ``timestamp_ms`` is the real
+        presentation time of each frame, read from the ``showinfo`` filter on
+        ffmpeg's stderr, so variable frame rate (phone) videos keep correct
+        times. If a ``showinfo`` line is late, the rest of the stream
+        switches to ``index / fps`` so later frames never get the timestamp
+        of an earlier one. ``read`` raises ``RuntimeError`` when ffmpeg exits
+        with an error before producing any frame.
+
+    Português:
+        Rotação, redução para ``target_size`` e descarte de frames ocorrem no
+        ffmpeg. Os frames são lidos com ``readinto`` em buffers
+        pré-alocados; ``scale`` converte coordenadas para a resolução
+        original. ``timestamp_ms`` vem do pts real (filtro ``showinfo``),
+        correto também para vídeos com taxa de frames variável; se uma linha
+        atrasar, o resto do vídeo usa ``índice / fps``. ``read`` levanta
+        ``RuntimeError`` quando o ffmpeg falha antes do primeiro frame.
+    """
+
+    backend = "ffmpeg"
+    applies_rotation = True
+
+    def __init__(
+        self,
+        video_path: str,
+        start_ms: Optional[float] = None,
+        end_ms: Optional[float] = None,
+        rotation: int = 0,
+        target_size: Optional[int] = None,
+        frame_skip: int = 1,
+        ring_size: int = 32,
+        target_fps: Optional[float] = None,
+    ):
+        info = _probe_stream(video_path)
+        self.width, self.height = info["width"], info["height"]
+        self.fps = info["fps"]
+        self.frame_count = info["frame_count"]
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        if target_fps and self.fps:
+            frame_skip = round(self.fps / target_fps)
+        self.frame_skip = max(int(frame_skip), 1)
+        # Frames dropped by ffmpeg never reach the pipe; callers advance their
+        # frame index by ``frame_step`` per ``read`` instead of calling ``grab``.
+        self.frame_step = self.frame_skip
+        self.timestamp_ms: Optional[float] = None
+
+        display_w, display_h = self.width, self.height
+        if rotation in (90, 270):
+            display_w, display_h = display_h, display_w
+        ratio = 1.0
+        if target_size and max(display_w, display_h) > target_size:
+            ratio = target_size / float(max(display_w, display_h))
+        self.output_width = _even(display_w * ratio)
+        self.output_height = _even(display_h * ratio)
+        self.scale = display_w / float(self.output_width) if display_w else 1.0
+
+        filters = []
+        if rotation == 90:
+            filters.append("transpose=1")
+        elif rotation == 180:
+            filters.append("hflip,vflip")
+        elif rotation == 270:
+            filters.append("transpose=2")
+        if self.frame_skip > 1:
+            filters.append(f"select=not(mod(n\\,{self.frame_skip}))")
+        filters.append("showinfo")
+        filters.append(
+            f"scale={self.output_width}:{self.output_height}:flags=bilinear"
+        )
+
+        # ``info`` level is needed for the ``showinfo`` lines.
+        cmd = ["ffmpeg", "-v", "info", "-hide_banner", "-nostats", "-nostdin"]
+        cmd += ["-noautorotate"]
+        if start_ms:
+            cmd += ["-ss", f"{start_ms / 1000.0:.3f}"]
+        cmd += ["-i", video_path]
+        if end_ms is not None:
+            cmd += ["-t", f"{max(end_ms - (start_ms or 0), 0) / 1000.0:.3f}"]
+        cmd += [
+            "-vf",
+            ",".join(filters),
+            "-vsync",
+            "passthrough",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "pipe:1",
+        ]
+        self.proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self._pts: "queue.Queue[float]" = queue.Queue()
+        self._index_timing = False
+        self._stderr_tail: "deque[str]" = deque(maxlen=_STDERR_TAIL_LINES)
+        self._pts_reader = threading.Thread(
+            target=self._read_pts, name="ffmpeg-pts", daemon=True
+        )
+        self._pts_reader.start()
+        shape = (self.output_height, self.output_width, 3)
+        self._frame_bytes = shape[0] * shape[1] * 3
+        self._ring = [np.empty(shape, dtype=np.uint8) for _ in range(max(ring_size, 2))]
+        self._views = [memoryview(buf).cast("B") for buf in self._ring]
+        self._next_slot = 0
+        self._emitted = 0
+        self._eof = False
+
+    def isOpened(self) -> bool:
+        returncode = self.proc.poll()
+        if returncode and not self._emitted:
+            # ffmpeg gave up before the first frame (bad input or filter).
+            return False
+        return returncode is None or not self._eof
+
+    def _read_pts(self) -> None:
+        # Also drains stderr so ffmpeg never blocks on a full pipe.
+        try:
+            for line in self.proc.stderr:
+                match = _PTS_TIME.search(line)
+                if match:
+                    self._pts.put(float(match.group(1)) * 1000.0)
+                elif line.strip():
+                    self._stderr_tail.append(line.decode("utf-8", "replace").strip())
+        except (OSError, ValueError):
+            # ``release`` closed stderr before the reader finished.
+            pass
+
+    def _next_timestamp(self) -> float:
+        start = self.start_ms or 0
+        if not self._index_timing:
+            try:
+                return start + self._pts.get(timeout=_PTS_TIMEOUT_S)
+            except queue.Empty:
+                # The late pts would pair every later frame with the previous one.
+                self._index_timing = True
+                logger.warning(
+                    "[DECODER] pts do ffmpeg atrasado no frame %s; usando índice/fps.",
+                    self._emitted,
+                )
+        fps = self.fps or 30.0
+        return start + self._emitted * self.frame_skip * 1000.0 / fps
+
+    def _finish(self) -> None:
+        self._eof = True
+        try:
+            returncode = self.proc.wait(timeout=_EXIT_TIMEOUT_S)
+        except subprocess.TimeoutExpired:
+            return
+        if not returncode:
+            return
+        self._pts_reader.join(timeout=_PTS_TIMEOUT_S)
+        detalhe = " | ".join(self._stderr_tail) or f"código {returncode}"
+        if not self._emitted:
+            raise RuntimeError(f"ffmpeg falhou antes do primeiro frame: {detalhe}")
+        logger.warning(
+            "[DECODER] ffmpeg terminou com código %s após %s frames: %s",
+            returncode,
+            self._emitted,
+            detalhe,
+        )
+
+    def _fill(self, view: memoryview) -> bool:
+        filled = 0
+        while filled < self._frame_bytes:
+            count = self.proc.stdout.readinto(view[filled:])
+            if not count:
+                self._finish()
+                return False
+            filled += count
+        return True
+
+    def grab(self) -> bool:
+        if self._eof or not self._fill(self._views[self._next_slot]):
+            return False
+        self.timestamp_ms = self._next_timestamp()
+        self._emitted += 1
+        return True
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self._eof:
+            return False, None
+        slot = self._next_slot
+        if not self._fill(self._views[slot]):
+            return False, None
+        self._next_slot = (slot + 1) % len(self._ring)
+        self.timestamp_ms = self._next_timestamp()
+        self._emitted += 1
+        return True, self._ring[slot]
+
+    def release(self) -> None:
+        self._eof = True
+        if self.proc.poll() is None:
+            self.proc.kill()
+        if self.proc.stdout:
+            self.proc.stdout.close()
+        self.proc.wait()
+        self._pts_reader.join(timeout=_PTS_TIMEOUT_S)
+        if self.proc.stderr:
+            self.proc.stderr.close()
+
+
+def _pyav_available() -> bool:
+    try:
+        import av  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def open_frame_source(
+    video_path: str,
+    start_ms: Optional[float] = None,
+    end_ms: Optional[float] = None,
+    backend: Optional[str] = None,
+    **ffmpeg_options: Any,
+) -> Any:
+    """Open a frame source / Abre uma fonte de frames.
+
+    English:
+        ``backend`` (or ``VIDEO_DECODER``) may be ``"opencv"``, ``"pyav"``,
+        ``"ffmpeg"`` or ``"auto"`` (PyAV when installed, OpenCV otherwise).
+        ``ffmpeg_options`` are forwarded to :class:`FFmpegPipeFrameSource`. A
+        source that fails to open falls back to OpenCV.
+
+    Português:
+        ``backend`` (ou ``VIDEO_DECODER``) pode ser ``"opencv"``, ``"pyav"``,
+        ``"ffmpeg"`` ou ``"auto"`` (PyAV quando instalado, senão OpenCV).
+    """
+
+    backend = (backend or os.getenv("VIDEO_DECODER", "auto")).lower()
+    if backend == "auto":
+        backend = "pyav" if _pyav_available() else "opencv"
+    start = time.perf_counter()
+    source = None
+    if backend == "ffmpeg":
+        try:
+            source = FFmpegPipeFrameSource(
+                video_path, start_ms, end_ms, **ffmpeg_options
+            )
+        except Exception as exc:
+            logger.warning("[DECODER] ffmpeg indisponível (%s). Usando OpenCV.", exc)
+    elif backend == "pyav":
+        try:
+            source = PyAVFrameSource(video_path, start_ms, end_ms)
+        except Exception as exc:
+            logger.warning("[DECODER] PyAV indisponível (%s). Usando OpenCV.", exc)
+    if source is None:
+        source = OpenCVFrameSource(video_path, start_ms, end_ms)
+    logger.info(
+        "[DECODER] %s aberto em %.1f ms (início=%s ms)",
+        source.backend,
+        (time.perf_counter() - start) * 1000,
+        start_ms,
+    )
+    return source
+
+
+class OpenCVVideoSink:
+    """``cv2.VideoWriter`` with the ``mp4v`` codec (original behavior)."""
+
+    backend = "opencv"
+
+    def __init__(self, output_path: str, fps: float, size: Tuple[int, int]):
+        self.output_path = output_path
+        self.encode_seconds = 0.0
+        self.writer = cv2.VideoWriter(
+            output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size
+        )
+
+    def isOpened(self) -> bool:
+        return self.writer.isOpened()
+
+    def write(self, frame: np.ndarray) -> None:
+        start = time.perf_counter()
+        self.writer.write(frame)
+        self.encode_seconds += time.perf_counter() - start
+
+    def release(self) -> None:
+        start = time.perf_counter()
+        self.writer.release()
+        self.encode_seconds += time.perf_counter() - start
+
+
+class FFmpegVideoSink:
+    """Annotated frames piped into an ``ffmpeg`` libx264 process.
+
+    English:
+        Writes a faststart MP4 (``moov`` atom first) so playback can begin
+        before the download finishes. ``max_size`` limits the longest side of
+        the output and ``output_fps`` resamples the frame rate; both default to
+        the input values.
+
+    Português:
+        Gera MP4 com faststart para reprodução progressiva. ``max_size``
+        limita o maior lado da saída e ``output_fps`` altera a taxa de frames.
+    """
+
+    backend = "ffmpeg"
+    extension = ".mp4"
+
+    def __init__(
+        self,
+        output_path: str,
+        fps: float,
+        size: Tuple[int, int],
+        preset: str = "veryfast",
+        crf: int = 28,
+        max_size: Optional[int] = None,
+        output_fps: Optional[float] = None,
+    ):
+        self.output_path = output_path
+        self.size = size
+        self.encode_seconds = 0.0
+        width, height = size
+        cmd = [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            f"{fps:.6f}",
+            "-i",
+            "pipe:0",
+        ]
+        if max_size and max(width, height) > max_size:
+            ratio = max_size / float(max(width, height))
+            cmd += ["-vf", f"scale={_even(width * ratio)}:{_even(height * ratio)}"]
+        elif width % 2 or height % 2:
+            cmd += ["-vf", f"scale={_even(width)}:{_even(height)}"]
+        if output_fps:
+            cmd += ["-r", f"{output_fps:.6f}"]
+        cmd += [
+            "-c:v",
+            "libx264",
+            "-preset",
+            preset,
+            "-crf",
+            str(crf),
+            "-pix_fmt",
+            "yuv420p",
+            "-movflags",
+            "+faststart",
+            output_path,
+        ]
+        # A pipe nobody reads until ``release`` could fill up and stall the
+        # encoder; a temporary file keeps the messages for the error report.
+        self._stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stderr=self._stderr
+        )
+
+    def isOpened(self) -> bool:
+        return self.proc.poll() is None
+
+    def write(self, frame: np.ndarray) -> None:
+        start = time.perf_counter()
+        self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        self.encode_seconds += time.perf_counter() - start
+
+    def release(self) -> None:
+        start = time.perf_counter()
+        if self.proc.stdin and not self.proc.stdin.closed:
+            self.proc.stdin.close()
+        returncode = self.proc.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read()
+        self._stderr.close()
+        self.encode_seconds += time.perf_counter() - start
+        if returncode != 0:
+            raise IOError(
+                f"ffmpeg terminou com código {returncode}: "
+                f"{stderr.decode(errors='ignore').strip()}"
+            )
+
+
+def open_video_sink(
+    output_path: str,
+    fps: float,
+    size: Tuple[int, int],
+    backend: Optional[str] = None,
+) -> Any:
+    """Open the annotated-video encoder / Abre o codificador do vídeo anotado.
+
+    English:
+        ``backend`` (or ``VIDEO_ENCODER``) is ``"opencv"`` (``mp4v``) or
+        ``"ffmpeg"`` (libx264 tuned by ``X264_PRESET``, ``X264_CRF``,
+        ``ANNOTATED_MAX_SIZE`` and ``ANNOTATED_FPS``). The ffmpeg sink always
+        writes ``.mp4``, so ``output_path`` is adjusted; read the final path
+        from ``sink.output_path``.
+
+    Português:
+        ``backend`` (ou ``VIDEO_ENCODER``) é ``"opencv"`` ou ``"ffmpeg"``
+        (libx264). O sink ffmpeg sempre grava ``.mp4``.
+    """
+
+    backend = (backend or os.getenv("VIDEO_ENCODER", "opencv")).lower()
+    if backend == "ffmpeg":
+        base, _ = os.path.splitext(output_path)
+        return FFmpegVideoSink(
+            base + FFmpegVideoSink.extension,
+            fps,
+            size,
+            preset=os.getenv("X264_PRESET", "veryfast"),
+            crf=get_env_int("X264_CRF", 28),
+            max_size=get_env_int("ANNOTATED_MAX_SIZE", 0) or None,
+            output_fps=get_env_float("ANNOTATED_FPS", 0.0) or None,
+        )
+    return OpenCVVideoSink(output_path, fps, size)
+
+
+def concat_videos(parts: Sequence[str], output_path: str) -> str:
+    """Join ``parts`` into ``output_path`` without re-encoding.
+
+    English:
+        Uses the ffmpeg concat demuxer with stream copy (parts share codec,
+        size and frame rate). The parts are removed afterwards; a single part
+        is just renamed.
+
+    Português:
+        Une as partes com o demuxer concat do ffmpeg, sem recodificar, e
+        remove as partes.
+    """
+
+    if len(parts) == 1:
+        os.replace(parts[0], output_path)
+        return output_path
+    list_path = f"{output_path}.parts.txt"
+    with open(list_path, "w", encoding="utf-8") as handle:
+        for part in parts:
+            escaped = os.path.abspath(part).replace("'", "'\\''")
+            handle.write(f"file '{escaped}'\n")
+    cmd = ["ffmpeg", "-v", "error", "-y", "-f", "concat", "-safe", "0"]
+    cmd += ["-i", list_path, "-c", "copy", "-movflags", "+faststart", output_path]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    finally:
+        os.remove(list_path)
+    for part in parts:
+        os.remove(part)
+    return output_path
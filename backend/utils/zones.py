@@ -0,0 +1,350 @@
+"""Extra counting zones / Zonas de contagem adicionais.
+
+English:
+    Besides the N/E/S/W line of ``get_line_and_direction_config``, a job may
+    count on any number of line segments (diagonal or partial) and polygons.
+    Zones are given in coordinates normalised to the (rotated) frame and are
+    evaluated by :class:`ZoneCounter` against the same tracked detections as
+    the main :class:`utils.line_counter.LineCounter`, in the same decode pass.
+
+    * ``line``: two points and a direction ``N``, ``E``, ``S``, ``W`` (the
+      movement that counts, which must not be parallel to the segment) or
+      ``any``. A track counts when its centroid moves from one side of the
+      segment to the other through the segment itself.
+    * ``polygon``: three or more points and ``in`` (entering), ``out``
+      (leaving) or ``any``.
+
+    Each track is counted at most once per zone. The side tests of all lines
+    and the point-in-polygon tests of all polygons (padded to a common vertex
+    count) are single ``(tracks, zones)`` array operations, so adding zones
+    does not add Python loops per box.
+
+Português:
+    Além da linha N/E/S/W, o job pode contar em segmentos de reta (inclusive
+    diagonais) e polígonos, em coordenadas normalizadas do frame. Todas as
+    zonas são avaliadas sobre as mesmas detecções rastreadas, na mesma
+    passada, com operações vetorizadas ``(tracks, zonas)``; cada track conta
+    no máximo uma vez por zona.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from utils.line_counter import (
+    LINE_HORIZONTAL,
+    MOVE_BT,
+    MOVE_LR,
+    MOVE_RL,
+    MOVE_TB,
+    _contains,
+    box_centroids,
+)
+
+ZONE_LINE = "line"
+ZONE_POLYGON = "polygon"
+ANY_DIRECTION = "any"
+# Movement vectors in image coordinates (y grows downwards).
+LINE_DIRECTIONS = {"N": (0, -1), "E": (1, 0), "S": (0, 1), "W": (-1, 0)}
+POLYGON_DIRECTIONS = {"in": 1, "out": -1}
+_MOVE_TO_DIRECTION = {MOVE_TB: "S", MOVE_BT: "N", MOVE_LR: "E", MOVE_RL: "W"}
+
+_EMPTY_IDS = np.zeros(0, dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class Zone:
+    """A zone in pixel coordinates / Zona em pixels."""
+
+    name: str
+    kind: str
+    points: np.ndarray
+    direction: str
+
+
+def parse_zones(
+    specs: Optional[Sequence[Mapping[str, Any]]], width: int, height: int
+) -> List[Zone]:
+    """Validate zone specs and scale them to a ``width`` x ``height`` frame.
+
+    Parâmetros / Parameters:
+        specs (Sequence[dict]): Itens com ``type`` (``line``/``polygon``),
+            ``points`` normalizados em ``[0, 1]``, ``direction`` e ``name``
+            opcional. Items with ``type``, normalised ``points``,
+            ``direction`` and an optional ``name``.
+        width (int), height (int): Tamanho do frame. Frame size.
+
+    Retorno / Returns:
+        List[Zone]: Zonas em pixels. Zones in pixels.
+
+    Exceções / Exceptions:
+        ValueError: Zona inválida. Invalid zone.
+    """
+
+    zones: List[Zone] = []
+    for index, spec in enumerate(specs or []):
+        name = str(spec.get("name") or f"zona_{index + 1}")
+        kind = spec.get("type")
+        direction = spec.get("direction") or ANY_DIRECTION
+        points = np.asarray(spec.get("points") or [], dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 2:
+            raise ValueError(f"Zona '{name}': pontos devem ser pares [x, y].")
+        if ((points < 0) | (points > 1)).any():
+            raise ValueError(f"Zona '{name}': pontos devem estar entre 0 e 1.")
+        points = points * (width, height)
+        if kind == ZONE_LINE:
+            if len(points) != 2 or np.allclose(points[0], points[1]):
+                raise ValueError(f"Zona '{name}': linha exige dois pontos distintos.")
+            if direction != ANY_DIRECTION:
+                if direction not in LINE_DIRECTIONS:
+                    raise ValueError(f"Zona '{name}': direção inválida {direction}.")
+                if _line_sign(points, direction) == 0:
+                    raise ValueError(
+                        f"Zona '{name}': direção {direction} paralela à linha."
+                    )
+        elif kind == ZONE_POLYGON:
+            if len(points) < 3:
+                raise ValueError(f"Zona '{name}': polígono exige três pontos.")
+            if direction != ANY_DIRECTION and direction not in POLYGON_DIRECTIONS:
+                raise ValueError(f"Zona '{name}': direção inválida {direction}.")
+        else:
+            raise ValueError(f"Zona '{name}': tipo inválido {kind}.")
+        if any(zone.name == name for zone in zones):
+            raise ValueError(f"Zona '{name}' repetida.")
+        zones.append(Zone(name, kind, points, direction))
+    return zones
+
+
+def axis_line_zone(
+    name: str,
+    line_type: str,
+    direction: str,
+    line_coord: int,
+    width: int,
+    height: int,
+) -> Zone:
+    """Zone counting exactly like ``LineCounter(line_type, direction, ...)``.
+
+    The segment overshoots the frame on both ends, so every centroid is
+    within its extent, as with the unbounded line of ``LineCounter``.
+    """
+
+    if line_type == LINE_HORIZONTAL:
+        points = [[-width, line_coord], [2 * width, line_coord]]
+    else:
+        points = [[line_coord, -height], [line_coord, 2 * height]]
+    points = np.asarray(points, dtype=np.float64)
+    return Zone(name, ZONE_LINE, points, _MOVE_TO_DIRECTION[direction])
+
+
+def _line_sign(points: np.ndarray, direction: str) -> int:
+    """Side (sign of the cross product) the ``direction`` movement ends on."""
+
+    (ax, ay), (bx, by) = points
+    dx, dy = LINE_DIRECTIONS[direction]
+    return int(np.sign((bx - ax) * dy - (by - ay) * dx))
+
+
+def _cross(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+class ZoneCounter:
+    """Count tracks on many zones at once / Conta tracks em várias zonas.
+
+    Parâmetros / Parameters:
+        zones (Sequence[Zone]): Zonas de :func:`parse_zones`. Zones from
+            :func:`parse_zones`.
+        target_class_ids (Iterable[int], opcional): Classes contáveis; todas
+            quando ``None``. Countable class ids; all when ``None``.
+    """
+
+    def __init__(
+        self, zones: Sequence[Zone], target_class_ids: Optional[Iterable[int]] = None
+    ):
+        self.zones = list(zones)
+        self.target_class_ids = (
+            None
+            if target_class_ids is None
+            else np.unique(np.fromiter(target_class_ids, dtype=np.int64))
+        )
+        lines = [z for z in self.zones if z.kind == ZONE_LINE]
+        polygons = [z for z in self.zones if z.kind == ZONE_POLYGON]
+        self._line_cols = np.asarray(
+            [i for i, z in enumerate(self.zones) if z.kind == ZONE_LINE], np.int64
+        )
+        self._poly_cols = np.asarray(
+            [i for i, z in enumerate(self.zones) if z.kind == ZONE_POLYGON], np.int64
+        )
+
+        # Lines: start point, segment vector and the side counted moves end on
+        # (0 counts both ways).
+        self._a = np.asarray([z.points[0] for z in lines]).reshape(-1, 2)
+        self._b = np.asarray([z.points[1] for z in lines]).reshape(-1, 2)
+        self._ab = self._b - self._a
+        self._line_sign = np.asarray(
+            [
+                0 if z.direction == ANY_DIRECTION else _line_sign(z.points, z.direction)
+                for z in lines
+            ],
+            dtype=np.int64,
+        )
+
+        # Polygons: edges padded with zero-length ones, which never toggle
+        # the ray-casting parity.
+        max_edges = max((len(z.points) for z in polygons), default=0)
+        self._v = np.zeros((len(polygons), max_edges, 2))
+        self._w = np.zeros((len(polygons), max_edges, 2))
+        for row, zone in enumerate(polygons):
+            count = len(zone.points)
+            self._v[row, :count] = zone.points
+            self._w[row, :count] = np.roll(zone.points, -1, axis=0)
+            self._v[row, count:] = zone.points[0]
+            self._w[row, count:] = zone.points[0]
+        self._poly_mode = np.asarray(
+            [POLYGON_DIRECTIONS.get(z.direction, 0) for z in polygons], dtype=np.int64
+        )
+
+        self.totals = np.zeros(len(self.zones), dtype=np.int64)
+        self._class_counts: List[Dict[int, int]] = [{} for _ in self.zones]
+        self._counted: List[np.ndarray] = [_EMPTY_IDS for _ in self.zones]
+        self._prev_ids = _EMPTY_IDS
+        self._prev_pts = np.zeros((0, 2), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serialisable snapshot for checkpoints / Estado para checkpoints."""
+
+        return {
+            "totals": self.totals.tolist(),
+            "class_counts": [
+                {str(k): v for k, v in counts.items()} for counts in self._class_counts
+            ],
+            "counted": [ids.tolist() for ids in self._counted],
+            "prev_ids": self._prev_ids.tolist(),
+            "prev_pts": self._prev_pts.tolist(),
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Load a snapshot produced by :meth:`state`."""
+
+        self.totals = np.asarray(state["totals"], dtype=np.int64)
+        self._class_counts = [
+            {int(k): int(v) for k, v in counts.items()}
+            for counts in state["class_counts"]
+        ]
+        self._counted = [np.asarray(ids, dtype=np.int64) for ids in state["counted"]]
+        self._prev_ids = np.asarray(state["prev_ids"], dtype=np.int64)
+        self._prev_pts = np.asarray(state["prev_pts"], dtype=np.int64).reshape(-1, 2)
+
+    def report(self, names: Mapping[int, str]) -> List[Dict[str, Any]]:
+        """Per-zone counts for the job result / Contagens por zona."""
+
+        return [
+            {
+                "name": zone.name,
+                "type": zone.kind,
+                "direction": zone.direction,
+                "total_count": int(total),
+                "por_classe": {
+                    names[cls_id]: count for cls_id, count in counts.items()
+                },
+            }
+            for zone, total, counts in zip(
+                self.zones, self.totals.tolist(), self._class_counts
+            )
+        ]
+
+    def update(
+        self,
+        track_ids: np.ndarray,
+        classes: np.ndarray,
+        boxes: np.ndarray,
+        centroids: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Process one frame; return the ``(boxes, zones)`` newly counted mask."""
+
+        ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        classes = np.asarray(classes, dtype=np.int64).reshape(-1)
+        if centroids is None:
+            centroids = box_centroids(boxes)
+        curr = np.asarray(centroids, dtype=np.int64).reshape(-1, 2)
+
+        if self._prev_ids.size and ids.size:
+            slot = np.searchsorted(self._prev_ids, ids)
+            slot = np.minimum(slot, self._prev_ids.size - 1)
+            has_prev = self._prev_ids[slot] == ids
+            prev = self._prev_pts[slot]
+        else:
+            has_prev = np.zeros(ids.size, dtype=bool)
+            prev = curr
+
+        crossed = np.zeros((ids.size, len(self.zones)), dtype=bool)
+        if ids.size and has_prev.any():
+            if self._line_cols.size:
+                crossed[:, self._line_cols] = self._crossed_lines(prev, curr)
+            if self._poly_cols.size:
+                crossed[:, self._poly_cols] = self._crossed_polygons(prev, curr)
+            crossed &= has_prev[:, None]
+            if self.target_class_ids is not None:
+                crossed &= _contains(self.target_class_ids, classes)[:, None]
+
+        for col in np.flatnonzero(crossed.any(axis=0)).tolist():
+            new = crossed[:, col] & ~_contains(self._counted[col], ids)
+            crossed[:, col] = new
+            if not new.any():
+                continue
+            self._counted[col] = np.union1d(self._counted[col], ids[new])
+            self.totals[col] += int(new.sum())
+            counts = self._class_counts[col]
+            for cls_id in classes[new].tolist():
+                counts[cls_id] = counts.get(cls_id, 0) + 1
+
+        order = np.argsort(ids, kind="stable")
+        self._prev_ids = ids[order]
+        self._prev_pts = curr[order]
+        return crossed
+
+    def _crossed_lines(self, prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+        prev = prev.astype(np.float64)[:, None, :]
+        curr = curr.astype(np.float64)[:, None, :]
+        side_prev = _cross(self._ab, prev - self._a)
+        side_curr = _cross(self._ab, curr - self._a)
+        sign = np.where(self._line_sign == 0, 1, self._line_sign)
+        # Same convention as LineCounter: strictly before, then on or past.
+        forward = (side_prev * sign < 0) & (side_curr * sign >= 0)
+        backward = (side_prev * sign > 0) & (side_curr * sign <= 0)
+        moved = forward | (backward & (self._line_sign == 0))
+        # The movement must pass between the segment end points.
+        step = curr - prev
+        within = _cross(step, self._a - prev) * _cross(step, self._b - prev) <= 0
+        return moved & within
+
+    def _crossed_polygons(self, prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+        inside_prev = self._inside(prev)
+        inside_curr = self._inside(curr)
+        entered = ~inside_prev & inside_curr
+        left = inside_prev & ~inside_curr
+        return np.where(
+            self._poly_mode == 1,
+            entered,
+            np.where(self._poly_mode == -1, left, entered | left),
+        )
+
+    def _inside(self, points: np.ndarray) -> np.ndarray:
+        """``(points, polygons)`` ray-casting point-in-polygon test."""
+
+        px = points[:, 0].astype(np.float64)[:, None, None]
+        py = points[:, 1].astype(np.float64)[:, None, None]
+        xi, yi = self._v[None, ..., 0], self._v[None, ..., 1]
+        xj, yj = self._w[None, ..., 0], self._w[None, ..., 1]
+        spans = (yi > py) != (yj > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = xi + (py - yi) * (xj - xi) / (yj - yi)
+        toggles = spans & (px < x_cross)
+        return (toggles.sum(axis=-1) % 2) == 1